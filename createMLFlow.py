@@ -56,14 +56,16 @@ display(m.predict(df_subj))
 #   obj_closeness DOUBLE,
 #   obj_rationale STRING,
 #   obj_n_judges INT,
+#   obj_judge_path STRING,
 #   obj_details_json STRING,
 #   obj_has_brief INT, obj_has_history INT, obj_correct_order INT, obj_has_mmddyyyy INT,
 #   subj_preferred STRING, subj_score_a DOUBLE, subj_score_b DOUBLE,
-#   subj_vppcomp_a DOUBLE, subj_vppcomp_b DOUBLE, subj_n_judges INT, subj_details_json STRING,
+#   subj_vppcomp_a DOUBLE, subj_vppcomp_b DOUBLE, subj_n_judges INT, subj_judge_path STRING, subj_details_json STRING,
 #   subj_relevance STRING, subj_coherence STRING, subj_completeness STRING, subj_correctness STRING,
 #   subj_final_relevance STRING, subj_final_completeness STRING, subj_final_correctness STRING,
 #   subj_vpp_level STRING, subj_vpp_weighted DOUBLE, subj_passfail STRING, subj_overall_rating STRING,
 #   subj_summary_json STRING,
+#   cache_hits INT, cache_misses INT,
 #   elapsed_total_sec DOUBLE,
 #   error_code STRING, error_msg STRING,
 #   processed_at TIMESTAMP DEFAULT current_timestamp()
@@ -165,6 +167,7 @@ importlib.invalidate_caches()
 # Import modules
 import style_transfer as ST
 import update_note as UN
+import endpoint_limits
 
 from langchain_community.chat_models import ChatDatabricks
 from langchain_core.prompts import SystemMessagePromptTemplate, HumanMessagePromptTemplate, ChatPromptTemplate
@@ -294,7 +297,8 @@ def stylize_from_images_llm(endpoint: str, pdf_bytes: bytes, date_str: str) -> s
     if not urls: return ""
     mdl = _chat(endpoint); note=""
     for blk in to_image_batches(urls):
-        out = (IMG_PROMPT | mdl).invoke({"HIL_pdfs":[("human", blk)], "date": date_str, "partial": note or "(none)"})
+        out = endpoint_limits.run(endpoint, (IMG_PROMPT | mdl).invoke,
+                                  {"HIL_pdfs":[("human", blk)], "date": date_str, "partial": note or "(none)"})
         note = (out.content or "").strip()
     return note
 
@@ -699,6 +703,7 @@ class VPPRunner(mlflow.pyfunc.PythonModel):
             "n_candidates": len(cands),
             "n_envelopes": int(len(rows_df)),
             "n_judged": int(len(judged)),
+            "endpoint_limits": endpoint_limits.snapshot(),
             "report_html_path": report_html
         }
         return pd.DataFrame([{
@@ -0,0 +1,1173 @@
+# src/bundle_prompts.py
+"""
+Prompt builders of the subjective evaluation bundle (helpers re-exports all of them).
+
+- Level 1: get_precision_recall_prompt, get_precision_recall_facts_prompt, get_relevance_prompt,
+  get_coherence_prompt, get_completeness_prompt, get_correctness_prompt, get_fused_rubric_prompt,
+  get_vpp_compliance_prompt; plus get_fact_sheet_prompt for the fact-sheet reference mode
+- Level 2: get_final_relevance_prompt, get_completeness_final_prompt, get_final_correctness_prompt
+- Level 3: get_unified_pass_fail_prompt
+- apply_output_profile: adds the terse output profile inside a prompt's instruction
+
+Only the standard library, vpp_rules and fact_sheet are needed, so prompts can be rendered and checked
+without the cluster runtime.
+"""
+
+import json
+import os
+
+import fact_sheet
+import vpp_rules
+
+# "full" or "terse": terse keeps every JSON key, rating and code but caps explanations and
+# narrative text (apply_output_profile; the judge templates read the same env var)
+OUTPUT_PROFILE = os.environ.get("VPP_OUTPUT_PROFILE", "full").strip().lower()
+TERSE_TEXT_WORDS = 15
+TERSE_ITEM_WORDS = 8
+
+
+def get_vpp_compliance_prompt(candidate_note, rule_ids=None):
+    """Generate VPP compliance evaluation prompt using rule weights (all VPP_RULES, or a shard given by rule ids)"""
+    # Weight-bucket rule text is pre-rendered by vpp_rules (per shard on first use)
+    if rule_ids is None:
+        buckets, scope = vpp_rules.BUCKET_TEXT, ""
+    else:
+        buckets = vpp_rules.bucket_text_for(tuple(rule_ids))
+        categories = ", ".join(dict.fromkeys(vpp_rules.RULES_BY_ID[i]['category'] for i in rule_ids))
+        scope = f"\nThis request covers only the {categories} rules below; other VPP rules are checked separately.\n"
+
+    return f"""
+<s> [INST] You are an expert VPP (Virtual Physician Partner) compliance evaluator. Rules have different criticality levels (weights 1-5).
+{scope}
+**CANDIDATE NOTE TO EVALUATE:**
+{candidate_note}
+
+**VPP RULES BY CRITICALITY:**
+
+**CRITICAL (Weight 5) - MUST PASS:**
+{buckets['Critical']}
+
+**IMPORTANT (Weight 4) - SHOULD FOLLOW:**
+{buckets['Important']}
+
+**MODERATE (Weight 3) - RECOMMENDED:**
+{buckets['Moderate']}
+
+**MINOR (Weight 1-2) - NICE TO HAVE:**
+{buckets['Minor']}
+
+**EVALUATION APPROACH:**
+- Check the candidate note against every rule above.
+- Report a rule only if the note clearly violates it; rules that do not apply to this note are not violations.
+- Focus on what matters clinically. Minor formatting issues should NOT overshadow good structure.
+- Do NOT compute scores or compliance levels; they are derived from the rule IDs you report.
+
+CRITICAL: Return ONLY valid JSON. No markdown, no code blocks, no explanatory text.
+
+Return JSON:
+{{
+  "ViolatedRules": ["<rule id, e.g. R013>"],
+  "Explanation": "<Balanced explanation>",
+  "ClinicalAssessment": "<Is the note usable despite violations?>"
+}}
+
+</s>
+"""
+
+
+def get_unified_pass_fail_prompt(all_metrics, precision_recall):
+    """Unified pass/fail prompt with explicit JSON-only instruction"""
+
+    vpp = all_metrics.get('VPPCompliance', {})
+    violations = vpp.get('ViolationsByWeight', {})
+    critical_count = len(violations.get('Critical', []))
+    weighted_score = vpp.get('WeightedScore', 0)
+
+    return f"""
+<s> [INST] You are evaluating whether this clinical note passes quality standards, including VPP compliance.
+
+**COMPREHENSIVE METRICS PROVIDED:**
+
+1. **Content Quality Metrics:**
+{json.dumps({k: v for k, v in all_metrics.items() if k not in ['VPPCompliance', 'FinalRelevance', 'FinalCompleteness', 'FinalCorrectness']}, indent=2)}
+
+2. **Final Adjusted Scores:**
+- Final Relevance: {all_metrics.get('FinalRelevance', {}).get('FinalRelevance', 'N/A')}
+- Final Completeness: {all_metrics.get('FinalCompleteness', {}).get('FinalCompleteness', 'N/A')}
+- Final Correctness: {all_metrics.get('FinalCorrectness', {}).get('FinalCorrectness', 'N/A')}
+
+3. **VPP Compliance Assessment:**
+{json.dumps(vpp, indent=2)}
+
+4. **Precision/Recall Analysis:**
+{json.dumps(precision_recall, indent=2)}
+
+**INTEGRATED PASS CRITERIA (ALL must be met):**
+- NO critical VPP violations (weight 5) - this is mandatory for VPP use
+- Weighted VPP score ≥ 70%
+- All final content metrics ≥ "Neutral"
+- No critical missing information that affects patient care
+- Note is clinically safe and usable
+
+**ACCEPTABLE ISSUES:**
+- Minor formatting violations (weight 1-2)
+- Some moderate violations if core structure intact
+- Minor missing non-critical details
+- Stylistic preferences
+
+**FAIL CRITERIA (ANY triggers fail):**
+- Critical VPP violations present
+- Weighted VPP score < 70%
+- Any final content metric < "Neutral"
+- Critical information missing (diagnoses, treatments, etc.)
+- Note is clinically unsafe
+
+**Overall Quality Scale:**
+- 5: Excellent (minimal issues, VPP score 90%+)
+- 4: Good (minor issues only, VPP score 80-89%)
+- 3: Acceptable (notable but non-critical issues, VPP score 70-79%)
+- 2: Poor (significant problems, VPP score 60-69%)
+- 1: Failing (critical issues, VPP score <60%)
+
+CRITICAL INSTRUCTION: Return ONLY valid JSON with no additional text, no markdown formatting, and no code blocks. The response must start with {{ and end with }}.
+
+Return this exact JSON structure:
+{{
+  "OverallRating": <1-5>,
+  "PassFail": "<Pass or Fail>",
+  "UnifiedExplanation": "<Comprehensive assessment integrating all dimensions>",
+  "ContentQualitySummary": "<Brief summary of content metrics>",
+  "VPPComplianceSummary": "<Brief summary of VPP adherence>",
+  "FactualAccuracySummary": "<Brief summary of precision/recall>",
+  "KeyStrengths": ["<What the note does well>"],
+  "CriticalIssues": ["<Only issues affecting clinical use or critical VPP violations>"],
+  "MinorIssues": ["<Non-critical improvements>"],
+  "ClinicalUsability": "<Is this safe for patient care? Yes/No with reason>",
+  "RecommendationPriority": ["<Top 3 fixes in order of importance>"]
+}}
+
+</s>
+"""
+
+
+_TERSE_PROFILE = f"""
+**OUTPUT PROFILE: TERSE**
+- Keep EVERY key of the JSON format above; ratings, scores, labels, rule IDs, categories and criticality codes are unchanged.
+- Each explanation, rationale, reason, assessment or summary string: at most {TERSE_TEXT_WORDS} words.
+- Each list item (fields, issues, strengths, recommendations): a noun phrase of at most {TERSE_ITEM_WORDS} words; no repeats.
+- No preamble, no restating of the notes.
+"""
+
+
+def apply_output_profile(prompt, profile=None):
+    """
+    The prompt with the output profile's instructions (profile None uses OUTPUT_PROFILE). Terse
+    instructions go right before the closing [/INST], or before the trailing </s> of templates
+    without one, so they stay inside the instruction; a list of shard prompts is handled item by item.
+    """
+    if (profile or OUTPUT_PROFILE) != "terse":
+        return prompt
+    if isinstance(prompt, list):
+        return [apply_output_profile(p, profile) for p in prompt]
+    head, sep, tail = prompt.rpartition("[/INST]")
+    if not sep:
+        head, sep, tail = prompt.rpartition("</s>")
+        if not sep or tail.strip():
+            return prompt + _TERSE_PROFILE
+    return head + _TERSE_PROFILE + sep + tail
+
+
+def get_final_relevance_prompt(relevance_evaluation, precision_recall_result):
+    spurious_fields = precision_recall_result.get("SpuriousFields", [])
+
+    return f"""
+<s> [INST] You are an expert in clinical note evaluation. Your goal is to assign a **Final Relevance** rating that reflects how well the candidate note stays within the scope of facts present in the original MD note, and to grade the **clinical criticality** of any **spurious fields** that were introduced.
+
+You are provided with:
+- A subjective relevance evaluation:
+{json.dumps(relevance_evaluation, indent=2)}
+
+- A precision/recall analysis listing **spurious fields** (present in the candidate note but **absent** from the original MD note):
+Spurious Fields: {spurious_fields}
+
+**Criticality rubric (apply to EACH spurious item):**
+- **Critical** (weight 3): Stage/TNM or metastatic status (e.g., "Metastatic", "Stage IV", "progression", "recurrence"); primary diagnosis/site/laterality; histology/grade; management‑changing biomarkers (e.g., ER/PR/HER2; EGFR/ALK/ROS1/PD‑L1; MSI/MMR; BRCA1/2); delivered systemic therapy starts/stops/regimen changes; radiation dose/fractions; surgery with margins/nodes; Date of Diagnosis (DOD) when used as a core variable.
+- **Important** (weight 2): Imaging/labs that inform but do not alter stage; cycle counts; dose holds/reductions; clinically meaningful adverse effects tied to management; explicit follow‑up/surveillance plans with modality/timing.
+- **Minor** (weight 1): Vitals; ROS; social/family history; administrative/scheduling/billing; generic education; narrative prose that adds no clinical facts.
+
+**Scoring rules for Final Relevance (combine subjective rating with penalties from spurious items):**
+- If ANY **Critical** spurious item exists → cap **Final Relevance** at **"Hardly"**.
+- If **no Critical** but **>2 Important** items → cap at **"Neutral"**.
+- If **only Minor** items:
+  • 1–3 items → at most **"Very"** (do not reduce below the subjective rating if it was already "Very"/"Highly").
+  • ≥4 items → cap at **"Neutral"**.
+- If **no spurious** items → Final Relevance may equal the subjective rating.
+
+Return **JSON ONLY**:
+{{
+  "FinalRelevance": "<Almost not at all|Hardly|Neutral|Very|Highly>",
+  "Explanation": "One concise sentence referencing criticality and counts.",
+  "SpuriousCriticality": {{
+    "Counts": {{"critical": <int>, "important": <int>, "minor": <int>}},
+    "Items": [
+      {{"text":"<spurious item>",
+        "category":"<stage|diagnosis|treatment|radiation|surgery|biomarker|imaging|follow_up|admin|social|vitals|other>",
+        "criticality":"<critical|important|minor>",
+        "reason":"<why this level>"}}
+    ],
+    "WeightedPenalty": <int>,  # critical=3, important=2, minor=1
+    "RuleApplied": "<which cap/logic determined the final rating>"
+  }}
+}}
+
+CRITICAL: Output MUST be valid JSON only. No markdown/code fences or extra text. [/INST]</s>
+"""
+
+
+def get_completeness_final_prompt(completeness_evaluation, precision_recall_result):
+    missing_fields = precision_recall_result.get("MissingFields", [])
+
+    return f"""
+<s> [INST] You are an expert in clinical note evaluation. Assign the **Final Completeness** rating (did the candidate preserve all important information from the original MD note?) and grade the **clinical criticality** of any missing items.
+
+You are provided with:
+- A subjective completeness evaluation:
+{json.dumps(completeness_evaluation, indent=2)}
+
+- A precision/recall analysis listing **fields from the original that are missing** in the candidate:
+Missing Fields: {missing_fields}
+
+**Criticality rubric (for EACH missing item):**
+- **Critical** (weight 3): Date of Diagnosis (DOD) and core variables (primary site/laterality, histology/grade, Stage/TNM, metastatic status); confirmed recurrence/progression/metastasis; surgery with margins/nodes; delivered systemic therapy (start/stop/regimen) and pivotal reasons for change; radiation delivered (dose Gy, fractions, start/stop); management‑changing biomarkers (ER/PR/HER2; EGFR/ALK/ROS1/PD‑L1; MSI/MMR; BRCA1/2; etc.).
+- **Important** (weight 2): Imaging/labs that inform but do not alter stage; cycle counts; dose holds/reductions; significant adverse effects relevant to management; explicit follow‑up/surveillance plans (modality + timing).
+- **Minor** (weight 1): Vitals; ROS; social/family history; administrative/scheduling/billing; generic counseling; non‑actionable negatives.
+
+**Scoring rules for Final Completeness:**
+- Any **Critical** missing item → Final Completeness ≤ **"Hardly"**.
+- If **no Critical** but **>2 Important** missing → Final Completeness ≤ **"Neutral"**.
+- Only **Minor** missing:
+  • ≤3 items → may be **"Very"** or **"Highly"** (depending on how fully the core clinical story is preserved).
+  • ≥4 items → **"Very"** at most.
+- If **nothing material** is missing → **"Highly"**.
+
+**Guardrails**
+- Spurious or irrelevant additions **do not** affect completeness (that's handled by relevance/precision).
+- Prefer **delivered** care over planned; planned items do not count as missing if delivered equivalents are present.
+- Treat semantically equivalent phrasing as present (don't penalize wording differences).
+
+Return **JSON ONLY**:
+{{
+  "FinalCompleteness": "<Almost not at all|Hardly|Neutral|Very|Highly>",
+  "Explanation": "Brief justification referencing criticality counts.",
+  "MissingCriticality": {{
+    "Counts": {{"critical": <int>, "important": <int>, "minor": <int>}},
+    "Items": [
+      {{"text":"<missing item>",
+        "category":"<stage|diagnosis|treatment|surgery|radiation|biomarker|imaging|follow_up|admin|social|vitals|other>",
+        "criticality":"<critical|important|minor>",
+        "reason":"<why this level>"}}
+    ],
+    "WeightedMissing": <int>  # critical=3, important=2, minor=1
+  }}
+}}
+
+Please output **only** valid JSON; no code fences or extra prose. [/INST]</s>
+"""
+
+
+def get_final_correctness_prompt(correctness_evaluation, precision_recall_result):
+    spurious_fields = precision_recall_result.get("SpuriousFields", [])
+    precision_score = precision_recall_result.get("Precision", "")
+
+    return f"""
+<s> [INST] You are an expert in clinical documentation evaluation. Assign the **Final Correctness** rating (are values/facts correct vs. the original MD note?) and grade the **clinical criticality** of any **spurious** or **incorrect/mismatched** items.
+
+You are provided with:
+- A **subjective correctness evaluation** that may include a list like "InaccurateFields":
+{json.dumps(correctness_evaluation, indent=2)}
+
+- A **precision/recall analysis**:
+Precision (Likert): {precision_score}
+Spurious Fields: {spurious_fields}
+
+**What to analyze**
+- Treat each item in "InaccurateFields" (if present) as a **mismatch**.
+- Treat each item in "SpuriousFields" as **spurious**.
+- For each item (mismatch or spurious), assign a **category** and **criticality** using the rubric below.
+
+**Criticality rubric (for EACH item):**
+- **Critical** (weight 3): Stage/TNM or metastatic status; primary diagnosis/site/laterality; histology/grade; management‑changing biomarkers; delivered systemic therapy starts/stops/regimen changes; radiation dose/fractions; surgery margins/nodes; DOD core variable.
+- **Important** (weight 2): Imaging/labs that inform but do not alter stage; cycle counts; dose holds/reductions; significant adverse effects; explicit follow‑up/surveillance plans.
+- **Minor** (weight 1): Vitals; ROS; social/family history; administrative/billing; generic counseling; narrative filler.
+
+**Caps for Final Correctness (apply the strongest cap that matches):**
+1) If **any Critical** item (spurious or mismatch) → Final Correctness ≤ **"Hardly"**.
+2) Else if **>2 Important** items → Final Correctness ≤ **"Neutral"**.
+3) Else if Precision Likert is **not** "Very High" or "High" → Final Correctness ≤ **"Neutral"**.
+4) Else (no critical/important errors and high precision): may reflect the subjective rating (e.g., "Very"/"Highly").
+
+Return **JSON ONLY**:
+{{
+  "FinalCorrectness": "<Almost not at all|Hardly|Neutral|Very|Highly>",
+  "Explanation": "One concise sentence referencing precision and criticality counts.",
+  "ErrorCriticality": {{
+    "Counts": {{"critical": <int>, "important": <int>, "minor": <int>}},
+    "Items": [
+      {{"text":"<field>",
+        "type":"<spurious|mismatch>",
+        "category":"<stage|diagnosis|treatment|radiation|surgery|biomarker|imaging|follow_up|admin|social|vitals|other>",
+        "criticality":"<critical|important|minor>",
+        "reason":"<why this level>"}}
+    ],
+    "WeightedPenalty": <int>,  # critical=3, important=2, minor=1
+    "RuleApplied": "<which cap/logic determined the final rating>"
+  }}
+}}
+
+CRITICAL: Output must be valid JSON only (no markdown, no code fences). [/INST]</s>
+"""
+
+
+def get_precision_recall_prompt(nl_query, gold_summary, model_summary):
+    # Generates a precision/recall prompt adapted to MD → VPP note restoration
+    return f"""
+<s> [INST] You are an expert in clinical documentation evaluation.
+
+The original medical note written by a physician is as follows:
+{nl_query}
+
+This is the reference note, and we will treat it as the ground truth.
+
+Now, here is the final note that was generated by a model and then passed through a correction system to remove spurious information:
+{model_summary}
+
+Your task is to compare this final note to the original physician-authored note and evaluate whether it faithfully retains the correct information and excludes hallucinated or spurious additions.
+
+**Definitions:**
+- Fields are **missing** if they appear in the original (gold) note but are **absent** from the final note.
+- Fields are **spurious** if they appear in the final note but **do not exist** in the original physician-authored note.
+- Consider "mismatch" cases (changed values) as **spurious** for the purposes of precision.
+
+A "field" is any medically relevant unit of information — meds, dosages, test results, diagnoses, procedures, dates/ranges, staging, biomarkers, radiology conclusions, etc.
+
+Be strict in your comparisons. Semantically equivalent language is acceptable **only if the facts match**.
+
+---
+
+### Evaluation Guidelines
+
+Use the following **Likert scale for Precision**:
+- **Very High**: No spurious fields
+- **High**: No spurious fields
+- **Medium**: At most one spurious field
+- **Slightly low**: One to two spurious fields
+- **Very low**: More than two spurious fields
+
+Use the following **Likert scale for Recall**:
+- **Very High**: No missing fields
+- **High**: No missing fields
+- **Medium**: At most one missing field
+- **Slightly low**: One to two missing fields
+- **Very low**: More than two missing fields
+
+**Criticality rubric (apply to EACH missing or spurious item):**
+- **Critical** (weight 3): Stage/TNM or metastatic status; primary diagnosis/site/laterality; histology/grade; management‑changing biomarkers; delivered systemic therapy start/stop/regimen changes; radiation dose/fractions; surgery margins/nodes; DOD.
+- **Important** (weight 2): Imaging/labs that inform but do not alter stage; cycle counts; dose holds/reductions; significant adverse effects; explicit follow‑up/surveillance plans.
+- **Minor** (weight 1): Vitals; ROS; social/family history; administrative/scheduling; generic counseling.
+
+---
+
+Return your evaluation in **JSON ONLY** with BOTH simple lists and detailed classification:
+
+{{
+  "Precision": "<Likert>",
+  "Recall": "<Likert>",
+  "MissingFields": ["<plain list of missing fields>"],
+  "SpuriousFields": ["<plain list of spurious fields>"],
+  "MissingFieldsDetailed": [
+    {{"text":"<missing item>",
+      "category":"<stage|diagnosis|treatment|surgery|radiation|biomarker|imaging|follow_up|admin|social|vitals|other>",
+      "criticality":"<critical|important|minor>",
+      "reason":"<why this level>"}}
+  ],
+  "SpuriousFieldsDetailed": [
+    {{"text":"<spurious item>",
+      "category":"<stage|diagnosis|treatment|radiation|surgery|biomarker|imaging|follow_up|admin|social|vitals|other>",
+      "criticality":"<critical|important|minor>",
+      "reason":"<why this level>"}}
+  ],
+  "WeightedMissing": <int>,   # sum weights (critical=3, important=2, minor=1)
+  "WeightedSpurious": <int>   # sum weights (critical=3, important=2, minor=1)
+}}
+
+Constraints:
+- Output **only** valid JSON; no markdown or code fences.
+- Keep items concise and clinically scoped. [/INST]</s>
+"""
+
+
+def get_coherence_prompt(original_md_note, candidate_note):
+    return f"""
+<s> [INST] You are an expert in clinical summarization evaluation.
+
+The following is a note originally written by a medical doctor:
+{original_md_note}
+
+Below is a note that was derived from an LLM-generated summary, then passed through a correction system:
+{candidate_note}
+
+Your task is to evaluate the **Coherence** of the corrected note.
+
+**Coherence** refers to the logical flow and structural clarity of the document:
+- Are the sentences well-ordered?
+- Do transitions between topics make sense?
+- Is it easy to follow from start to end?
+
+You are **not** judging factual accuracy or missing/spurious content. This is **purely** about the **readability and structure** of the candidate.
+
+---
+
+### Likert Scale for Coherence
+
+- **Almost not at all**: Sentences are disjointed or unrelated. The flow is broken or hard to follow.
+- **Hardly**: Some logical structure exists, but transitions are awkward or the ordering is confusing.
+- **Neutral**: The structure is acceptable but not smooth. Some sections feel disconnected.
+- **Very**: The flow is mostly logical, with only minor rough spots in transitions.
+- **Highly**: The entire note is smoothly structured, easy to follow, and logically ordered.
+
+---
+
+### Your Task
+
+Provide your **Coherence** rating for the candidate note in this JSON format:
+
+{{
+  "Coherence": "<almost not at all|hardly|neutral|very|highly>",
+  "Explanation": "One or two sentences about flow/organization only."
+}}
+
+Please DO NOT generate any text other than this JSON.
+No markdown/code fences; the result must be loadable via `json.loads()`. [/INST]</s>
+"""
+
+
+def get_completeness_prompt(original_md_note, candidate_note):
+    return f"""
+<s> [INST] You are an expert in clinical summarization evaluation.
+
+You will rate **Completeness** (did the candidate preserve all important information from the original MD note?) **and** grade the **clinical criticality** of any missing items.
+
+ORIGINAL PHYSICIAN NOTE:
+{original_md_note}
+
+CANDIDATE NOTE:
+{candidate_note}
+
+**What to do**
+1) Identify concrete **missing items** (present in the original, absent or materially less specific in the candidate).
+2) For each missing item, assign a **category** and **criticality** using the rubric below.
+3) Decide a **Completeness** Likert rating using the caps under "Scoring rules".
+4) Return JSON only.
+
+**Criticality rubric (for EACH missing item):**
+- **Critical** (weight 3): DOD and core variables (primary site/laterality, histology/grade, Stage/TNM, metastatic status); confirmed recurrence/progression/metastasis; surgery with margins/nodes; delivered systemic therapy (start/stop/regimen) and pivotal reasons for change; radiation delivered (dose Gy, fractions, start/stop); management‑changing biomarkers (ER/PR/HER2; EGFR/ALK/ROS1/PD‑L1; MSI/MMR; BRCA1/2; etc.).
+- **Important** (weight 2): Imaging/labs that inform but do not alter stage; cycle counts; dose holds/reductions; significant adverse effects relevant to management; explicit follow‑up/surveillance plans (modality + timing).
+- **Minor** (weight 1): Vitals; ROS; social/family history; administrative/scheduling/billing; generic counseling; non‑actionable negatives.
+
+**Scoring rules for Completeness:**
+- Any **Critical** missing item → Completeness ≤ **"hardly"**.
+- If **no Critical** but **>2 Important** missing → Completeness ≤ **"neutral"**.
+- Only **Minor** missing:
+  • ≤3 items → may be **"very"** or **"highly"** (depending on how fully the core clinical story is preserved).
+  • ≥4 items → **"very"** at most.
+- If **nothing material** is missing → **"highly"**.
+
+**Guardrails**
+- Spurious/irrelevant additions **do not** affect completeness (that's relevance/precision).
+- Prefer **delivered** care over planned; planned items do not count as missing if delivered equivalents are present.
+- Treat semantically equivalent phrasing as present (don't penalize wording differences).
+
+Return **JSON ONLY**:
+{{
+  "Completeness": "<almost not at all|hardly|neutral|very|highly>",
+  "Explanation": "Brief justification referencing criticality counts.",
+  "MissingAnalysis": {{
+    "Counts": {{"critical": <int>, "important": <int>, "minor": <int>}},
+    "Items": [
+      {{"text":"<missing item>",
+        "category":"<stage|diagnosis|treatment|surgery|radiation|biomarker|imaging|follow_up|admin|social|vitals|other>",
+        "criticality":"<critical|important|minor>",
+        "reason":"<why this level>"}}
+    ],
+    "WeightedMissing": <int>  # critical=3, important=2, minor=1
+  }}
+}}
+
+Please output **only** valid JSON; no code fences or extra prose. [/INST]</s>
+"""
+
+
+def get_precision_recall_prompt(nl_query, gold_summary, model_summary):
+    # Generates a precision/recall prompt adapted to MD → VPP note restoration
+    return f"""
+<s> [INST] You are an expert in clinical documentation evaluation.
+
+The original medical note written by a physician is as follows:
+{nl_query}
+
+This is the reference note, and we will treat it as the ground truth.
+
+Now, here is the final note that was generated by a model and then passed through a correction system to remove spurious information:
+{model_summary}
+
+Your task is to compare this final note to the original physician-authored note and evaluate whether it faithfully retains the correct information and excludes hallucinated or spurious additions.
+
+**Definitions:**
+- Fields are **missing** if they appear in the original (gold) note but are **absent** from the final note.
+- Fields are **spurious** if they appear in the final note but **do not exist** in the original physician-authored note.
+- Consider "mismatch" cases (changed values) as **spurious** for the purposes of precision.
+
+A "field" is any medically relevant unit of information — meds, dosages, test results, diagnoses, procedures, dates/ranges, staging, biomarkers, radiology conclusions, etc.
+
+Be strict in your comparisons. Semantically equivalent language is acceptable **only if the facts match**.
+
+---
+
+### Example 1: Perfect Precision and Recall
+
+#### MD Note:
+"Patient with stage IIIA lung adenocarcinoma. EGFR negative. Started carboplatin/pemetrexed 03/15/2021."
+
+#### Final Note:
+"Patient with stage IIIA lung adenocarcinoma. EGFR negative. Started carboplatin/pemetrexed on March 15, 2021."
+
+#### Evaluation:
+{{
+  "Precision": "Very High",
+  "Recall": "Very High",
+  "MissingFields": [],
+  "SpuriousFields": [],
+  "MissingFieldsDetailed": [],
+  "SpuriousFieldsDetailed": [],
+  "WeightedMissing": 0,
+  "WeightedSpurious": 0
+}}
+
+---
+
+### Example 2: Missing Critical Information
+
+#### MD Note:
+"Breast cancer, ER/PR positive, HER2 negative. Stage IIB. Started letrozole 06/02/2021."
+
+#### Final Note:
+"Breast cancer. Started letrozole in June 2021."
+
+#### Evaluation:
+{{
+  "Precision": "Very High",
+  "Recall": "Very low",
+  "MissingFields": ["ER/PR positive", "HER2 negative", "Stage IIB"],
+  "SpuriousFields": [],
+  "MissingFieldsDetailed": [
+    {{"text": "ER/PR positive", "category": "biomarker", "criticality": "critical", "reason": "Management-changing receptor status"}},
+    {{"text": "HER2 negative", "category": "biomarker", "criticality": "critical", "reason": "Key biomarker for treatment selection"}},
+    {{"text": "Stage IIB", "category": "stage", "criticality": "critical", "reason": "TNM staging is essential clinical information"}}
+  ],
+  "SpuriousFieldsDetailed": [],
+  "WeightedMissing": 9,
+  "WeightedSpurious": 0
+}}
+
+---
+
+### Example 3: Spurious Critical Addition
+
+#### MD Note:
+"PSA 0.3. Continue Lupron. Follow-up 3 months."
+
+#### Final Note:
+"PSA 0.3. Bone scan shows new metastases. Continue Lupron. Follow-up 3 months."
+
+#### Evaluation:
+{{
+  "Precision": "Slightly low",
+  "Recall": "Very High",
+  "MissingFields": [],
+  "SpuriousFields": ["Bone scan shows new metastases"],
+  "MissingFieldsDetailed": [],
+  "SpuriousFieldsDetailed": [
+    {{"text": "Bone scan shows new metastases", "category": "imaging", "criticality": "critical", "reason": "False metastatic progression changes staging/management"}}
+  ],
+  "WeightedMissing": 0,
+  "WeightedSpurious": 3
+}}
+
+---
+
+### Example 4: Mixed Minor Issues
+
+#### MD Note:
+"Follow-up visit. CBC normal. Vital signs stable. Continue current regimen."
+
+#### Final Note:
+"Follow-up visit. Continue current regimen. Patient counseled on diet."
+
+#### Evaluation:
+{{
+  "Precision": "Slightly low",
+  "Recall": "Slightly low",
+  "MissingFields": ["CBC normal", "Vital signs stable"],
+  "SpuriousFields": ["Patient counseled on diet"],
+  "MissingFieldsDetailed": [
+    {{"text": "CBC normal", "category": "imaging", "criticality": "minor", "reason": "Routine lab without specific values"}},
+    {{"text": "Vital signs stable", "category": "vitals", "criticality": "minor", "reason": "Non-specific vital sign mention"}}
+  ],
+  "SpuriousFieldsDetailed": [
+    {{"text": "Patient counseled on diet", "category": "admin", "criticality": "minor", "reason": "Generic counseling addition"}}
+  ],
+  "WeightedMissing": 2,
+  "WeightedSpurious": 1
+}}
+
+---
+
+### Evaluation Guidelines
+
+Use the following **Likert scale for Precision**:
+- **Very High**: No spurious fields
+- **High**: No spurious fields
+- **Medium**: At most one spurious field
+- **Slightly low**: One to two spurious fields
+- **Very low**: More than two spurious fields
+
+Use the following **Likert scale for Recall**:
+- **Very High**: No missing fields
+- **High**: No missing fields
+- **Medium**: At most one missing field
+- **Slightly low**: One to two missing fields
+- **Very low**: More than two missing fields
+
+**Criticality rubric (apply to EACH missing or spurious item):**
+- **Critical** (weight 3): Stage/TNM or metastatic status; primary diagnosis/site/laterality; histology/grade; management‑changing biomarkers; delivered systemic therapy start/stop/regimen changes; radiation dose/fractions; surgery margins/nodes; DOD.
+- **Important** (weight 2): Imaging/labs that inform but do not alter stage; cycle counts; dose holds/reductions; significant adverse effects; explicit follow‑up/surveillance plans.
+- **Minor** (weight 1): Vitals; ROS; social/family history; administrative/scheduling; generic counseling.
+
+---
+
+Return your evaluation in **JSON ONLY** with BOTH simple lists and detailed classification:
+
+{{
+  "Precision": "<Likert>",
+  "Recall": "<Likert>",
+  "MissingFields": ["<plain list of missing fields>"],
+  "SpuriousFields": ["<plain list of spurious fields>"],
+  "MissingFieldsDetailed": [
+    {{"text":"<missing item>",
+      "category":"<stage|diagnosis|treatment|surgery|radiation|biomarker|imaging|follow_up|admin|social|vitals|other>",
+      "criticality":"<critical|important|minor>",
+      "reason":"<why this level>"}}
+  ],
+  "SpuriousFieldsDetailed": [
+    {{"text":"<spurious item>",
+      "category":"<stage|diagnosis|treatment|radiation|surgery|biomarker|imaging|follow_up|admin|social|vitals|other>",
+      "criticality":"<critical|important|minor>",
+      "reason":"<why this level>"}}
+  ],
+  "WeightedMissing": <int>,   # sum weights (critical=3, important=2, minor=1)
+  "WeightedSpurious": <int>   # sum weights (critical=3, important=2, minor=1)
+}}
+
+Constraints:
+- Output **only** valid JSON; no markdown or code fences.
+- Keep items concise and clinically scoped. [/INST]</s>
+"""
+
+# Per-dimension rating criteria (definition, Likert scale, criticality rubric, worked example),
+# shared word for word by the single-dimension prompts and get_fused_rubric_prompt
+_RELEVANCE_CRITERIA = """Your task is to evaluate the **Relevance** of the corrected note and grade the **clinical criticality** of any irrelevant content.
+
+Relevance means: does the candidate note stay focused on content from the original physician-authored note? Does it include **only medically relevant information** derived from that note, without introducing unrelated, unnecessary, or speculative content?
+
+You are NOT judging whether it includes everything (that's **Completeness**) or whether values are right (that's **Correctness**). You are judging whether included content is **on-topic** and **faithful to the intent of the original MD note**.
+
+---
+
+### Likert Scale for Relevance
+
+- **Almost not at all**: The candidate is filled with irrelevant or fabricated content, barely related to the MD note.
+- **Hardly**: It touches on a few original ideas, but most of the note is tangential or off-topic.
+- **Neutral**: The candidate contains some real content from the MD note, but also drifts with loosely related or speculative info.
+- **Very**: The candidate includes mostly relevant content from the MD note with minor irrelevancies.
+- **Highly**: The candidate includes only information found in or directly derivable from the MD note — no extra content.
+
+**Criticality rubric (for EACH irrelevant/spurious item):**
+- **Critical** (weight 3): False staging/TNM or metastatic status; incorrect primary diagnosis/site/laterality; spurious histology/grade; fabricated management-changing biomarkers; false systemic therapy changes; spurious radiation; fabricated surgery details; incorrect DOD.
+- **Important** (weight 2): Spurious imaging/labs that would inform staging; fabricated cycle counts; false dose modifications; spurious adverse effects; fabricated follow-up plans.
+- **Minor** (weight 1): Irrelevant vitals; unrelated ROS; spurious social/family history; unnecessary administrative content; generic counseling not in original.
+
+---
+
+### Example: Oncology Note with Critical Irrelevance
+
+#### MD Note:
+"Follow-up for lung cancer. CT stable. Continue pembrolizumab."
+
+#### Candidate Note:
+"Follow-up for Stage IV lung cancer with brain metastases. CT stable. EGFR positive. Continue pembrolizumab. Started prophylactic anticonvulsants."
+
+#### Evaluation:
+{
+  "Relevance": "hardly",
+  "Explanation": "Critical fabrications of staging, metastases, and biomarker status not present in original.",
+  "IrrelevantContent": ["Stage IV", "brain metastases", "EGFR positive", "prophylactic anticonvulsants"],
+  "IrrelevantContentDetailed": [
+    {"text": "Stage IV", "category": "stage", "criticality": "critical", "reason": "False staging information"},
+    {"text": "brain metastases", "category": "diagnosis", "criticality": "critical", "reason": "Fabricated metastatic disease"},
+    {"text": "EGFR positive", "category": "biomarker", "criticality": "critical", "reason": "False biomarker status affects treatment"},
+    {"text": "prophylactic anticonvulsants", "category": "treatment", "criticality": "important", "reason": "Spurious medication addition"}
+  ],
+  "WeightedIrrelevance": 11
+}"""
+
+_COHERENCE_CRITERIA = """Your task is to evaluate the **Coherence** of the corrected note.
+
+**Coherence** refers to the logical flow and structural clarity of the document:
+- Are the sentences well-ordered?
+- Do transitions between topics make sense?
+- Is it easy to follow from start to end?
+
+You are **not** judging factual accuracy or missing/spurious content. This is **purely** about the **readability and structure** of the candidate.
+
+---
+
+### Likert Scale for Coherence
+
+- **Almost not at all**: Sentences are disjointed or unrelated. The flow is broken or hard to follow.
+- **Hardly**: Some logical structure exists, but transitions are awkward or the ordering is confusing.
+- **Neutral**: The structure is acceptable but not smooth. Some sections feel disconnected.
+- **Very**: The flow is mostly logical, with only minor rough spots in transitions.
+- **Highly**: The entire note is smoothly structured, easy to follow, and logically ordered."""
+
+_COMPLETENESS_CRITERIA = """You are tasked with evaluating the **Completeness** of the corrected note — that is, how well it captures all the key information from the original physician-authored note.
+
+You are NOT evaluating whether the values are correct (that’s **Correctness**) or whether any irrelevant material was added (that’s **Relevance/Precision**). This evaluation is solely about whether **important information was lost or omitted**.
+
+---
+
+### Likert Scale for Completeness
+
+- **Almost not at all**: The note is missing nearly all relevant information.
+- **Hardly**: Several key details are missing; the clinical picture is incomplete.
+- **Neutral**: Most of the core content is present, but a few important fields are missing.
+- **Very**: Only minor, non-critical information is omitted.
+- **Highly**: The note captures everything important from the original without loss.
+
+---
+
+### Example: Prostate Cancer Monitoring
+
+#### MD Note:
+"Patient returns for follow-up. PSA is 0.3. Testosterone 465. Axumin PET from 06/2021 shows focal uptake at tip of sacrum. Restarted Lupron on 06/02/2021."
+
+#### Candidate Notes (Completeness Variants):
+
+- **Almost not at all**:
+"Patient returned for follow-up. Discussion held."
+→ Missing all numerical data and imaging. The note is vague and devoid of substance.
+
+- **Hardly**:
+"Follow-up visit. PSA discussed. Restarted Lupron."
+→ Omits testosterone, scan findings, scan date. Key information is missing.
+
+- **Neutral**:
+"PSA is 0.3. Restarted Lupron on 06/02/2021. Imaging was done."
+→ Mentions some important fields, but omits testosterone value and specific imaging details.
+
+- **Very**:
+"PSA 0.3. Testosterone 465. Restarted Lupron. Imaging showed sacral lesion."
+→ Contains nearly all content; imaging date is missing.
+
+- **Highly**:
+"Follow-up visit. PSA 0.3. Testosterone 465. PET from 06/2021 shows sacral uptake. Restarted Lupron on 06/02/2021."
+→ All critical content retained."""
+
+_COMPLETENESS_NOTE = """> ⚠️ NOTE: Spurious or irrelevant information **does not affect completeness**. A candidate can be **highly complete** even if it includes extra content, as long as all key original information is present."""
+
+_CORRECTNESS_CRITERIA = """Your task is to evaluate the **Correctness** of the candidate note — whether each clinical **value** in the candidate matches the corresponding value in the original doctor-authored note, and grade the **clinical criticality** of any incorrect/mismatched values.
+
+You are only evaluating value accuracy. Do not consider whether information is missing (that's Recall/Completeness) or whether extra information was added (that's Precision/Relevance). You are concerned solely with **incorrect or changed values**.
+
+---
+
+### Likert Scale for Correctness
+
+- **Almost not at all**: Most values are incorrect or contradict the original.
+- **Hardly**: Many values are wrong, though some match.
+- **Neutral**: Most values are correct, but a few are inaccurate.
+- **Very**: Nearly all values are accurate, with only minor discrepancies.
+- **Highly**: All values match exactly.
+
+**Criticality rubric (for EACH incorrect/mismatched value):**
+- **Critical** (weight 3): Stage/TNM or metastatic status errors; wrong primary diagnosis/site/laterality; incorrect histology/grade; wrong management-changing biomarkers; incorrect systemic therapy/regimen; wrong radiation dose/fractions; incorrect surgery margins/nodes; wrong DOD.
+- **Important** (weight 2): Incorrect imaging/lab values that inform but don't alter stage; wrong cycle counts; incorrect dose holds/reductions; misreported adverse effects; wrong follow-up timing.
+- **Minor** (weight 1): Incorrect vitals; wrong ROS details; incorrect social/family history; wrong administrative details; misreported generic counseling.
+
+---
+
+### Example: Prostate Cancer with Critical Error
+
+#### MD Note:
+"PSA is 0.3. Stage T2N0M0. BRCA2 positive. Started enzalutamide 06/02/2021."
+
+#### Candidate Note:
+"PSA is 3.0. Stage T3N1M0. BRCA2 positive. Started enzalutamide in June 2021."
+
+#### Evaluation:
+{
+  "Correctness": "hardly",
+  "Explanation": "Critical errors in PSA value and staging that would change management.",
+  "InaccurateFields": ["PSA value", "Stage", "Enzalutamide start date"],
+  "InaccurateFieldsDetailed": [
+    {"text": "PSA 3.0 vs 0.3", "category": "imaging", "criticality": "important", "reason": "10-fold error in key monitoring lab"},
+    {"text": "Stage T3N1M0 vs T2N0M0", "category": "stage", "criticality": "critical", "reason": "Incorrect staging changes prognosis and treatment"},
+    {"text": "June 2021 vs 06/02/2021", "category": "treatment", "criticality": "minor", "reason": "Imprecise but correct month"}
+  ],
+  "WeightedIncorrect": 6
+}"""
+
+
+def get_relevance_prompt(original_md_note, candidate_note):
+    return f"""
+<s> [INST] You are an expert in clinical summarization evaluation.
+
+The following is a note originally written by a medical doctor:
+{original_md_note}
+
+Below is a note that was generated by a model and later corrected:
+{candidate_note}
+
+{_RELEVANCE_CRITERIA}
+
+---
+
+Return your evaluation in **JSON ONLY**:
+
+{{
+  "Relevance": "<almost not at all|hardly|neutral|very|highly>",
+  "Explanation": "Brief explanation of relevance to original note.",
+  "IrrelevantContent": ["<list of content not derived from original>"],
+  "IrrelevantContentDetailed": [
+    {{"text": "<irrelevant item>",
+      "category": "<stage|diagnosis|treatment|radiation|surgery|biomarker|imaging|follow_up|admin|social|vitals|other>",
+      "criticality": "<critical|important|minor>",
+      "reason": "<why this level>"}}
+  ],
+  "WeightedIrrelevance": <int>  # sum weights (critical=3, important=2, minor=1)
+}}
+
+Please DO NOT generate any text other than this JSON.
+No markdown/code fences; the result must be loadable with `json.loads()`. [/INST]</s>
+"""
+
+def get_coherence_prompt(original_md_note, candidate_note):
+    return f"""
+<s> [INST] You are an expert in clinical summarization evaluation.
+
+The following is a note originally written by a medical doctor:
+{original_md_note}
+
+Below is a note that was derived from an LLM-generated summary, then passed through a correction system:
+{candidate_note}
+
+{_COHERENCE_CRITERIA}
+
+---
+
+### Your Task
+
+Provide your **Coherence** rating for the candidate note in this JSON format:
+
+{{
+  "Coherence": "<almost not at all|hardly|neutral|very|highly>",
+  "Explanation": "One or two sentences about flow/organization only."
+}}
+
+Please DO NOT generate any text other than this JSON.
+No markdown/code fences; the result must be loadable via `json.loads()`. [/INST]</s>
+"""
+
+def get_completeness_prompt(original_md_note, candidate_note):
+    return f"""
+<s> [INST] You are an expert in clinical summarization evaluation.
+
+Below is a clinical note originally written by a physician:
+{original_md_note}
+
+And here is a note that was generated and then corrected to match the original:
+{candidate_note}
+
+{_COMPLETENESS_CRITERIA}
+
+---
+
+### Your Output
+
+Now, using the examples above, rate the **Completeness** of the candidate note using the following JSON format:
+
+{{
+  "Completeness": "very",
+  "Explanation": "The note covers all key labs and treatment decisions but omits the specific date of the PET scan.",
+}}
+
+or
+
+{{
+  "Completeness": "highly",
+  "Explanation": "All relevant fields from the MD note — including labs, imaging, and treatment actions — are preserved in full.",
+}}
+
+{_COMPLETENESS_NOTE}
+
+Please DO NOT generate anything other than the JSON above.
+
+Also avoid formatting wrappers like ```json — your output must be valid JSON that can be parsed using `json.loads()`.
+
+</s>
+"""
+
+
+def get_correctness_prompt(original_md_note, candidate_note):
+    return f"""
+<s> [INST] You are an expert in clinical documentation evaluation.
+
+The following is a note written by a medical doctor:
+{original_md_note}
+
+Below is a candidate note that has been derived from a hallucinated version of the original and corrected by a model:
+{candidate_note}
+
+{_CORRECTNESS_CRITERIA}
+
+---
+
+Return your evaluation in **JSON ONLY**:
+
+{{
+  "Correctness": "<almost not at all|hardly|neutral|very|highly>",
+  "Explanation": "Brief explanation of value accuracy.",
+  "InaccurateFields": ["<list of fields with incorrect values>"],
+  "InaccurateFieldsDetailed": [
+    {{"text": "<incorrect value vs correct value>",
+      "category": "<stage|diagnosis|treatment|radiation|surgery|biomarker|imaging|follow_up|admin|social|vitals|other>",
+      "criticality": "<critical|important|minor>",
+      "reason": "<why this level>"}}
+  ],
+  "WeightedIncorrect": <int>  # sum weights (critical=3, important=2, minor=1)
+}}
+
+Please DO NOT generate anything except the JSON above.
+No markdown/code fences; the result must be loadable with `json.loads()`. [/INST]</s>
+"""
+
+def get_fused_rubric_prompt(original_md_note, candidate_note):
+    """Relevance, Coherence, Completeness and Correctness in one call (VPP_RUBRIC_MODE=fused)"""
+    return f"""
+<s> [INST] You are an expert in clinical summarization evaluation.
+
+The following is a note originally written by a medical doctor:
+{original_md_note}
+
+Below is a candidate note that was generated by a model and later corrected:
+{candidate_note}
+
+Your task is to evaluate the candidate note on FOUR independent dimensions. Judge each one on its own; do not let one dimension influence another. Each section below gives that dimension's criteria, Likert scale and example exactly as they are used when the dimension is rated on its own.
+
+---
+
+## 1. Relevance
+
+{_RELEVANCE_CRITERIA}
+
+---
+
+## 2. Coherence
+
+{_COHERENCE_CRITERIA}
+
+---
+
+## 3. Completeness
+
+{_COMPLETENESS_CRITERIA}
+
+{_COMPLETENESS_NOTE}
+
+---
+
+## 4. Correctness
+
+{_CORRECTNESS_CRITERIA}
+
+---
+
+Return your evaluation in **JSON ONLY**, one object per dimension:
+
+{{
+  "Relevance": {{
+    "Relevance": "<almost not at all|hardly|neutral|very|highly>",
+    "Explanation": "Brief explanation of relevance to original note.",
+    "IrrelevantContent": ["<list of content not derived from original>"],
+    "IrrelevantContentDetailed": [
+      {{"text": "<irrelevant item>",
+        "category": "<stage|diagnosis|treatment|radiation|surgery|biomarker|imaging|follow_up|admin|social|vitals|other>",
+        "criticality": "<critical|important|minor>",
+        "reason": "<why this level>"}}
+    ],
+    "WeightedIrrelevance": <int>
+  }},
+  "Coherence": {{
+    "Coherence": "<almost not at all|hardly|neutral|very|highly>",
+    "Explanation": "One or two sentences about flow/organization only."
+  }},
+  "Completeness": {{
+    "Completeness": "<almost not at all|hardly|neutral|very|highly>",
+    "Explanation": "Which key information, if any, is omitted."
+  }},
+  "Correctness": {{
+    "Correctness": "<almost not at all|hardly|neutral|very|highly>",
+    "Explanation": "Brief explanation of value accuracy.",
+    "InaccurateFields": ["<list of fields with incorrect values>"],
+    "InaccurateFieldsDetailed": [
+      {{"text": "<incorrect value vs correct value>",
+        "category": "<stage|diagnosis|treatment|radiation|surgery|biomarker|imaging|follow_up|admin|social|vitals|other>",
+        "criticality": "<critical|important|minor>",
+        "reason": "<why this level>"}}
+    ],
+    "WeightedIncorrect": <int>
+  }}
+}}
+
+WeightedIrrelevance / WeightedIncorrect are the sums of the criticality weights (critical=3, important=2, minor=1).
+
+Please DO NOT generate any text other than this JSON.
+No markdown/code fences; the result must be loadable with `json.loads()`. [/INST]</s>
+"""
+
+
+def get_fact_sheet_prompt(reference_note):
+    """Extraction prompt for fact_sheet: the reference's clinically material facts, once per case."""
+    categories = "|".join(fact_sheet.CATEGORIES)
+    return f"""
+<s> [INST] You are an expert clinical abstractor.
+
+Below is a reference medical note:
+{reference_note}
+
+Extract EVERY clinically material fact from this note into a structured fact sheet. Later,
+candidate notes will be checked against this sheet alone, so a fact you leave out will be
+treated as absent from the reference.
+
+Include: diagnoses (primary site, laterality, histology, grade, metastatic sites); staging
+(TNM, stage group, dates); biomarkers and their results; systemic therapy regimens (drugs,
+doses, cycles, start/stop dates, holds/reductions, reasons); surgery (procedure, date,
+margins, nodes); radiation (site, dose, fractions, dates); imaging and labs with their
+conclusions and values; significant adverse events; follow-up and surveillance plans;
+date of death if present.
+
+Exclude: vitals, review of systems, social/family history, administrative/scheduling/billing
+text and generic counseling.
+
+Rules:
+- One fact per item, phrased tersely with the exact values from the note (no paraphrased numbers).
+- Put the fact's date in "date" (as written in the note), or "" if it has none.
+- Do not infer or add anything that is not stated in the note.
+
+Return JSON ONLY:
+
+{{
+  "Facts": [
+    {{"category": "<{categories}>", "text": "<fact>", "date": "<date or empty>"}}
+  ],
+  "KeyDates": ["<date: event, in chronological order>"]
+}}
+
+No markdown/code fences; the result must be loadable with `json.loads()`. [/INST]</s>
+"""
+
+
+def get_precision_recall_facts_prompt(reference_facts, model_summary):
+    """get_precision_recall_prompt against a reference fact sheet (fact_sheet.format_sheet) instead of the full note"""
+    return f"""
+<s> [INST] You are an expert in clinical documentation evaluation.
+
+The clinically material facts of the original physician-authored note are listed in this fact sheet:
+{reference_facts}
+
+This fact sheet is the ground truth. It deliberately omits vitals, ROS, social/family history and
+administrative details; do not count such content in the final note as missing or spurious.
+
+Now, here is the final note that was generated by a model and then passed through a correction system to remove spurious information:
+{model_summary}
+
+Your task is to compare this final note to the fact sheet and evaluate whether it faithfully retains the correct information and excludes hallucinated or spurious additions.
+
+**Definitions:**
+- Fields are **missing** if they appear in the fact sheet but are **absent** from the final note.
+- Fields are **spurious** if they appear in the final note but are **not supported** by the fact sheet.
+- Consider "mismatch" cases (changed values or dates) as **spurious** for the purposes of precision.
+
+Be strict in your comparisons. Semantically equivalent language is acceptable **only if the facts match**.
+
+---
+
+### Evaluation Guidelines
+
+Use the following **Likert scale for Precision**:
+- **Very High**: No spurious fields
+- **High**: No spurious fields
+- **Medium**: At most one spurious field
+- **Slightly low**: One to two spurious fields
+- **Very low**: More than two spurious fields
+
+Use the following **Likert scale for Recall**:
+- **Very High**: No missing fields
+- **High**: No missing fields
+- **Medium**: At most one missing field
+- **Slightly low**: One to two missing fields
+- **Very low**: More than two missing fields
+
+**Criticality rubric (apply to EACH missing or spurious item):**
+- **Critical** (weight 3): Stage/TNM or metastatic status; primary diagnosis/site/laterality; histology/grade; management‑changing biomarkers; delivered systemic therapy start/stop/regimen changes; radiation dose/fractions; surgery margins/nodes; DOD.
+- **Important** (weight 2): Imaging/labs that inform but do not alter stage; cycle counts; dose holds/reductions; significant adverse effects; explicit follow‑up/surveillance plans.
+- **Minor** (weight 1): Generic counseling; other non-actionable details.
+
+---
+
+Return your evaluation in **JSON ONLY** with BOTH simple lists and detailed classification:
+
+{{
+  "Precision": "<Likert>",
+  "Recall": "<Likert>",
+  "MissingFields": ["<plain list of missing fields>"],
+  "SpuriousFields": ["<plain list of spurious fields>"],
+  "MissingFieldsDetailed": [
+    {{"text":"<missing item>",
+      "category":"<stage|diagnosis|treatment|surgery|radiation|biomarker|imaging|follow_up|admin|social|vitals|other>",
+      "criticality":"<critical|important|minor>",
+      "reason":"<why this level>"}}
+  ],
+  "SpuriousFieldsDetailed": [
+    {{"text":"<spurious item>",
+      "category":"<stage|diagnosis|treatment|radiation|surgery|biomarker|imaging|follow_up|admin|social|vitals|other>",
+      "criticality":"<critical|important|minor>",
+      "reason":"<why this level>"}}
+  ],
+  "WeightedMissing": <int>,   # sum weights (critical=3, important=2, minor=1)
+  "WeightedSpurious": <int>   # sum weights (critical=3, important=2, minor=1)
+}}
+
+Constraints:
+- Output **only** valid JSON; no markdown or code fences.
+- Keep items concise and clinically scoped. [/INST]</s>
+"""
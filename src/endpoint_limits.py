@@ -0,0 +1,224 @@
+# src/endpoint_limits.py
+"""
+Adaptive per-endpoint concurrency control (AIMD), shared by every caller of a
+Databricks serving endpoint: the judge ensemble, helpers.call_sonnet,
+style_transfer and update_note.
+
+Each endpoint gets a limit on in-flight requests:
+- additive increase: every healthy completion adds 1/limit (≈ +1 per round trip)
+- multiplicative decrease: a 429/5xx, or a latency spike above
+  LATENCY_SPIKE_FACTOR × the endpoint's smoothed latency, multiplies the limit
+  by DECREASE_FACTOR (at most once per smoothed round trip)
+
+Usage:
+    with endpoint_limits.slot("databricks-claude-sonnet-4"):
+        ...one request...
+    with endpoint_limits.slot(endpoint, block=False) as acquired:  # only if a slot is free now
+        ...
+    async with endpoint_limits.aslot(endpoint):  # same limiter, waits without blocking the loop
+        ...one request...
+    endpoint_limits.run(endpoint, chain.invoke, inputs)
+    endpoint_limits.snapshot()  # current limits / in-flight counts as metrics
+
+Per-endpoint bounds can be overridden in ENDPOINT_LIMITS or via configure().
+"""
+
+from __future__ import annotations
+from typing import Any, Callable, Dict
+from contextlib import asynccontextmanager, contextmanager
+import asyncio
+import threading
+import time
+
+DEFAULT_INITIAL_LIMIT = 4.0
+DEFAULT_MIN_LIMIT = 1.0
+DEFAULT_MAX_LIMIT = 32.0
+DECREASE_FACTOR = 0.5
+LATENCY_SPIKE_FACTOR = 2.5
+LATENCY_EWMA_ALPHA = 0.2
+ASYNC_POLL_MIN_SEC = 0.01   # aslot() back-off while the endpoint is at its limit
+ASYNC_POLL_MAX_SEC = 0.5
+
+# endpoint -> {"initial": .., "min": .., "max": ..}; anything missing uses the defaults.
+ENDPOINT_LIMITS: Dict[str, Dict[str, float]] = {
+    "databricks-claude-opus-4": {"initial": 2, "max": 8},
+    "databricks-meta-llama-3-3-70b-instruct": {"initial": 8, "max": 64},
+    "databricks-llama-4-maverick": {"initial": 8, "max": 64},
+}
+
+_OVERLOAD_MARKERS = ("429", "too many requests", "rate limit", "503", "502", "504", "overloaded")
+
+
+def is_overload(exc: BaseException) -> bool:
+    """Best-effort detection of throttling / server-side overload across requests, langchain and the SDK."""
+    resp = getattr(exc, "response", None)
+    status = getattr(resp, "status_code", None) or getattr(exc, "status_code", None)
+    if isinstance(status, int):
+        return status == 429 or status >= 500
+    msg = str(exc).lower()
+    return any(m in msg for m in _OVERLOAD_MARKERS)
+
+
+def is_transient(exc: BaseException) -> bool:
+    """
+    Overload (see is_overload) or a connection/timeout failure: worth retrying or failing over.
+    A wrapped error (raise ... from e) is judged by its cause.
+    """
+    while exc is not None:
+        if is_overload(exc) or isinstance(exc, (ConnectionError, TimeoutError)):
+            return True
+        if any(m in type(exc).__name__.lower() for m in ("connection", "timeout")):
+            return True
+        exc = exc.__cause__
+    return False
+
+
+class AIMDLimiter:
+    def __init__(
+        self,
+        initial: float = DEFAULT_INITIAL_LIMIT,
+        min_limit: float = DEFAULT_MIN_LIMIT,
+        max_limit: float = DEFAULT_MAX_LIMIT,
+    ):
+        self.min_limit = float(min_limit)
+        self.max_limit = float(max_limit)
+        self.limit = min(max(float(initial), self.min_limit), self.max_limit)
+        self.in_flight = 0
+        self.latency_ewma: float | None = None
+        self.last_decrease = 0.0
+        self.n_ok = 0
+        self.n_overload = 0
+        self.n_decreases = 0
+        self._cond = threading.Condition()
+
+    def acquire(self) -> None:
+        with self._cond:
+            while self.in_flight >= int(self.limit):
+                self._cond.wait()
+            self.in_flight += 1
+
+    def try_acquire(self) -> bool:
+        """Non-blocking acquire, for callers that must not park a thread (see aslot)."""
+        with self._cond:
+            if self.in_flight >= int(self.limit):
+                return False
+            self.in_flight += 1
+            return True
+
+    def release(self, latency_sec: float, overloaded: bool = False, failed: bool = False) -> None:
+        """failed=True (non-overload error, e.g. a 400) frees the slot without adapting the limit."""
+        with self._cond:
+            self.in_flight -= 1
+            if failed and not overloaded:
+                self._cond.notify_all()
+                return
+            spike = (
+                self.latency_ewma is not None
+                and latency_sec > LATENCY_SPIKE_FACTOR * self.latency_ewma
+            )
+            if overloaded or spike:
+                self.n_overload += overloaded
+                self._decrease()
+            else:
+                self.n_ok += 1
+                self.limit = min(self.max_limit, self.limit + 1.0 / self.limit)
+            if not overloaded:
+                a = LATENCY_EWMA_ALPHA
+                self.latency_ewma = latency_sec if self.latency_ewma is None else (1 - a) * self.latency_ewma + a * latency_sec
+            self._cond.notify_all()
+
+    def _decrease(self) -> None:
+        # one cut per smoothed round trip, so a burst of errors from the same window counts once
+        now = time.time()
+        window = self.latency_ewma or 1.0
+        if now - self.last_decrease < window:
+            return
+        self.limit = max(self.min_limit, self.limit * DECREASE_FACTOR)
+        self.last_decrease = now
+        self.n_decreases += 1
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                "limit": round(self.limit, 2),
+                "in_flight": self.in_flight,
+                "latency_ewma_sec": round(self.latency_ewma, 3) if self.latency_ewma is not None else None,
+                "ok": self.n_ok,
+                "overloaded": self.n_overload,
+                "decreases": self.n_decreases,
+            }
+
+
+_LIMITERS: Dict[str, AIMDLimiter] = {}
+_LOCK = threading.Lock()
+
+
+def limiter(endpoint: str) -> AIMDLimiter:
+    with _LOCK:
+        lim = _LIMITERS.get(endpoint)
+        if lim is None:
+            cfg = ENDPOINT_LIMITS.get(endpoint, {})
+            lim = AIMDLimiter(
+                initial=cfg.get("initial", DEFAULT_INITIAL_LIMIT),
+                min_limit=cfg.get("min", DEFAULT_MIN_LIMIT),
+                max_limit=cfg.get("max", DEFAULT_MAX_LIMIT),
+            )
+            _LIMITERS[endpoint] = lim
+        return lim
+
+
+def configure(endpoint: str, **bounds: float) -> None:
+    """Override initial/min/max for an endpoint; its limiter is rebuilt on next use."""
+    with _LOCK:
+        ENDPOINT_LIMITS.setdefault(endpoint, {}).update(bounds)
+        _LIMITERS.pop(endpoint, None)
+
+
+@contextmanager
+def slot(endpoint: str, block: bool = True):
+    """
+    Hold one of the endpoint's concurrency slots for the duration of the block; yields True.
+    block=False doesn't wait: it yields False (holding nothing) if the endpoint is at its limit.
+    """
+    lim = limiter(endpoint)
+    if block:
+        lim.acquire()
+    elif not lim.try_acquire():
+        yield False
+        return
+    t0 = time.time()
+    try:
+        yield True
+    except BaseException as e:
+        lim.release(time.time() - t0, overloaded=is_overload(e), failed=True)
+        raise
+    else:
+        lim.release(time.time() - t0)
+
+
+@asynccontextmanager
+async def aslot(endpoint: str):
+    lim = limiter(endpoint)
+    delay = ASYNC_POLL_MIN_SEC
+    while not lim.try_acquire():
+        await asyncio.sleep(delay)
+        delay = min(ASYNC_POLL_MAX_SEC, delay * 2)
+    t0 = time.time()
+    try:
+        yield
+    except BaseException as e:
+        lim.release(time.time() - t0, overloaded=is_overload(e), failed=True)
+        raise
+    else:
+        lim.release(time.time() - t0)
+
+
+def run(endpoint: str, fn: Callable[..., Any], *args, **kwargs) -> Any:
+    with slot(endpoint):
+        return fn(*args, **kwargs)
+
+
+def snapshot() -> Dict[str, Dict[str, Any]]:
+    with _LOCK:
+        items = list(_LIMITERS.items())
+    return {e: lim.metrics() for e, lim in sorted(items)}
@@ -0,0 +1,96 @@
+# src/endpoint_pool.py
+"""
+Load balancing with failover across equivalent serving endpoints.
+
+Routing is latency-weighted least-outstanding-requests: each call goes to the
+endpoint with the lowest (in_flight + 1) x smoothed latency. Both numbers come from
+the shared endpoint_limits limiter, so they count traffic from every caller of
+that endpoint, not only this pool's. If an endpoint fails transiently (overload,
+5xx, connection or timeout; endpoint_limits.is_transient), the call fails over to
+the next-best endpoint, and the failed one is skipped for FAILOVER_COOLDOWN_SEC.
+If every endpoint is cooling down, they are all tried anyway. Any other error
+(e.g. a 400 for a malformed request) is the request's fault: it is raised at
+once and no endpoint is cooled down.
+
+Usage:
+    pool = EndpointPool(["databricks-claude-sonnet-4", "databricks-claude-sonnet-4-5"])
+    out = pool.call(lambda ep: post_to(ep))
+    out = await pool.acall(lambda ep: apost_to(ep))
+"""
+
+from __future__ import annotations
+from typing import Any, Awaitable, Callable, Dict, List
+import random
+import threading
+import time
+
+import endpoint_limits
+
+FAILOVER_COOLDOWN_SEC = 30.0
+UNKNOWN_LATENCY_SEC = 1.0  # weight for endpoints without latency samples yet
+
+
+class EndpointPool:
+    def __init__(self, endpoints: List[str], cooldown_sec: float = FAILOVER_COOLDOWN_SEC):
+        if not endpoints:
+            raise ValueError("EndpointPool needs at least one endpoint")
+        self.endpoints = list(dict.fromkeys(endpoints))
+        self.cooldown_sec = cooldown_sec
+        self._failed_at: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def _cooling(self, endpoint: str, now: float) -> bool:
+        with self._lock:
+            return now - self._failed_at.get(endpoint, float("-inf")) < self.cooldown_sec
+
+    def _score(self, endpoint: str) -> float:
+        lim = endpoint_limits.limiter(endpoint)
+        return (lim.in_flight + 1) * (lim.latency_ewma or UNKNOWN_LATENCY_SEC)
+
+    def ranked(self) -> List[str]:
+        """Endpoints in routing order: available ones by score (random tie-break), cooling ones last."""
+        now = time.time()
+        keyed = [(self._cooling(e, now), self._score(e), random.random(), e) for e in self.endpoints]
+        return [e for *_, e in sorted(keyed)]
+
+    def _record(self, endpoint: str, ok: bool) -> None:
+        with self._lock:
+            if ok:
+                self._failed_at.pop(endpoint, None)
+            else:
+                self._failed_at[endpoint] = time.time()
+
+    def call(self, fn: Callable[[str], Any]) -> Any:
+        """fn(endpoint) on the best endpoint, failing over in rank order on transient errors; re-raises the last error."""
+        last_exc: BaseException | None = None
+        for ep in self.ranked():
+            try:
+                out = fn(ep)
+            except Exception as e:
+                if not endpoint_limits.is_transient(e):
+                    raise
+                self._record(ep, ok=False)
+                last_exc = e
+                continue
+            self._record(ep, ok=True)
+            return out
+        raise last_exc
+
+    async def acall(self, fn: Callable[[str], Awaitable[Any]]) -> Any:
+        last_exc: BaseException | None = None
+        for ep in self.ranked():
+            try:
+                out = await fn(ep)
+            except Exception as e:
+                if not endpoint_limits.is_transient(e):
+                    raise
+                self._record(ep, ok=False)
+                last_exc = e
+                continue
+            self._record(ep, ok=True)
+            return out
+        raise last_exc
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        now = time.time()
+        return {e: {"score": round(self._score(e), 3), "cooling": self._cooling(e, now)} for e in self.endpoints}
@@ -0,0 +1,137 @@
+# src/fact_sheet.py
+"""
+Per-case reference fact sheets, shared by every candidate judged against the same note.
+
+The fact sheet is a structured list of the reference's clinically material facts:
+diagnoses, staging, biomarkers, regimens, procedures, imaging, dates. It is
+extracted once per reference text (MD note or GT). Later prompts then compare
+candidates against the short sheet instead of re-reading the raw note.
+
+This module only caches and formats; the extraction prompt and call live with the
+other prompt builders in helpers (get_fact_sheet_prompt).
+- In process: FACT_SHEET_CACHE_ENTRIES sheets (LRU). Concurrent requests for the same
+  reference share one extraction, whether they come from threads or coroutines.
+- Across processes: the extraction call goes through llm_cache like any other.
+
+Usage:
+    sheet = fact_sheet.get(md_note, lambda: call_sonnet(get_fact_sheet_prompt(md_note)))
+    sheet = await fact_sheet.aget(md_note, lambda: acall_sonnet(get_fact_sheet_prompt(md_note)))
+    text = fact_sheet.format_sheet(sheet)
+"""
+
+from __future__ import annotations
+from typing import Any, Awaitable, Callable, Dict, List
+from collections import OrderedDict
+import asyncio
+import hashlib
+import os
+import threading
+import weakref
+
+FACT_SHEET_CACHE_ENTRIES = int(os.environ.get("VPP_FACT_SHEET_CACHE_ENTRIES", "256"))
+
+# Fact categories, in the order they are rendered; they follow the precision/recall
+# criticality categories minus the minor ones (vitals, ROS, social, admin)
+CATEGORIES = [
+    "diagnosis", "stage", "biomarker", "treatment", "surgery", "radiation",
+    "imaging", "labs", "adverse_event", "follow_up", "other",
+]
+
+_SHEETS: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+_LOCK = threading.Lock()
+_KEY_LOCKS: "weakref.WeakValueDictionary[str, threading.Lock]" = weakref.WeakValueDictionary()
+_TASKS: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, asyncio.Task]]" = weakref.WeakKeyDictionary()
+
+
+def reference_key(reference_text: str) -> str:
+    return hashlib.sha256((reference_text or "").encode("utf-8")).hexdigest()
+
+
+def normalize(raw: Any) -> Dict[str, Any]:
+    """Validated sheet: {"Facts": [{"category", "text", "date"}], "KeyDates": [...]}; raises ValueError if unusable."""
+    facts = raw.get("Facts") if isinstance(raw, dict) else None
+    if not isinstance(facts, list):
+        raise ValueError("Fact sheet response has no 'Facts' list")
+    out: List[Dict[str, str]] = []
+    for f in facts:
+        if not isinstance(f, dict) or not str(f.get("text", "")).strip():
+            continue
+        cat = str(f.get("category", "other")).strip().lower()
+        out.append({
+            "category": cat if cat in CATEGORIES else "other",
+            "text": str(f["text"]).strip(),
+            "date": str(f.get("date") or "").strip(),
+        })
+    return {"Facts": out, "KeyDates": [str(d) for d in raw.get("KeyDates", []) or []]}
+
+
+def format_sheet(sheet: Dict[str, Any]) -> str:
+    """Fact sheet as compact prompt text, grouped by category."""
+    lines = []
+    for cat in CATEGORIES:
+        items = [f for f in sheet["Facts"] if f["category"] == cat]
+        if not items:
+            continue
+        lines.append(f"{cat.upper()}:")
+        lines += [f"- {f['text']}" + (f" ({f['date']})" if f["date"] else "") for f in items]
+    if sheet.get("KeyDates"):
+        lines.append("KEY DATES: " + "; ".join(sheet["KeyDates"]))
+    return "\n".join(lines) or "(no clinically material facts)"
+
+
+def _lookup(key: str) -> Dict[str, Any] | None:
+    with _LOCK:
+        sheet = _SHEETS.get(key)
+        if sheet is not None:
+            _SHEETS.move_to_end(key)
+        return sheet
+
+
+def _store(key: str, sheet: Dict[str, Any]) -> None:
+    with _LOCK:
+        _SHEETS[key] = sheet
+        _SHEETS.move_to_end(key)
+        while len(_SHEETS) > FACT_SHEET_CACHE_ENTRIES:
+            _SHEETS.popitem(last=False)
+
+
+def get(reference_text: str, extract: Callable[[], Any]) -> Dict[str, Any]:
+    """The cached sheet for reference_text, else normalize(extract()) (one extraction per reference at a time)."""
+    key = reference_key(reference_text)
+    sheet = _lookup(key)
+    if sheet is not None:
+        return sheet
+    with _LOCK:
+        key_lock = _KEY_LOCKS.get(key)
+        if key_lock is None:
+            key_lock = _KEY_LOCKS[key] = threading.Lock()
+    with key_lock:
+        sheet = _lookup(key)
+        if sheet is None:
+            sheet = normalize(extract())
+            _store(key, sheet)
+        return sheet
+
+
+async def aget(reference_text: str, extract: Callable[[], Awaitable[Any]]) -> Dict[str, Any]:
+    key = reference_key(reference_text)
+    sheet = _lookup(key)
+    if sheet is not None:
+        return sheet
+    tasks = _TASKS.setdefault(asyncio.get_running_loop(), {})
+    task = tasks.get(key)
+    if task is None:
+        async def _run():
+            try:
+                sheet = normalize(await extract())
+                _store(key, sheet)
+                return sheet
+            finally:
+                tasks.pop(key, None)
+        task = tasks[key] = asyncio.ensure_future(_run())
+    return await asyncio.shield(task)
+
+
+def clear() -> None:
+    with _LOCK:
+        _SHEETS.clear()
@@ -0,0 +1,136 @@
+# src/http_session.py
+"""
+Shared keep-alive HTTP session for direct REST calls to Databricks
+(serving-endpoint invocations and the OAuth token endpoint).
+
+One process-wide client reuses TCP+TLS connections instead of handshaking on
+every request. The pool is sized for the threaded callers (row workers x bundle
+levels), so connections are kept rather than discarded under parallel load.
+
+- Default: requests.Session with an HTTPAdapter pool (VPP_HTTP_POOL_MAXSIZE).
+- VPP_HTTP2=1: an httpx.Client with HTTP/2 (needs `httpx[http2]`); if that is
+  not installed we fall back to requests.
+- Timeouts: VPP_HTTP_CONNECT_TIMEOUT_SEC / VPP_HTTP_READ_TIMEOUT_SEC, overridable
+  per request via post(..., timeout=...).
+- Async callers: apost() uses an httpx.AsyncClient per event loop (httpx is
+  required for this path), with the same pool sizes and timeouts.
+
+Usage:
+    resp = http_session.post(url, headers=..., json=payload, timeout=120)
+    resp.raise_for_status(); resp.json()
+    resp = await http_session.apost(url, headers=..., json=payload)
+"""
+
+from __future__ import annotations
+from typing import Any, Tuple
+import asyncio
+import os
+import threading
+import weakref
+
+import requests
+from requests.adapters import HTTPAdapter
+
+POOL_CONNECTIONS = int(os.environ.get("VPP_HTTP_POOL_CONNECTIONS", "4"))   # distinct hosts kept
+POOL_MAXSIZE = int(os.environ.get("VPP_HTTP_POOL_MAXSIZE", "64"))          # connections per host
+CONNECT_TIMEOUT_SEC = float(os.environ.get("VPP_HTTP_CONNECT_TIMEOUT_SEC", "10"))
+READ_TIMEOUT_SEC = float(os.environ.get("VPP_HTTP_READ_TIMEOUT_SEC", "60"))
+USE_HTTP2 = os.environ.get("VPP_HTTP2", "0").lower() in ("1", "true", "yes")
+
+_CLIENT: Any = None
+_LOCK = threading.Lock()
+_ASYNC_CLIENTS: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Any]" = weakref.WeakKeyDictionary()
+
+
+def _build_requests_session() -> requests.Session:
+    s = requests.Session()
+    adapter = HTTPAdapter(pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE)
+    s.mount("https://", adapter)
+    s.mount("http://", adapter)
+    return s
+
+
+def _httpx_kwargs(http2: bool) -> dict:
+    import httpx
+    return {
+        "http2": http2,
+        "limits": httpx.Limits(max_connections=POOL_MAXSIZE, max_keepalive_connections=POOL_MAXSIZE),
+        "timeout": httpx.Timeout(READ_TIMEOUT_SEC, connect=CONNECT_TIMEOUT_SEC),
+    }
+
+
+def _build_httpx_client() -> Any:
+    import httpx  # optional dependency
+    import h2  # noqa: F401  (httpx needs it for http2=True)
+    return httpx.Client(**_httpx_kwargs(http2=True))
+
+
+def _has_h2() -> bool:
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def client() -> Any:
+    """The shared client, built on first use."""
+    global _CLIENT
+    if _CLIENT is None:
+        with _LOCK:
+            if _CLIENT is None:
+                if USE_HTTP2:
+                    try:
+                        _CLIENT = _build_httpx_client()
+                    except ImportError:
+                        print("WARNING: VPP_HTTP2=1 but httpx[http2] is not installed; using requests")
+                if _CLIENT is None:
+                    _CLIENT = _build_requests_session()
+    return _CLIENT
+
+
+def async_client() -> Any:
+    """The httpx.AsyncClient bound to the running event loop, built on first use."""
+    import httpx  # required for the async path
+    loop = asyncio.get_running_loop()
+    c = _ASYNC_CLIENTS.get(loop)
+    if c is None:
+        c = _ASYNC_CLIENTS[loop] = httpx.AsyncClient(**_httpx_kwargs(http2=USE_HTTP2 and _has_h2()))
+    return c
+
+
+def _timeout(timeout: float | Tuple[float, float] | None, use_httpx: bool) -> Any:
+    if isinstance(timeout, tuple):
+        connect, read = timeout
+    else:
+        connect, read = CONNECT_TIMEOUT_SEC, (READ_TIMEOUT_SEC if timeout is None else float(timeout))
+    if not use_httpx:
+        return (connect, read)
+    import httpx
+    return httpx.Timeout(read, connect=connect)
+
+
+def post(url: str, *, timeout: float | Tuple[float, float] | None = None, **kwargs) -> Any:
+    """POST through the pooled client. timeout: read seconds, or (connect, read); None uses the defaults."""
+    c = client()
+    return c.post(url, timeout=_timeout(timeout, use_httpx=not isinstance(c, requests.Session)), **kwargs)
+
+
+async def apost(url: str, *, timeout: float | Tuple[float, float] | None = None, **kwargs) -> Any:
+    """Async POST on the running loop's pooled AsyncClient; same timeout semantics as post()."""
+    return await async_client().post(url, timeout=_timeout(timeout, use_httpx=True), **kwargs)
+
+
+def close() -> None:
+    global _CLIENT
+    with _LOCK:
+        if _CLIENT is not None:
+            _CLIENT.close()
+            _CLIENT = None
+
+
+async def aclose() -> None:
+    """Close the running loop's AsyncClient (call before the loop shuts down)."""
+    c = _ASYNC_CLIENTS.pop(asyncio.get_running_loop(), None)
+    if c is not None:
+        await c.aclose()
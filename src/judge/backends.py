@@ -8,13 +8,23 @@ Requires:
     structural_checks(vpp_text) -> dict
     judge_closeness_multi(candidate_text, gt_text) -> dict
     judge_pairwise_multi(candA_text, candB_text, gt_text, labelA, labelB) -> dict
+    judge_closeness_cascade / judge_pairwise_cascade (used when VPP_JUDGE_MODE=cascade)
+    judge_closeness_batch(candidate_texts, gt_text) -> list[dict]
 """
 
-from typing import Dict, Any
+from typing import Dict, Any, List
 import json
 
 from helpers import evaluate_row_with_unified_reporting
-from judge.text_only_utils import structural_checks, judge_closeness_multi, judge_pairwise_multi
+from judge import text_only_utils
+from judge.text_only_utils import (
+    structural_checks,
+    judge_closeness_multi,
+    judge_pairwise_multi,
+    judge_closeness_cascade,
+    judge_pairwise_cascade,
+    judge_closeness_batch,
+)
 
 
 def _safe_float(x):
@@ -38,13 +48,31 @@ def run_objective(payload: Dict[str, Any]) -> Dict[str, Any]:
     cand = payload["generated"]["text"]
     gt = payload["ground_truth"]["text"]
 
-    close = judge_closeness_multi(cand, gt)  # {"closeness","rationale","n_judges","details",...}
-    S = structural_checks(cand)
+    if text_only_utils.JUDGE_MODE == "cascade":
+        close = judge_closeness_cascade(cand, gt)
+    else:
+        close = judge_closeness_multi(cand, gt)  # {"closeness","rationale","n_judges","details",...}
+    return _objective_row(cand, close)
+
 
+def run_objective_batch(payloads: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Objective judge for several candidates that share one ground truth: each judge
+    scores all of them in a single call. Returns one run_objective-shaped dict per payload.
+    """
+    gt = payloads[0]["ground_truth"]["text"]
+    cands = [p["generated"]["text"] for p in payloads]
+    closes = judge_closeness_batch(cands, gt)
+    return [_objective_row(cand, close) for cand, close in zip(cands, closes)]
+
+
+def _objective_row(cand: str, close: Dict[str, Any]) -> Dict[str, Any]:
+    S = structural_checks(cand)
     return {
         "obj_closeness": _safe_float(close.get("closeness")),
         "obj_rationale": _truncate(close.get("rationale", ""), 2000),
         "obj_n_judges": int(close.get("n_judges", 0) or 0),
+        "obj_judge_path": close.get("path"),
         "obj_details_json": _truncate(json.dumps(close.get("details", []), ensure_ascii=False), 6000),
         "obj_has_brief": int(S.get("has_brief", 0)),
         "obj_has_history": int(S.get("has_history", 0)),
@@ -62,7 +90,10 @@ def run_subjective_pairwise(payload: Dict[str, Any]) -> Dict[str, Any]:
     B = payload["compare"]["b"]["text"]
     gt = payload.get("ground_truth", {}).get("text", "")  # optional context
 
-    res = judge_pairwise_multi(A, B, gt, "A", "B")
+    if text_only_utils.JUDGE_MODE == "cascade":
+        res = judge_pairwise_cascade(A, B, gt, "A", "B")
+    else:
+        res = judge_pairwise_multi(A, B, gt, "A", "B")
     return {
         "subj_preferred": res.get("preferred"),
         "subj_score_a": _safe_float(res.get("scoreA")),
@@ -70,6 +101,7 @@ def run_subjective_pairwise(payload: Dict[str, Any]) -> Dict[str, Any]:
         "subj_vppcomp_a": _safe_float(res.get("compA")),
         "subj_vppcomp_b": _safe_float(res.get("compB")),
         "subj_n_judges": int(res.get("n_judges", 0) or 0),
+        "subj_judge_path": res.get("path"),
         "subj_details_json": _truncate(json.dumps(res.get("details", []), ensure_ascii=False), 6000),
     }
 
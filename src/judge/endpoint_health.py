@@ -0,0 +1,58 @@
+# src/judge/endpoint_health.py
+"""
+Lazy health registry for judge serving endpoints.
+
+Nothing is probed at import time. The first call to healthy() probes every
+endpoint whose status is unknown or older than the TTL, in parallel, and caches
+the result. This only validates that an endpoint exists and answers; failures
+during a run are handled by the per-endpoint circuit breaker (resilience.py).
+"""
+
+from __future__ import annotations
+from typing import Callable, Dict, List, Any
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import time
+
+DEFAULT_TTL_SEC = 600.0
+
+
+class EndpointHealth:
+    def __init__(
+        self,
+        endpoints: List[str],
+        probe: Callable[[str], bool],
+        ttl_sec: float = DEFAULT_TTL_SEC,
+    ):
+        self.endpoints = list(endpoints)
+        self.probe = probe
+        self.ttl_sec = ttl_sec
+        # endpoint -> {"ok": bool, "checked_at": float}
+        self._status: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def _is_stale(self, endpoint: str, now: float) -> bool:
+        st = self._status.get(endpoint)
+        return st is None or (now - st["checked_at"]) > self.ttl_sec
+
+    def _refresh(self, endpoints: List[str]) -> None:
+        now = time.time()
+        stale = [e for e in endpoints if self._is_stale(e, now)]
+        if not stale:
+            return
+        with ThreadPoolExecutor(max_workers=len(stale)) as pool:
+            oks = list(pool.map(self.probe, stale))
+        now = time.time()
+        for e, ok in zip(stale, oks):
+            self._status[e] = {"ok": bool(ok), "checked_at": now}
+
+    def healthy(self, endpoints: List[str] | None = None) -> List[str]:
+        """Usable endpoints among `endpoints` (default: the registered list), in the given order."""
+        targets = list(endpoints) if endpoints is not None else self.endpoints
+        with self._lock:  # one thread probes; concurrent callers wait for its result
+            self._refresh(targets)
+            return [e for e in targets if self._status[e]["ok"]]
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return {e: dict(st) for e, st in self._status.items()}
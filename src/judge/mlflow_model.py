@@ -9,17 +9,39 @@ MLflow pyfunc wrapper for the VPP Judge.
 
 - Self-routing via io_schema.decide_modes
 - Defensive per-row error capture so one bad row doesn't fail the batch
+- Rows are judged concurrently on a bounded thread pool (VPP_JUDGE_ROW_WORKERS,
+  default 8; set to 1 for strictly sequential execution). Output order always
+  matches input order.
+- Each row reports how many of its LLM calls were served from llm_cache
+  (cache_hits / cache_misses).
+- Optional batched objective mode (VPP_JUDGE_BATCH_OBJECTIVE=1, ensemble mode
+  only): objective-only rows that share a ground truth are scored together, one
+  judge call per group instead of one per row. A batch's cache counters are
+  split evenly over its rows (split_counts), so column sums stay correct.
 """
 
 from typing import List, Dict, Any
+from concurrent.futures import ThreadPoolExecutor
 import mlflow
 import mlflow.pyfunc
 import pandas as pd
 import json
+import os
 import time
 
+import llm_cache
+from judge import text_only_utils
 from judge.io_schema import decide_modes
-from judge.backends import run_objective, run_subjective_pairwise, run_subjective_single
+from judge.backends import run_objective, run_objective_batch, run_subjective_pairwise, run_subjective_single
+
+DEFAULT_ROW_WORKERS = 8
+BATCH_OBJECTIVE = os.environ.get("VPP_JUDGE_BATCH_OBJECTIVE", "0").lower() in ("1", "true", "yes")
+
+
+def split_counts(total: int, n: int) -> List[int]:
+    """total spread over n rows as evenly as integers allow (the first rows take the remainder)."""
+    q, r = divmod(total, n)
+    return [q + (k < r) for k in range(n)]
 
 
 class VPPJudge(mlflow.pyfunc.PythonModel):
@@ -29,6 +51,8 @@ class VPPJudge(mlflow.pyfunc.PythonModel):
         do it here and stash in self. Keep minimal for v1.
         """
         self.loaded = True
+        self.max_workers = int(os.environ.get("VPP_JUDGE_ROW_WORKERS", DEFAULT_ROW_WORKERS))
+        self.batch_objective = BATCH_OBJECTIVE
 
     def _predict_row(self, inputs_json: str, route_hint: str | None) -> Dict[str, Any]:
         t0 = time.time()
@@ -36,35 +60,93 @@ class VPPJudge(mlflow.pyfunc.PythonModel):
         modes = decide_modes(route_hint, payload)
 
         out: Dict[str, Any] = {"route": ",".join(modes)}
-        # Objective judge
-        if "objective" in modes:
-            out.update(run_objective(payload))
-        # Subjective pairwise judge
-        if "subjective" in modes:
-            out.update(run_subjective_pairwise(payload))
-        # Subjective single-note judge
-        if "subjective_single" in modes:
-            out.update(run_subjective_single(payload))
+        with llm_cache.track() as cache_stats:
+            # Objective judge
+            if "objective" in modes:
+                out.update(run_objective(payload))
+            # Subjective pairwise judge
+            if "subjective" in modes:
+                out.update(run_subjective_pairwise(payload))
+            # Subjective single-note judge
+            if "subjective_single" in modes:
+                out.update(run_subjective_single(payload))
 
+        out["cache_hits"] = cache_stats.hits
+        out["cache_misses"] = cache_stats.misses
         out["elapsed_total_sec"] = float(time.time() - t0)
         out["error_code"] = None
         out["error_msg"] = None
         return out
 
-    def predict(self, context, df: pd.DataFrame) -> pd.DataFrame:
-        results: List[Dict[str, Any]] = []
-        for _, row in df.iterrows():
+    def _safe_predict_row(self, row: pd.Series) -> Dict[str, Any]:
+        try:
+            inputs_json = row.get("inputs_json")
+            if not isinstance(inputs_json, str) or not inputs_json.strip():
+                raise ValueError("inputs_json must be a non-empty JSON string")
+            route_hint = row.get("route_hint")
+            return self._predict_row(inputs_json, route_hint)
+        except Exception as e:
+            return {
+                "route": None,
+                "elapsed_total_sec": 0.0,
+                "error_code": "ROW_FAILED",
+                "error_msg": str(e)[:1000],
+            }
+
+    def _objective_groups(self, rows: List[pd.Series]) -> List[List[int]]:
+        """Indices of objective-only rows grouped by ground-truth text; singletons are dropped."""
+        groups: Dict[str, List[int]] = {}
+        for i, row in enumerate(rows):
             try:
-                inputs_json = row.get("inputs_json")
-                if not isinstance(inputs_json, str) or not inputs_json.strip():
-                    raise ValueError("inputs_json must be a non-empty JSON string")
-                route_hint = row.get("route_hint")
-                results.append(self._predict_row(inputs_json, route_hint))
-            except Exception as e:
-                results.append({
-                    "route": None,
-                    "elapsed_total_sec": 0.0,
-                    "error_code": "ROW_FAILED",
-                    "error_msg": str(e)[:1000],
-                })
+                payload = json.loads(row.get("inputs_json"))
+                if decide_modes(row.get("route_hint"), payload) != ["objective"]:
+                    continue
+                groups.setdefault(payload["ground_truth"]["text"], []).append(i)
+            except Exception:
+                continue  # malformed rows take the per-row path and fail there
+        return [idx for idx in groups.values() if len(idx) > 1]
+
+    def _safe_predict_batch(self, rows: List[pd.Series]) -> List[Dict[str, Any]]:
+        t0 = time.time()
+        try:
+            payloads = [json.loads(row.get("inputs_json")) for row in rows]
+            with llm_cache.track() as cache_stats:
+                outs = run_objective_batch(payloads)
+        except Exception:
+            # fall back to judging the rows one by one so errors stay per-row
+            return [self._safe_predict_row(row) for row in rows]
+        elapsed = float(time.time() - t0)
+        hits, misses = split_counts(cache_stats.hits, len(outs)), split_counts(cache_stats.misses, len(outs))
+        for k, out in enumerate(outs):
+            out["route"] = "objective"
+            out["cache_hits"] = hits[k]
+            out["cache_misses"] = misses[k]
+            out["elapsed_total_sec"] = elapsed
+            out["error_code"] = None
+            out["error_msg"] = None
+        return outs
+
+    def predict(self, context, df: pd.DataFrame) -> pd.DataFrame:
+        rows = [row for _, row in df.iterrows()]
+        max_workers = int(getattr(self, "max_workers", DEFAULT_ROW_WORKERS) or 1)
+
+        batches: List[List[int]] = []
+        if getattr(self, "batch_objective", BATCH_OBJECTIVE) and text_only_utils.JUDGE_MODE != "cascade":
+            batches = self._objective_groups(rows)
+        batched = {i for idx in batches for i in idx}
+        singles = [i for i in range(len(rows)) if i not in batched]
+
+        # each task returns [(row index, result), ...]; results are placed by index to keep input order
+        tasks = [lambda idx=idx: list(zip(idx, self._safe_predict_batch([rows[i] for i in idx]))) for idx in batches]
+        tasks += [lambda i=i: [(i, self._safe_predict_row(rows[i]))] for i in singles]
+
+        results: List[Dict[str, Any]] = [{} for _ in rows]
+        if max_workers <= 1 or len(tasks) <= 1:
+            done = [task() for task in tasks]
+        else:
+            with ThreadPoolExecutor(max_workers=min(max_workers, len(tasks))) as pool:
+                done = list(pool.map(lambda task: task(), tasks))
+        for pairs in done:
+            for i, res in pairs:
+                results[i] = res
         return pd.DataFrame(results)
@@ -0,0 +1,231 @@
+# src/judge/resilience.py
+"""
+Tail-latency and failure protection for judge endpoint calls.
+
+- Hedged requests: if a call has not returned after the endpoint's recent p95
+  latency, a duplicate is fired and whichever finishes first wins. Every attempt
+  holds an endpoint_limits slot; the hedge timer and the latency samples start
+  once the request is sent, not while it waits for a slot, and a hedge only fires
+  if a slot is free right away (a saturated endpoint is not sent more traffic).
+- Circuit breaker per endpoint: after BREAKER_FAILURES consecutive failures the
+  endpoint is short-circuited for BREAKER_COOLDOWN_SEC, then a single probe call
+  is let through (half-open) to decide whether to close it again.
+- Global retry budget: hedges and retries spend tokens that are only earned by
+  primary requests (RETRY_BUDGET_RATIO per request), so a degraded workspace
+  cannot trigger a retry storm.
+
+Only transient errors (endpoint_limits.is_transient: 429/5xx, connection, timeout)
+count against the breaker and are retried. A client error such as a 400 or a
+parse failure is raised at once: the endpoint answered, so it is healthy.
+
+Entry point: call(endpoint, fn) where fn() performs one request.
+"""
+
+from __future__ import annotations
+from typing import Any, Callable, Dict
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+import contextvars
+import threading
+import time
+
+import endpoint_limits
+
+HEDGE_MIN_DELAY_SEC = 2.0       # never hedge earlier than this
+HEDGE_DEFAULT_DELAY_SEC = 20.0  # used until an endpoint has enough latency samples
+HEDGE_MIN_SAMPLES = 20
+LATENCY_WINDOW = 200
+
+BREAKER_FAILURES = 5
+BREAKER_COOLDOWN_SEC = 30.0
+
+RETRY_BUDGET_RATIO = 0.1   # tokens earned per primary request
+RETRY_BUDGET_MAX = 20.0    # cap on banked tokens
+MAX_RETRIES = 1
+
+# Shared pool for primary + hedged attempts; a losing attempt finishes in the background.
+_POOL = ThreadPoolExecutor(max_workers=64, thread_name_prefix="judge-hedge")
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised without calling the endpoint while its breaker is open."""
+
+
+class LatencyTracker:
+    def __init__(self, window: int = LATENCY_WINDOW):
+        self._samples: deque = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def add(self, sec: float) -> None:
+        with self._lock:
+            self._samples.append(sec)
+
+    def p95(self) -> float | None:
+        with self._lock:
+            if len(self._samples) < HEDGE_MIN_SAMPLES:
+                return None
+            xs = sorted(self._samples)
+        return xs[min(len(xs) - 1, int(0.95 * len(xs)))]
+
+
+class CircuitBreaker:
+    def __init__(self, failures: int = BREAKER_FAILURES, cooldown_sec: float = BREAKER_COOLDOWN_SEC):
+        self.failures_to_open = failures
+        self.cooldown_sec = cooldown_sec
+        self.state = "closed"  # closed | open | half_open
+        self.failures = 0
+        self.opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def is_open(self) -> bool:
+        """True while traffic should be kept away: open and still cooling down, or half-open with the probe in flight."""
+        with self._lock:
+            if self.state == "half_open":
+                return True
+            return self.state == "open" and time.time() - self.opened_at < self.cooldown_sec
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open" and time.time() - self.opened_at >= self.cooldown_sec:
+                self.state = "half_open"  # let exactly one probe through
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.state = "closed"
+            self.failures = 0
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self.state == "half_open" or self.failures >= self.failures_to_open:
+                self.state = "open"
+                self.opened_at = time.time()
+
+
+class RetryBudget:
+    def __init__(self, ratio: float = RETRY_BUDGET_RATIO, max_tokens: float = RETRY_BUDGET_MAX):
+        self.ratio = ratio
+        self.max_tokens = max_tokens
+        self.tokens = max_tokens
+        self._lock = threading.Lock()
+
+    def deposit(self) -> None:
+        with self._lock:
+            self.tokens = min(self.max_tokens, self.tokens + self.ratio)
+
+    def refund(self) -> None:
+        with self._lock:
+            self.tokens = min(self.max_tokens, self.tokens + 1.0)
+
+    def withdraw(self) -> bool:
+        with self._lock:
+            if self.tokens >= 1.0:
+                self.tokens -= 1.0
+                return True
+            return False
+
+
+_LATENCY: Dict[str, LatencyTracker] = {}
+_BREAKERS: Dict[str, CircuitBreaker] = {}
+_REGISTRY_LOCK = threading.Lock()
+RETRY_BUDGET = RetryBudget()
+
+
+def _latency(endpoint: str) -> LatencyTracker:
+    with _REGISTRY_LOCK:
+        return _LATENCY.setdefault(endpoint, LatencyTracker())
+
+
+def breaker(endpoint: str) -> CircuitBreaker:
+    with _REGISTRY_LOCK:
+        return _BREAKERS.setdefault(endpoint, CircuitBreaker())
+
+
+def hedge_delay(endpoint: str) -> float:
+    p95 = _latency(endpoint).p95()
+    return max(HEDGE_MIN_DELAY_SEC, p95 if p95 is not None else HEDGE_DEFAULT_DELAY_SEC)
+
+
+class _NoSlot(Exception):
+    """A hedge found the endpoint at its concurrency limit and was not sent."""
+
+
+def _send(endpoint: str, fn: Callable[[], Any], sent: threading.Event | None, block: bool) -> tuple:
+    """fn() inside an endpoint_limits slot; returns (result, seconds since the request was sent)."""
+    with endpoint_limits.slot(endpoint, block=block) as acquired:
+        if not acquired:
+            raise _NoSlot()
+        if sent is not None:
+            sent.set()
+        t0 = time.time()
+        return fn(), time.time() - t0
+
+
+def _hedged_attempt(endpoint: str, fn: Callable[[], Any]) -> Any:
+    """One logical attempt: primary call plus at most one hedge; first success wins."""
+    sent = threading.Event()
+    primary = _POOL.submit(contextvars.copy_context().run, _send, endpoint, fn, sent, True)
+    futs = [primary]
+    # the hedge clock starts once the primary is in flight; queueing for a slot isn't slowness
+    while not sent.wait(0.05) and not primary.done():
+        pass
+    done, _ = wait(futs, timeout=hedge_delay(endpoint))
+    if not done and RETRY_BUDGET.withdraw():
+        futs.append(_POOL.submit(contextvars.copy_context().run, _send, endpoint, fn, None, False))
+    pending = set(futs)
+    last_exc: BaseException | None = None
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for f in done:
+            exc = f.exception()
+            if exc is None:
+                out, sec = f.result()
+                _latency(endpoint).add(sec)
+                return out
+            if isinstance(exc, _NoSlot):
+                RETRY_BUDGET.refund()
+                continue
+            last_exc = exc
+    raise last_exc  # every attempt failed
+
+
+def call(endpoint: str, fn: Callable[[], Any]) -> Any:
+    """
+    Run fn() against `endpoint` with circuit breaking, hedging and budgeted retries.
+    Raises CircuitOpenError only if the breaker is open before the first attempt;
+    otherwise the last attempt's own exception.
+    """
+    br = breaker(endpoint)
+    RETRY_BUDGET.deposit()
+    if not br.allow():
+        raise CircuitOpenError(f"circuit open for {endpoint}")
+    attempt = 0
+    while True:
+        try:
+            out = _hedged_attempt(endpoint, fn)
+        except Exception as e:
+            if not endpoint_limits.is_transient(e):
+                br.record_success()
+                raise
+            br.record_failure()
+            if attempt < MAX_RETRIES and br.allow() and RETRY_BUDGET.withdraw():
+                attempt += 1
+                continue
+            raise
+        br.record_success()
+        return out
+
+
+def snapshot() -> Dict[str, Any]:
+    with _REGISTRY_LOCK:
+        eps = set(_LATENCY) | set(_BREAKERS)
+    return {
+        "retry_budget_tokens": round(RETRY_BUDGET.tokens, 2),
+        "endpoints": {
+            e: {"breaker": breaker(e).state, "p95_sec": _latency(e).p95()} for e in sorted(eps)
+        },
+    }
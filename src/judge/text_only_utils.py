@@ -4,6 +4,12 @@ Utilities used by the VPP Judge:
 - structural_checks(vpp_text)
 - judge_closeness_multi(candidate_text, gt_text)
 - judge_pairwise_multi(candA_text, candB_text, gt_text, labelA, labelB)
+- judge_closeness_cascade / judge_pairwise_cascade: cheap judge first, ensemble on doubt
+- judge_closeness_batch(candidate_texts, gt_text): several candidates per judge call
+
+Judge endpoints are validated lazily on first use (see endpoint_health.py);
+individual calls are hedged and circuit-broken per endpoint (see resilience.py)
+and admitted through the shared AIMD concurrency limits (see endpoint_limits.py).
 
 This module depends on:
   - databricks-langchain
@@ -11,8 +17,9 @@ This module depends on:
 """
 
 from __future__ import annotations
-from typing import Dict, Any, Tuple, List
-import json, re, time
+from typing import Dict, Any, Tuple, List, Callable
+from concurrent.futures import ThreadPoolExecutor
+import contextvars, json, os, re, threading, time
 
 # from databricks_langchain import ChatDatabricks   # <-- remove
 from langchain_community.chat_models import ChatDatabricks
@@ -22,6 +29,11 @@ from langchain_core.prompts import (
     HumanMessagePromptTemplate,
 )
 
+import llm_cache
+import token_budget
+from judge import resilience
+from judge.endpoint_health import EndpointHealth
+
 # =========================
 # Basic helpers / constants
 # =========================
@@ -39,6 +51,35 @@ def _clamp_len(s: str | None, n: int) -> str:
 
 JUDGE_MAX_TOKENS = 2500
 
+# "terse" caps rationale/explanation text in the judge templates (same keys and scores);
+# shared with bundle_prompts.OUTPUT_PROFILE through VPP_OUTPUT_PROFILE
+OUTPUT_PROFILE = os.environ.get("VPP_OUTPUT_PROFILE", "full").strip().lower()
+TERSE_RATIONALE_WORDS = 15
+
+def _text_spec(kind: str = "string") -> str:
+    return f"{kind}, at most {TERSE_RATIONALE_WORDS} words" if OUTPUT_PROFILE == "terse" else kind
+
+# Upper bound on in-flight judge calls for a single row (one per ensemble member).
+JUDGE_MAX_WORKERS = 3
+
+# Early stopping: skip the remaining judges once the outcome can no longer change
+# (pairwise) or the first CLOSENESS_MIN_JUDGES scores agree within CLOSENESS_STOP_SPREAD.
+# Off by default; set VPP_JUDGE_EARLY_STOP=1 to opt in.
+EARLY_STOP = os.environ.get("VPP_JUDGE_EARLY_STOP", "0").strip().lower() in {"1", "true", "yes"}
+CLOSENESS_MIN_JUDGES = 2
+CLOSENESS_STOP_SPREAD = 0.1
+
+# Cascade mode (VPP_JUDGE_MODE=cascade): CASCADE_ENDPOINTS[0] judges alone and the
+# remaining endpoints are only consulted when its output is unparseable, its
+# closeness falls inside CASCADE_AMBIGUOUS_BAND, or its pairwise preference is a tie.
+JUDGE_MODE = os.environ.get("VPP_JUDGE_MODE", "ensemble").strip().lower()
+CASCADE_ENDPOINTS: List[str] = [
+    "databricks-meta-llama-3-3-70b-instruct",
+    "databricks-claude-3-7-sonnet",
+    "databricks-claude-sonnet-4",
+]
+CASCADE_AMBIGUOUS_BAND: Tuple[float, float] = (0.4, 0.75)
+
 # Candidate judge endpoints to try (order matters). Adjust as needed for your workspace.
 JUDGE_ENDPOINTS: List[str] = [
     "databricks-claude-3-7-sonnet",
@@ -46,8 +87,29 @@ JUDGE_ENDPOINTS: List[str] = [
     "databricks-meta-llama-3-3-70b-instruct",
 ]
 
+# One shared client per endpoint, so concurrent rows reuse its HTTP connections.
+_JUDGE_CLIENTS: Dict[str, Any] = {}
+_JUDGE_CLIENTS_LOCK = threading.Lock()
+
 def get_judge(endpoint: str):
-    return ChatDatabricks(endpoint=endpoint, temperature=0.0, max_tokens=JUDGE_MAX_TOKENS)
+    with _JUDGE_CLIENTS_LOCK:
+        model = _JUDGE_CLIENTS.get(endpoint)
+        if model is None:
+            model = ChatDatabricks(endpoint=endpoint, temperature=0.0, max_tokens=JUDGE_MAX_TOKENS)
+            _JUDGE_CLIENTS[endpoint] = model
+        return model
+
+# Compiled (prompt, prompt|model chain) pairs, keyed by (kind, endpoint, *labels).
+_CHAINS: Dict[Tuple[str, ...], Any] = {}
+_CHAINS_LOCK = threading.Lock()
+
+def _cached_chain(key: Tuple[str, ...], build: Callable[[], Any]):
+    with _CHAINS_LOCK:
+        chain = _CHAINS.get(key)
+        if chain is None:
+            chain = build()
+            _CHAINS[key] = chain
+        return chain
 
 def _validate_endpoint(endpoint: str) -> bool:
     try:
@@ -57,11 +119,84 @@ def _validate_endpoint(endpoint: str) -> bool:
     except Exception:
         return False
 
-# Build a validated list once on import.
-_VALID_JUDGES: List[str] = [e for e in JUDGE_ENDPOINTS if _validate_endpoint(e)]
-if not _VALID_JUDGES:
-    # last-ditch fallback; if this also doesn't exist in your workspace, replace it
-    _VALID_JUDGES = ["databricks-claude-3-7-sonnet"]
+# Endpoints are validated lazily (and in parallel) on first use, not on import.
+_HEALTH = EndpointHealth(JUDGE_ENDPOINTS, _validate_endpoint)
+
+# last-ditch fallback; if this also doesn't exist in your workspace, replace it
+_FALLBACK_JUDGE = "databricks-claude-3-7-sonnet"
+
+def _routable(endpoints: List[str]) -> List[str]:
+    """Validated endpoints whose circuit breaker is closed or ready for its half-open probe."""
+    return [e for e in _HEALTH.healthy(endpoints) if not resilience.breaker(e).is_open()]
+
+def _valid_judges() -> List[str]:
+    return _routable(JUDGE_ENDPOINTS) or [_FALLBACK_JUDGE]
+
+def _invoke(compiled: Tuple[Any, Any], inputs: Dict[str, Any], judge_endpoint: str) -> str:
+    """
+    Invoke a compiled (prompt, chain) pair and return the raw response text.
+    The rendered prompt is token-preflighted first (token_budget.PromptTooLargeError
+    if it cannot fit the judge's context window).
+    Responses are served from / written to llm_cache, keyed on the rendered prompt;
+    live calls go through resilience.call, whose circuit breaker is the only
+    mid-run health signal.
+    """
+    prompt, chain = compiled
+    rendered = [[m.type, m.content] for m in prompt.format_messages(**inputs)]
+    # judge clients have a fixed max_tokens, so the whole JUDGE_MAX_TOKENS must still fit
+    token_budget.preflight(rendered, judge_endpoint, JUDGE_MAX_TOKENS, label=f"judge {judge_endpoint}",
+                           min_output=JUDGE_MAX_TOKENS)
+    key = None
+    if not llm_cache.bypassed():
+        key = llm_cache.make_key(judge_endpoint, rendered, 0.0, JUDGE_MAX_TOKENS)
+        hit = llm_cache.get(key)
+        if hit is not None:
+            return hit
+    out = resilience.call(judge_endpoint, lambda: chain.invoke(inputs))  # takes the endpoint_limits slot
+    raw = (out.content or "").strip()
+    if key is not None and re.search(r"\{.*\}", raw, re.S):
+        llm_cache.put(key, raw)  # only keep responses that carry a JSON payload
+    return raw
+
+
+def _fan_out(fn: Callable[[str], Any], judges: List[str]) -> Tuple[List[Any], float]:
+    """
+    Call fn(judge_endpoint) for every judge concurrently.
+    Returns (results in the same order as `judges`, wall-clock seconds).
+    """
+    t0 = time.time()
+    if len(judges) <= 1:
+        results = [fn(je) for je in judges]
+    else:
+        with ThreadPoolExecutor(max_workers=min(JUDGE_MAX_WORKERS, len(judges))) as pool:
+            # each task runs in a copy of the caller's context so llm_cache.track() scopes still count
+            futs = [pool.submit(contextvars.copy_context().run, fn, je) for je in judges]
+            results = [f.result() for f in futs]
+    return results, time.time() - t0
+
+
+def _fan_out_staged(
+    fn: Callable[[str], Any],
+    judges: List[str],
+    first_n: int,
+    done: Callable[[List[Any], int], bool],
+) -> Tuple[List[Any], List[str], float]:
+    """
+    Run the first `first_n` judges concurrently, then the rest only if
+    done(results_so_far, n_remaining) is False.
+    Returns (results for the judges that ran, in order, skipped judges, wall-clock seconds).
+    """
+    t0 = time.time()
+    head, tail = judges[:first_n], judges[first_n:]
+    results, _ = _fan_out(fn, head)
+    skipped: List[str] = []
+    if tail:
+        if done(results, len(tail)):
+            skipped = tail
+        else:
+            more, _ = _fan_out(fn, tail)
+            results = results + more
+    return results, skipped, time.time() - t0
 
 
 # =========================
@@ -99,19 +234,20 @@ def structural_checks(vpp: str) -> Dict[str, int]:
 CLOSE_SYS = SystemMessagePromptTemplate.from_template(
     "Score closeness (0.0–1.0) of the candidate VPP note to the ground-truth VPP text. "
     "Consider structure, key diagnoses, treatments, dates, and timeline accuracy. "
-    "Return JSON ONLY with keys 'closeness' (float) and 'rationale' (string)."
+    f"Return JSON ONLY with keys 'closeness' (float) and 'rationale' ({_text_spec()})."
 )
 CLOSE_HUM = HumanMessagePromptTemplate.from_template(
     "GROUND TRUTH VPP:\n{gt}\n\nCANDIDATE (VPP):\n{cand}\n\nRespond with strict JSON only."
 )
 CLOSE_PROMPT = ChatPromptTemplate.from_messages([CLOSE_SYS, CLOSE_HUM])
 
+def _closeness_chain(judge_endpoint: str):
+    return _cached_chain(("closeness", judge_endpoint), lambda: (CLOSE_PROMPT, CLOSE_PROMPT | get_judge(judge_endpoint)))
+
 def _judge_closeness_one(candidate: str, gt_text: str, judge_endpoint: str) -> Tuple[float | None, str, float]:
     t0 = time.time()
     try:
-        model = get_judge(judge_endpoint)
-        out = (CLOSE_PROMPT | model).invoke({"gt": gt_text, "cand": candidate})
-        raw = (out.content or "").strip()
+        raw = _invoke(_closeness_chain(judge_endpoint), {"gt": gt_text, "cand": candidate}, judge_endpoint)
         m = re.search(r"\{.*\}", raw, re.S)
         closeness, rationale = None, ""
         if m:
@@ -122,31 +258,176 @@ def _judge_closeness_one(candidate: str, gt_text: str, judge_endpoint: str) -> T
         closeness, rationale = None, f"judge error: {str(e)[:200]}"
     return closeness, rationale, time.time() - t0
 
-def judge_closeness_multi(candidate: str, gt_text: str) -> Dict[str, Any]:
+def _closeness_settled(outs: List[Tuple[float | None, str, float]], n_remaining: int) -> bool:
+    vals = [c for c, _, _ in outs]
+    if not vals or any(c is None for c in vals):
+        return False
+    return (max(vals) - min(vals)) <= CLOSENESS_STOP_SPREAD
+
+def _aggregate_closeness(
+    judges: List[str],
+    outs: List[Tuple[float | None, str, float]],
+    skipped: List[str],
+    wall_sec: float,
+    extra: List[Dict[str, Any]] | None = None,
+) -> Dict[str, Any]:
     per_judge = []
     vals: List[float] = []
     total_sec = 0.0
-    for je in _VALID_JUDGES:
-        c, r, sec = _judge_closeness_one(candidate, gt_text, je)
+    for i, (je, (c, r, sec)) in enumerate(zip(judges, outs)):
         total_sec += sec
         per_judge.append({
             "judge_endpoint": je,
             "closeness": c,
             "elapsed_sec": sec,
             "rationale": _clamp_len(r, 1000),
+            **(extra[i] if extra else {}),
         })
         if c is not None:
             vals.append(float(c))
     agg = float(sum(vals)/len(vals)) if vals else None
     rationale = " | ".join([pj["rationale"] for pj in per_judge if pj.get("rationale")][:2])
+    for je in skipped:
+        per_judge.append({"judge_endpoint": je, "skipped": True,
+                          "reason": f"closeness spread <= {CLOSENESS_STOP_SPREAD}"})
     return {
         "closeness": agg,
         "rationale": _clamp_len(rationale, 2000),
         "elapsed_sec": total_sec,
-        "n_judges": len(_VALID_JUDGES),
+        "wall_sec": wall_sec,
+        "n_judges": len(outs),
+        "path": "ensemble",
         "details": per_judge,
     }
 
+def judge_closeness_multi(
+    candidate: str, gt_text: str, early_stop: bool | None = None, judges: List[str] | None = None
+) -> Dict[str, Any]:
+    judges = judges or _valid_judges()
+    fn = lambda je: _judge_closeness_one(candidate, gt_text, je)
+    if (EARLY_STOP if early_stop is None else early_stop):
+        outs, skipped, wall_sec = _fan_out_staged(fn, judges, CLOSENESS_MIN_JUDGES, _closeness_settled)
+    else:
+        outs, wall_sec = _fan_out(fn, judges)
+        skipped = []
+    return _aggregate_closeness(judges, outs, skipped, wall_sec)
+
+
+# =========================
+# Batched closeness (N candidates, one GT)
+# =========================
+
+# Most candidates scored in one judge call; larger groups are split, and so are groups
+# whose prompt or expected output (CLOSENESS_BATCH_OUTPUT_PER_CANDIDATE each) wouldn't fit.
+CLOSENESS_BATCH_MAX = 6
+CLOSENESS_BATCH_OUTPUT_PER_CANDIDATE = 200
+
+CLOSE_BATCH_SYS = SystemMessagePromptTemplate.from_template(
+    "Score closeness (0.0–1.0) of EACH candidate VPP note to the ground-truth VPP text, independently of the other candidates. "
+    "Consider structure, key diagnoses, treatments, dates, and timeline accuracy. "
+    f"Return JSON ONLY of the form {{{{\"results\": [{{{{\"id\": \"<candidate id>\", \"closeness\": <float>, \"rationale\": \"<{_text_spec()}>\"}}}}]}}}} "
+    "with exactly one entry per candidate id."
+)
+CLOSE_BATCH_HUM = HumanMessagePromptTemplate.from_template(
+    "GROUND TRUTH VPP:\n{gt}\n\n{candidates}\n\nRespond with strict JSON only."
+)
+CLOSE_BATCH_PROMPT = ChatPromptTemplate.from_messages([CLOSE_BATCH_SYS, CLOSE_BATCH_HUM])
+
+def _closeness_batch_chain(judge_endpoint: str):
+    return _cached_chain(
+        ("closeness_batch", judge_endpoint),
+        lambda: (CLOSE_BATCH_PROMPT, CLOSE_BATCH_PROMPT | get_judge(judge_endpoint)),
+    )
+
+def _judge_closeness_batch_one(
+    candidates: List[str], gt_text: str, judge_endpoint: str
+) -> List[Tuple[float | None, str, float, bool]]:
+    """
+    Score all candidates against gt_text with one call to judge_endpoint.
+    Returns (closeness, rationale, elapsed_sec, batched) per candidate; candidates the
+    batched response did not cover are re-scored one by one (batched=False).
+    """
+    t0 = time.time()
+    ids = [f"C{i + 1}" for i in range(len(candidates))]
+    block = "\n\n".join(f"CANDIDATE {cid} (VPP):\n{c}" for cid, c in zip(ids, candidates))
+    parsed: Dict[str, Tuple[float | None, str]] = {}
+    try:
+        raw = _invoke(_closeness_batch_chain(judge_endpoint), {"gt": gt_text, "candidates": block}, judge_endpoint)
+        m = re.search(r"\{.*\}", raw, re.S)
+        if m:
+            for item in json.loads(m.group(0)).get("results", []) or []:
+                c = _safe_float(item.get("closeness"))
+                if item.get("id") in ids and c is not None:
+                    parsed[item["id"]] = (c, item.get("rationale", ""))
+    except Exception:
+        parsed = {}
+    batch_sec = time.time() - t0
+
+    outs: List[Tuple[float | None, str, float, bool]] = []
+    for cid, cand in zip(ids, candidates):
+        if cid in parsed:
+            c, r = parsed[cid]
+            outs.append((c, r, batch_sec / len(candidates), True))
+        else:
+            c, r, sec = _judge_closeness_one(cand, gt_text, judge_endpoint)
+            outs.append((c, r, sec, False))
+    return outs
+
+def judge_closeness_batch(
+    candidates: List[str], gt_text: str, early_stop: bool | None = None, judges: List[str] | None = None
+) -> List[Dict[str, Any]]:
+    """
+    Batched counterpart of judge_closeness_multi: one judge call scores every
+    candidate against the shared ground truth. Returns one judge_closeness_multi-shaped
+    result per candidate, in input order.
+    """
+    judges = judges or _valid_judges()
+    try:
+        chunks = token_budget.split_to_fit(
+            candidates,
+            token_budget.estimate_tokens(CLOSE_BATCH_SYS.prompt.template + gt_text),
+            min(judges, key=token_budget.context_window),
+            JUDGE_MAX_TOKENS,
+            output_per_item=CLOSENESS_BATCH_OUTPUT_PER_CANDIDATE,
+            max_items=CLOSENESS_BATCH_MAX,
+        )
+    except token_budget.PromptTooLargeError:
+        chunks = [[c] for c in candidates]  # each is then reported as a judge error, not sent
+    if len(chunks) > 1:
+        out: List[Dict[str, Any]] = []
+        for chunk in chunks:
+            out.extend(judge_closeness_batch(chunk, gt_text, early_stop, judges))
+        return out
+
+    fn = lambda je: _judge_closeness_batch_one(candidates, gt_text, je)
+
+    def settled(outs, n_remaining: int) -> bool:
+        # every candidate must be settled before the remaining judges can be skipped
+        return all(
+            _closeness_settled([per_judge[k][:3] for per_judge in outs], n_remaining)
+            for k in range(len(candidates))
+        )
+
+    if (EARLY_STOP if early_stop is None else early_stop):
+        outs, skipped, wall_sec = _fan_out_staged(fn, judges, CLOSENESS_MIN_JUDGES, settled)
+    else:
+        outs, wall_sec = _fan_out(fn, judges)
+        skipped = []
+
+    results = []
+    for k in range(len(candidates)):
+        per_cand = [per_judge[k] for per_judge in outs]
+        res = _aggregate_closeness(
+            judges,
+            [o[:3] for o in per_cand],
+            skipped,
+            wall_sec,
+            extra=[{"batched": o[3]} for o in per_cand],
+        )
+        res["path"] = "ensemble:batched"
+        results.append(res)
+    return results
+
 
 # =========================
 # Pairwise preference judge
@@ -158,21 +439,24 @@ def _pref_sys_tmpl(labelA: str, labelB: str) -> SystemMessagePromptTemplate:
         "Decide which candidate is closer to ground-truth AND better formatted as a VPP note. "
         f"Return JSON ONLY with keys: preferred (must be '{labelA}' or '{labelB}' or 'tie'), "
         f"scores (object with '{labelA}' and '{labelB}' integer 0-100), "
-        f"vpp_compliance_estimate (object with '{labelA}' and '{labelB}' floats 0-1), explanation."
+        f"vpp_compliance_estimate (object with '{labelA}' and '{labelB}' floats 0-1), explanation ({_text_spec()})."
     )
 
 PREF_HUM = HumanMessagePromptTemplate.from_template(
     "GROUND TRUTH VPP:\n{gt}\n\n{labelA}:\n{candA}\n\n{labelB}:\n{candB}\n\nRespond with strict JSON only."
 )
 
+def _pairwise_chain(judge_endpoint: str, labelA: str, labelB: str):
+    def build():
+        prompt = ChatPromptTemplate.from_messages([_pref_sys_tmpl(labelA, labelB), PREF_HUM])
+        return prompt, prompt | get_judge(judge_endpoint)
+    return _cached_chain(("pairwise", judge_endpoint, labelA, labelB), build)
+
 def _judge_pairwise_one(candA: str, candB: str, gt_text: str, labelA: str, labelB: str, judge_endpoint: str):
     t0 = time.time()
     try:
-        SYS = _pref_sys_tmpl(labelA, labelB)
-        PROMPT = ChatPromptTemplate.from_messages([SYS, PREF_HUM])
-        model = get_judge(judge_endpoint)
-        out = (PROMPT | model).invoke({"gt": gt_text, "candA": candA, "candB": candB, "labelA": labelA, "labelB": labelB})
-        raw = (out.content or "").strip()
+        compiled = _pairwise_chain(judge_endpoint, labelA, labelB)
+        raw = _invoke(compiled, {"gt": gt_text, "candA": candA, "candB": candB, "labelA": labelA, "labelB": labelB}, judge_endpoint)
         m = re.search(r"\{.*\}", raw, re.S)
         res = {"preferred": None, "scores": {labelA: None, labelB: None},
                "vpp_compliance_estimate": {labelA: None, labelB: None}, "explanation": ""}
@@ -185,7 +469,18 @@ def _judge_pairwise_one(candA: str, candB: str, gt_text: str, labelA: str, label
                "explanation": f"judge error: {str(e)[:200]}"}
     return res, time.time() - t0
 
-def judge_pairwise_multi(candA: str, candB: str, gt_text: str, labelA: str, labelB: str) -> Dict[str, Any]:
+def _majority_settled(labelA: str, labelB: str):
+    def done(outs: List[Tuple[Dict[str, Any], float]], n_remaining: int) -> bool:
+        prefs = [r.get("preferred") for r, _ in outs]
+        # the remaining judges cannot overturn a lead larger than their number
+        return abs(prefs.count(labelA) - prefs.count(labelB)) > n_remaining
+    return done
+
+def judge_pairwise_multi(
+    candA: str, candB: str, gt_text: str, labelA: str, labelB: str,
+    early_stop: bool | None = None, judges: List[str] | None = None,
+) -> Dict[str, Any]:
+    judges = judges or _valid_judges()
     votes = {labelA: 0, labelB: 0, "tie": 0}
     scoresA: List[float] = []
     scoresB: List[float] = []
@@ -194,8 +489,14 @@ def judge_pairwise_multi(candA: str, candB: str, gt_text: str, labelA: str, labe
     details = []
     total_sec = 0.0
 
-    for je in _VALID_JUDGES:
-        r, sec = _judge_pairwise_one(candA, candB, gt_text, labelA, labelB, je)
+    fn = lambda je: _judge_pairwise_one(candA, candB, gt_text, labelA, labelB, je)
+    if (EARLY_STOP if early_stop is None else early_stop):
+        majority = len(judges) // 2 + 1
+        outs, skipped, wall_sec = _fan_out_staged(fn, judges, majority, _majority_settled(labelA, labelB))
+    else:
+        outs, wall_sec = _fan_out(fn, judges)
+        skipped = []
+    for je, (r, sec) in zip(judges, outs):
         total_sec += sec
         details.append({"judge_endpoint": je, "result": r, "elapsed_sec": sec})
         pref = r.get("preferred")
@@ -225,6 +526,9 @@ def judge_pairwise_multi(candA: str, candB: str, gt_text: str, labelA: str, labe
     else:
         preferred = "tie"
 
+    for je in skipped:
+        details.append({"judge_endpoint": je, "skipped": True, "reason": "majority decided"})
+
     return {
         "preferred": preferred,
         "scoreA": float(sum(scoresA) / len(scoresA)) if scoresA else None,
@@ -232,6 +536,102 @@ def judge_pairwise_multi(candA: str, candB: str, gt_text: str, labelA: str, labe
         "compA": float(sum(compA) / len(compA)) if compA else None,
         "compB": float(sum(compB) / len(compB)) if compB else None,
         "elapsed_sec": total_sec,
-        "n_judges": len(_VALID_JUDGES),
+        "wall_sec": wall_sec,
+        "n_judges": len(outs),
+        "path": "ensemble",
         "details": details,
     }
+
+
+
+# =========================
+# Cheap-first cascade
+# =========================
+
+def _cascade_split(endpoints: List[str] | None) -> Tuple[str | None, List[str]]:
+    """(cheap judge, stronger judges), both restricted to currently healthy endpoints."""
+    usable = _routable(endpoints or CASCADE_ENDPOINTS)
+    if not usable:
+        return None, _valid_judges()
+    return usable[0], usable[1:]
+
+def judge_closeness_cascade(
+    candidate: str,
+    gt_text: str,
+    endpoints: List[str] | None = None,
+    band: Tuple[float, float] | None = None,
+) -> Dict[str, Any]:
+    lo, hi = band or CASCADE_AMBIGUOUS_BAND
+    cheap, strong = _cascade_split(endpoints)
+    if cheap is None:
+        res = judge_closeness_multi(candidate, gt_text, judges=strong)
+        res["path"] = "ensemble"
+        return res
+
+    c, r, sec = _judge_closeness_one(candidate, gt_text, cheap)
+    first = {"judge_endpoint": cheap, "closeness": c, "elapsed_sec": sec, "rationale": _clamp_len(r, 1000)}
+    if c is None:
+        reason = "unparseable"
+    elif lo <= c <= hi:
+        reason = "ambiguous"
+    else:
+        reason = None
+    if reason is None or not strong:
+        return {
+            "closeness": c,
+            "rationale": _clamp_len(r, 2000),
+            "elapsed_sec": sec,
+            "wall_sec": sec,
+            "n_judges": 1,
+            "path": cheap if reason is None else f"{cheap}>{reason}>no-escalation",
+            "details": [first],
+        }
+
+    res = judge_closeness_multi(candidate, gt_text, judges=strong)
+    res["elapsed_sec"] += sec
+    res["wall_sec"] += sec
+    res["n_judges"] += 1
+    res["path"] = f"{cheap}>{reason}>ensemble"
+    res["details"] = [first] + res["details"]
+    return res
+
+def judge_pairwise_cascade(
+    candA: str, candB: str, gt_text: str, labelA: str, labelB: str,
+    endpoints: List[str] | None = None,
+) -> Dict[str, Any]:
+    cheap, strong = _cascade_split(endpoints)
+    if cheap is None:
+        res = judge_pairwise_multi(candA, candB, gt_text, labelA, labelB, judges=strong)
+        res["path"] = "ensemble"
+        return res
+
+    r, sec = _judge_pairwise_one(candA, candB, gt_text, labelA, labelB, cheap)
+    first = {"judge_endpoint": cheap, "result": r, "elapsed_sec": sec}
+    pref = r.get("preferred")
+    if pref is None:
+        reason = "unparseable"
+    elif pref not in (labelA, labelB):
+        reason = "tie"
+    else:
+        reason = None
+    if reason is None or not strong:
+        return {
+            "preferred": pref if pref in (labelA, labelB) else "tie",
+            "scoreA": _safe_float((r.get("scores", {}) or {}).get(labelA)),
+            "scoreB": _safe_float((r.get("scores", {}) or {}).get(labelB)),
+            "compA": _safe_float((r.get("vpp_compliance_estimate", {}) or {}).get(labelA)),
+            "compB": _safe_float((r.get("vpp_compliance_estimate", {}) or {}).get(labelB)),
+            "elapsed_sec": sec,
+            "wall_sec": sec,
+            "n_judges": 1,
+            "path": cheap if reason is None else f"{cheap}>{reason}>no-escalation",
+            "details": [first],
+        }
+
+    res = judge_pairwise_multi(candA, candB, gt_text, labelA, labelB, judges=strong)
+    res["elapsed_sec"] += sec
+    res["wall_sec"] += sec
+    res["n_judges"] += 1
+    res["path"] = f"{cheap}>{reason}>ensemble"
+    res["details"] = [first] + res["details"]
+    return res
@@ -0,0 +1,254 @@
+# src/llm_cache.py
+"""
+Content-addressed response cache for LLM calls (judge ensemble + call_sonnet).
+
+Two levels:
+- L1: in-process LRU (VPP_LLM_CACHE_L1_ENTRIES entries)
+- L2: on-disk SQLite store at VPP_LLM_CACHE_PATH, evicted oldest-access-first
+      once it grows past VPP_LLM_CACHE_MAX_MB
+
+Keys hash (endpoint, rendered prompt, temperature, max_tokens). Entries older
+than VPP_LLM_CACHE_TTL_SEC are ignored and purged. Set VPP_LLM_CACHE_BYPASS=1
+(or pass use_cache=False where supported) to skip the cache entirely.
+
+Hit/miss counters are kept globally (stats()) and per scope (track()), so a
+caller can report how many of its own calls were served from cache.
+"""
+
+from __future__ import annotations
+from typing import Any, Dict, Optional
+from collections import OrderedDict
+from contextlib import contextmanager
+import contextvars
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+CACHE_PATH = os.environ.get("VPP_LLM_CACHE_PATH", "/tmp/vpp_llm_cache.sqlite")
+CACHE_TTL_SEC = float(os.environ.get("VPP_LLM_CACHE_TTL_SEC", 7 * 24 * 3600))
+CACHE_MAX_MB = float(os.environ.get("VPP_LLM_CACHE_MAX_MB", 512))
+CACHE_L1_ENTRIES = int(os.environ.get("VPP_LLM_CACHE_L1_ENTRIES", 2048))
+# An L2 hit refreshes the row's access time (for eviction order) only if it is older than
+# this; refreshes are buffered and written with the next put, or every TOUCH_BATCH hits
+CACHE_TOUCH_SEC = float(os.environ.get("VPP_LLM_CACHE_TOUCH_SEC", 3600))
+TOUCH_BATCH = 256
+
+
+def bypassed() -> bool:
+    return os.environ.get("VPP_LLM_CACHE_BYPASS", "").strip().lower() in {"1", "true", "yes"}
+
+
+def make_key(endpoint: str, prompt: Any, temperature: float, max_tokens: int) -> str:
+    """Stable hash of everything that determines the response. `prompt` may be a str or JSON-able messages."""
+    blob = json.dumps([endpoint, prompt, float(temperature), int(max_tokens)], ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+class CacheStats:
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def record(self, hit: bool) -> None:
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def as_dict(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses}
+
+
+class ResponseCache:
+    def __init__(
+        self, path: str, ttl_sec: float, max_mb: float, l1_entries: int, table: str = "responses",
+        touch_sec: float = CACHE_TOUCH_SEC,
+    ):
+        self.path = path
+        self.table = table  # other stores (e.g. step_checkpoints) share the file under their own table
+        self.ttl_sec = ttl_sec
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.l1_entries = l1_entries
+        self.touch_sec = touch_sec
+        self._touched: Dict[str, float] = {}  # key -> access time not yet written to L2
+        self._l1: "OrderedDict[str, tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self._db_failed = False
+        self._l2_bytes = 0  # running total of the table's size column, kept in step with writes
+
+    # ---- L2 (SQLite) ----
+    def _conn(self) -> Optional[sqlite3.Connection]:
+        if self._db is None and not self._db_failed:
+            try:
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                db = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+                db.execute(
+                    f"CREATE TABLE IF NOT EXISTS {self.table} ("
+                    "key TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL, "
+                    "accessed REAL NOT NULL, size INTEGER NOT NULL)"
+                )
+                db.execute(f"CREATE INDEX IF NOT EXISTS {self.table}_accessed ON {self.table}(accessed)")
+                db.commit()
+                self._l2_bytes = self._l2_size(db)
+                self._db = db
+            except Exception as e:
+                # a read-only or missing volume should degrade to L1-only, not break judging
+                print(f"WARNING: LLM cache L2 disabled ({self.path}): {e}")
+                self._db_failed = True
+        return self._db
+
+    def _flush_touched(self, db: sqlite3.Connection) -> None:
+        if self._touched:
+            db.executemany(f"UPDATE {self.table} SET accessed = ? WHERE key = ?", [(t, k) for k, t in self._touched.items()])
+            self._touched.clear()
+
+    def _l2_size(self, db: sqlite3.Connection) -> int:
+        return db.execute(f"SELECT COALESCE(SUM(size), 0) FROM {self.table}").fetchone()[0]
+
+    def _evict_l2(self, db: sqlite3.Connection) -> None:
+        """Purge expired rows, then oldest-accessed ones, until the table fits max_bytes; only scans when over."""
+        if self._l2_bytes <= self.max_bytes:
+            return
+        db.execute(f"DELETE FROM {self.table} WHERE created < ?", (time.time() - self.ttl_sec,))
+        # re-sync here, where a scan is due anyway: other processes may share the file
+        self._l2_bytes = self._l2_size(db)
+        if self._l2_bytes <= self.max_bytes:
+            return
+        excess = self._l2_bytes - self.max_bytes
+        freed = 0
+        victims = []
+        for key, size in db.execute(f"SELECT key, size FROM {self.table} ORDER BY accessed ASC"):
+            victims.append((key,))
+            freed += size
+            if freed >= excess:
+                break
+        db.executemany(f"DELETE FROM {self.table} WHERE key = ?", victims)
+        self._l2_bytes -= freed
+
+    # ---- public ----
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            ent = self._l1.get(key)
+            if ent is not None:
+                created, value = ent
+                if now - created <= self.ttl_sec:
+                    self._l1.move_to_end(key)
+                    return value
+                del self._l1[key]
+            db = self._conn()
+            if db is None:
+                return None
+            row = db.execute(f"SELECT value, created, accessed, size FROM {self.table} WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            value, created, accessed, size = row
+            if now - created > self.ttl_sec:
+                db.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+                db.commit()
+                self._l2_bytes -= size
+                return None
+            if now - accessed >= self.touch_sec:
+                self._touched[key] = now
+                if len(self._touched) >= TOUCH_BATCH:
+                    self._flush_touched(db)
+                    db.commit()
+            self._put_l1(key, created, value)
+            return value
+
+    def _put_l1(self, key: str, created: float, value: str) -> None:
+        self._l1[key] = (created, value)
+        self._l1.move_to_end(key)
+        while len(self._l1) > self.l1_entries:
+            self._l1.popitem(last=False)
+
+    def put(self, key: str, value: str) -> None:
+        now = time.time()
+        with self._lock:
+            self._put_l1(key, now, value)
+            db = self._conn()
+            if db is None:
+                return
+            size = len(value.encode("utf-8"))
+            old = db.execute(f"SELECT size FROM {self.table} WHERE key = ?", (key,)).fetchone()
+            db.execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, created, accessed, size) VALUES (?, ?, ?, ?, ?)",
+                (key, value, now, now, size),
+            )
+            self._l2_bytes += size - (old[0] if old else 0)
+            self._touched.pop(key, None)
+            self._flush_touched(db)  # eviction below needs current access times
+            self._evict_l2(db)
+            db.commit()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._l1.clear()
+            self._touched.clear()
+            db = self._conn()
+            if db is not None:
+                db.execute(f"DELETE FROM {self.table}")
+                db.commit()
+                self._l2_bytes = 0
+
+
+_CACHE = ResponseCache(CACHE_PATH, CACHE_TTL_SEC, CACHE_MAX_MB, CACHE_L1_ENTRIES)
+_GLOBAL_STATS = CacheStats()
+_SCOPE_STATS: contextvars.ContextVar[Optional[CacheStats]] = contextvars.ContextVar("llm_cache_scope", default=None)
+
+
+def _record(hit: bool) -> None:
+    _GLOBAL_STATS.record(hit)
+    scope = _SCOPE_STATS.get()
+    if scope is not None:
+        scope.record(hit)
+
+
+def get(key: str) -> Optional[str]:
+    """Look up a cached response; counts a hit or a miss."""
+    try:
+        value = _CACHE.get(key)
+    except Exception as e:
+        print(f"WARNING: LLM cache read failed: {e}")
+        value = None
+    _record(value is not None)
+    return value
+
+
+def put(key: str, value: str) -> None:
+    try:
+        _CACHE.put(key, value)
+    except Exception as e:
+        print(f"WARNING: LLM cache write failed: {e}")
+
+
+def clear() -> None:
+    _CACHE.clear()
+
+
+def stats() -> Dict[str, int]:
+    return _GLOBAL_STATS.as_dict()
+
+
+@contextmanager
+def track():
+    """
+    Count hits/misses for the calls made inside this block (including worker
+    threads started with a copied context):
+
+        with llm_cache.track() as st:
+            ...
+        st.hits, st.misses
+    """
+    st = CacheStats()
+    token = _SCOPE_STATS.set(st)
+    try:
+        yield st
+    finally:
+        _SCOPE_STATS.reset(token)
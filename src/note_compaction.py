@@ -0,0 +1,194 @@
+# src/note_compaction.py
+"""
+Section-aware compaction of the MD note before it is embedded in judge prompts.
+
+The subjective bundle sends the full md_note (Textract output / text_content) in
+up to six prompts per candidate. Part of its length is sections that the
+precision/recall rubric rates as Minor (weight 1): vitals, ROS, social/family
+history and billing/signature boilerplate. This module finds those sections by
+their headers and handles them as follows:
+
+- vitals, social: condensed to one line of at most CONDENSE_MAX_CHARS
+- ros:            only positive findings are kept (each negated item is dropped)
+- admin:          dropped, leaving a bracketed marker
+
+A minor section only holds the lines that match its category's own content
+(CONTENT_PATTERNS, e.g. "BP: 120/80" under vitals, "GI: negative" under ROS).
+The first line that doesn't match ends the section: a blank line, another header
+("Oncology History", "PET/CT: ...") or unrecognised text. That line and everything
+after it pass through unchanged. Follow-up and appointment content is never
+treated as minor, because the rubric rates it Important.
+
+Off by default; set VPP_MD_COMPACTION=1 (or pass compact_md=True to the bundle
+evaluators) to enable it. It changes the PrecisionRecall inputs of every row.
+
+Usage:
+    compacted, report = note_compaction.compact(md_note)
+    report["SavedTokens"], report["SavedPct"], report["Sections"]
+"""
+
+from __future__ import annotations
+from typing import Any, Dict, List, Tuple
+import os
+import re
+
+import token_budget
+
+COMPACTION_ENABLED = os.environ.get("VPP_MD_COMPACTION", "0").strip().lower() in {"1", "true", "yes"}
+CONDENSE_MAX_CHARS = int(os.environ.get("VPP_MD_CONDENSE_MAX_CHARS", "200"))
+
+# Minor-criticality categories (see the precision/recall rubric) -> section header titles
+SECTION_PATTERNS = {
+    "vitals": r"vital\s*signs?|vitals",
+    "ros": r"review\s+of\s+systems|ros",
+    "social": r"social\s+history|family\s+history|social\s*/\s*family\s+history|family\s*/\s*social\s+history|shx|fhx",
+    "admin": r"billing|insurance|administrative|attestation|electronically\s+signed(?:\s+by)?|signature",
+}
+SECTION_ACTIONS = {"vitals": "condense", "ros": "positives", "social": "condense", "admin": "drop"}
+
+# What a line inside each minor section must start with to belong to it
+_BULLET = r"^\s*(?:[-*•]\s*)?"
+CONTENT_PATTERNS = {
+    "vitals": _BULLET + (
+        r"(?:bp|blood\s+pressure|hr|heart\s+rate|pulse(?:\s+ox)?|p|temp(?:erature)?|t|rr|resp(?:iratory)?(?:\s+rate)?"
+        r"|spo2|o2\s*sat|sat|weight|wt|height|ht|bmi|bsa|pain(?:\s+score)?)\b"
+    ),
+    "ros": _BULLET + (
+        r"(?:constitutional|general|heent|eyes|ent|head|neck|cardiovascular|cardiac|cv|respiratory|resp|pulmonary"
+        r"|gi|gastrointestinal|gu|genitourinary|musculoskeletal|msk|skin|integumentary|derm(?:atologic)?"
+        r"|neuro(?:logic(?:al)?)?|psych(?:iatric)?|endocrine|heme(?:/lymph(?:atic)?)?|hematologic(?:/lymphatic)?"
+        r"|lymphatic|allergic(?:/immunologic)?|immunologic|breast|denies|negative\s+for|positive\s+for"
+        r"|all\s+other\s+systems)\b"
+    ),
+    "social": _BULLET + (
+        r"(?:tobacco|smok\w*|former\s+smoker|never\s+smoker|current\s+smoker|alcohol|etoh|drugs?|illicit|substance"
+        r"|recreational|occupation|works?|employ\w*|lives?|living|married|marital|children|exercise|diet|caffeine"
+        r"|father|mother|brother|sister|siblings?|son|daughter|aunt|uncle|grand\w+)\b"
+    ),
+    "admin": _BULLET + (
+        r"(?:cpt|icd(?:-?10)?|billing|insurance|payer|copay|npi|mrn|encounter\s+(?:id|number)|electronically\s+signed"
+        r"|signed|cosigned|signature|attestation|dictated|transcribed|time\s+spent|total\s+time)\b"
+    ),
+}
+
+# A minor section header: optional markdown/numbering prefix, the title, then ":" (text may
+# follow, and belongs to the section) or the end of the line
+_HEADER_RE = re.compile(
+    r"^\s*(?:#+\s*|\d+[.)]\s*|\*\*)?(?P<title>" + "|".join(f"(?:{p})" for p in SECTION_PATTERNS.values())
+    + r")(?:\*\*)?\s*(?::\s*(?P<inline>.*))?$",
+    re.I,
+)
+_NEGATIVE_RE = re.compile(r"\b(?:denies|denied|negative|neg|no|none|not|without|normal|wnl|unremarkable)\b", re.I)
+_CATEGORY_RES = {cat: re.compile(rf"^(?:{pat})$", re.I) for cat, pat in SECTION_PATTERNS.items()}
+_CONTENT_RES = {cat: re.compile(pat, re.I) for cat, pat in CONTENT_PATTERNS.items()}
+
+
+def approx_tokens(text: Any) -> int:
+    return token_budget.estimate_tokens(str(text or ""))
+
+
+def _header(line: str) -> Tuple[str, str, str] | None:
+    """(category, title, inline text) if line is a minor section header, else None."""
+    m = _HEADER_RE.match(line)
+    if not m:
+        return None
+    title = m.group("title").strip()
+    cat = next(c for c, rx in _CATEGORY_RES.items() if rx.match(title))
+    return cat, title, (m.group("inline") or "").strip()
+
+
+def _sections(note: str) -> List[Tuple[str | None, str | None, List[str]]]:
+    """
+    Split note into (category, title, lines) sections; category None means pass through
+    (lines verbatim). A minor section's lines are its header's inline text and the
+    following lines that match its category's content; any other line ends it. A
+    header with no such lines is passed through as written.
+    """
+    out: List[Tuple[str | None, str | None, List[str]]] = [(None, None, [])]
+    raw_header = ""
+
+    def _close() -> None:
+        if out[-1][0] is not None and not out[-1][2]:
+            out[-1] = (None, None, [raw_header])
+        out.append((None, None, []))
+
+    for line in note.splitlines():
+        h = _header(line)
+        if h is not None:
+            _close()
+            cat, title, inline = h
+            raw_header = line
+            out[-1] = (cat, title, [inline] if inline else [])
+            continue
+        cat = out[-1][0]
+        if cat is not None and line.strip() and _CONTENT_RES[cat].match(line):
+            out[-1][2].append(line.strip())
+            continue
+        if cat is not None:
+            _close()
+        out[-1][2].append(line)
+    _close()
+    return [s for s in out if s[0] is not None or s[2]]
+
+
+def _condense(title: str, body: List[str]) -> str:
+    text = " ".join(" ".join(body).split())
+    if len(text) > CONDENSE_MAX_CHARS:
+        text = text[: CONDENSE_MAX_CHARS - 1] + "…"
+    return f"{title}: {text}"
+
+
+def _positive_items(line: str) -> List[str]:
+    """The items of a ROS line that carry no negation cue; each ","/";" item is judged on its own."""
+    label, sep, rest = line.partition(":")
+    if not sep:
+        label, rest = "", line
+    items = [i.strip() for i in re.split(r"[;,]", rest) if i.strip()]
+    kept = [i for i in items if not _NEGATIVE_RE.search(i)]
+    if kept and label.strip():
+        kept[0] = f"{label.strip()}: {kept[0]}"
+    return kept
+
+
+def _positives(title: str, body: List[str]) -> str:
+    kept = [", ".join(items) for items in map(_positive_items, body) if items]
+    if not kept:
+        return f"{title}: [negative/non-contributory; {len(body)} line(s) omitted]"
+    return f"{title}: " + "; ".join(kept)
+
+
+def compact(note: str) -> Tuple[str, Dict[str, Any]]:
+    """Compacted note and a report with token estimates and the action taken per section."""
+    note = note or ""
+    parts: List[str] = []
+    actions: List[Dict[str, str]] = []
+    for cat, title, body in _sections(note):
+        if cat is None:
+            parts.extend(body)
+            continue
+        action = SECTION_ACTIONS[cat]
+        if action == "drop":
+            parts.append(f"[{title} section omitted]")
+        elif action == "positives":
+            parts.append(_positives(title, body))
+        else:
+            parts.append(_condense(title, body))
+        actions.append({"Section": title, "Category": cat, "Action": action})
+    compacted = "\n".join(parts) if actions else note
+    before, after = approx_tokens(note), approx_tokens(compacted)
+    return compacted, {
+        "Enabled": True,
+        "OriginalTokens": before,
+        "CompactedTokens": after,
+        "SavedTokens": before - after,
+        "SavedPct": round(100.0 * (before - after) / before, 1) if before else 0.0,
+        "Sections": actions,
+    }
+
+
+def maybe_compact(note: str, enabled: bool | None = None) -> Tuple[str, Dict[str, Any]]:
+    """compact(note) unless disabled (enabled=None follows VPP_MD_COMPACTION); the report is filled either way."""
+    if not (COMPACTION_ENABLED if enabled is None else enabled):
+        n = approx_tokens(note)
+        return note, {"Enabled": False, "OriginalTokens": n, "CompactedTokens": n, "SavedTokens": 0, "SavedPct": 0.0, "Sections": []}
+    return compact(note)
@@ -0,0 +1,262 @@
+# src/rule_scoring.py
+"""
+Deterministic scoring for the subjective bundle's last two levels.
+
+Computes FinalRelevance / FinalCompleteness / FinalCorrectness and the unified
+PassFail / OverallRating locally from the structured outputs already produced
+by the base evaluations. Those outputs are the Likert ratings, the precision/recall
+criticality lists and the VPP compliance report. The rules are the ones spelled
+out in get_final_*_prompt and get_unified_pass_fail_prompt, so results keep the
+same keys as the LLM path.
+
+Items without a criticality label (plain MissingFields/SpuriousFields with no
+*Detailed entry) count as "important", which errs toward the stricter rating.
+
+The level-1 VPP compliance report is also completed here (score_vpp_compliance):
+the LLM only lists violated rule IDs; score, level and buckets come from vpp_rules.
+"""
+
+from __future__ import annotations
+from typing import Any, Dict, List
+
+import vpp_rules
+
+LIKERT = ["Almost not at all", "Hardly", "Neutral", "Very", "Highly"]
+CRITICALITY_WEIGHTS = {"critical": 3, "important": 2, "minor": 1}
+HIGH_PRECISION = ("very high", "high")
+PASS_MIN_VPP_SCORE = 70.0
+PASS_MIN_METRIC = "Neutral"
+# OverallRating bands on the weighted VPP score: (min score, rating)
+RATING_BANDS = [(90.0, 5), (80.0, 4), (70.0, 3), (60.0, 2), (float("-inf"), 1)]
+VPP_NOT_COMPLIANT_BELOW = 50.0  # weighted score under which >2 critical violations is "Not Compliant"
+
+_FINAL_KEYS = ["FinalRelevance", "FinalCompleteness", "FinalCorrectness"]
+
+
+def likert_index(label: Any) -> int | None:
+    """Position of a Likert label on LIKERT (case-insensitive), or None if unrecognised."""
+    norm = str(label or "").strip().lower()
+    for i, name in enumerate(LIKERT):
+        if norm == name.lower():
+            return i
+    return None
+
+
+def _cap(subjective: Any, cap: str | None) -> str:
+    """min(subjective, cap); an unreadable subjective rating falls back to the cap (or Neutral)."""
+    i = likert_index(subjective)
+    c = likert_index(cap) if cap else None
+    if i is None:
+        return cap or PASS_MIN_METRIC
+    return LIKERT[i if c is None else min(i, c)]
+
+
+def _items(detailed: Any, plain: Any, **extra: str) -> List[Dict[str, Any]]:
+    if isinstance(detailed, list) and detailed:
+        out = [dict(d, **extra) for d in detailed if isinstance(d, dict)]
+    else:
+        out = [{"text": str(t), "criticality": "important", **extra} for t in (plain or [])]
+    for d in out:
+        if str(d.get("criticality", "")).lower() not in CRITICALITY_WEIGHTS:
+            d["criticality"] = "important"
+        d["criticality"] = d["criticality"].lower()
+    return out
+
+
+def _counts(items: List[Dict[str, Any]]) -> Dict[str, int]:
+    counts = {k: 0 for k in CRITICALITY_WEIGHTS}
+    for d in items:
+        counts[d["criticality"]] += 1
+    return counts
+
+
+def _penalty(counts: Dict[str, int]) -> int:
+    return sum(CRITICALITY_WEIGHTS[k] * n for k, n in counts.items())
+
+
+def final_relevance(relevance: Dict[str, Any], precision_recall: Dict[str, Any]) -> Dict[str, Any]:
+    items = _items(precision_recall.get("SpuriousFieldsDetailed"), precision_recall.get("SpuriousFields"))
+    c = _counts(items)
+    n = len(items)
+    if c["critical"]:
+        cap, rule = "Hardly", "critical spurious item"
+    elif c["important"] > 2:
+        cap, rule = "Neutral", ">2 important spurious items"
+    elif n >= 4:
+        cap, rule = "Neutral", ">=4 spurious items"
+    elif n:
+        cap, rule = "Very", "1-3 non-critical spurious items"
+    else:
+        cap, rule = None, "no spurious items"
+    rating = _cap(relevance.get("Relevance"), cap)
+    return {
+        "FinalRelevance": rating,
+        "Explanation": f"Rule-based: {rule} ({c['critical']} critical, {c['important']} important, {c['minor']} minor).",
+        "SpuriousCriticality": {"Counts": c, "Items": items, "WeightedPenalty": _penalty(c), "RuleApplied": rule},
+    }
+
+
+def final_completeness(completeness: Dict[str, Any], precision_recall: Dict[str, Any]) -> Dict[str, Any]:
+    items = _items(precision_recall.get("MissingFieldsDetailed"), precision_recall.get("MissingFields"))
+    c = _counts(items)
+    if c["critical"]:
+        cap, rule = "Hardly", "critical missing item"
+    elif c["important"] > 2:
+        cap, rule = "Neutral", ">2 important missing items"
+    elif c["important"] or c["minor"] >= 4:
+        cap, rule = "Very", "some non-critical missing items"
+    elif c["minor"]:
+        cap, rule = None, "<=3 minor missing items"
+    else:
+        cap, rule = "Highly", "nothing material missing"
+    rating = "Highly" if not items else _cap(completeness.get("Completeness"), cap)
+    return {
+        "FinalCompleteness": rating,
+        "Explanation": f"Rule-based: {rule} ({c['critical']} critical, {c['important']} important, {c['minor']} minor).",
+        "MissingCriticality": {"Counts": c, "Items": items, "WeightedMissing": _penalty(c), "RuleApplied": rule},
+    }
+
+
+def final_correctness(correctness: Dict[str, Any], precision_recall: Dict[str, Any]) -> Dict[str, Any]:
+    items = (
+        _items(correctness.get("InaccurateFieldsDetailed"), correctness.get("InaccurateFields"), type="mismatch")
+        + _items(precision_recall.get("SpuriousFieldsDetailed"), precision_recall.get("SpuriousFields"), type="spurious")
+    )
+    c = _counts(items)
+    precision = str(precision_recall.get("Precision", "")).strip().lower()
+    if c["critical"]:
+        cap, rule = "Hardly", "critical spurious/mismatched item"
+    elif c["important"] > 2:
+        cap, rule = "Neutral", ">2 important items"
+    elif precision not in HIGH_PRECISION:
+        cap, rule = "Neutral", f"precision '{precision or 'N/A'}' below High"
+    else:
+        cap, rule = None, "high precision, no critical/important errors"
+    rating = _cap(correctness.get("Correctness"), cap)
+    return {
+        "FinalCorrectness": rating,
+        "Explanation": f"Rule-based: {rule} ({c['critical']} critical, {c['important']} important, {c['minor']} minor).",
+        "ErrorCriticality": {"Counts": c, "Items": items, "WeightedPenalty": _penalty(c), "RuleApplied": rule},
+    }
+
+
+def final_scores(results: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    """FinalRelevance / FinalCompleteness / FinalCorrectness entries for a bundle results dict."""
+    pr = results["PrecisionRecall"]
+    return {
+        "FinalRelevance": final_relevance(results["Relevance"], pr),
+        "FinalCompleteness": final_completeness(results["Completeness"], pr),
+        "FinalCorrectness": final_correctness(results["Correctness"], pr),
+    }
+
+
+def _to_float(x: Any) -> float | None:
+    try:
+        return float(str(x).strip().rstrip("%"))
+    except (TypeError, ValueError):
+        return None
+
+
+def unified_pass_fail(all_metrics: Dict[str, Any], precision_recall: Dict[str, Any]) -> Dict[str, Any]:
+    """PassFail / OverallRating from the integrated pass criteria of get_unified_pass_fail_prompt."""
+    vpp = all_metrics.get("VPPCompliance", {}) or {}
+    violations = vpp.get("ViolationsByWeight", {}) or {}
+    critical_vpp = list(violations.get("Critical", []) or [])
+    score = _to_float(vpp.get("WeightedScore"))
+
+    critical, minor = [], []
+    critical += [f"Critical VPP violation: {v}" for v in critical_vpp]
+    if score is None or score < PASS_MIN_VPP_SCORE:
+        critical.append(f"Weighted VPP score {vpp.get('WeightedScore', 'N/A')} below {PASS_MIN_VPP_SCORE:g}%")
+
+    ratings = {k: (all_metrics.get(k, {}) or {}).get(k) for k in _FINAL_KEYS}
+    floor = likert_index(PASS_MIN_METRIC)
+    below = [k for k, r in ratings.items() if likert_index(r) is None or likert_index(r) < floor]
+    critical += [f"{k} is {ratings[k] or 'N/A'} (below {PASS_MIN_METRIC})" for k in below]
+
+    missing = _items(precision_recall.get("MissingFieldsDetailed"), precision_recall.get("MissingFields"))
+    critical += [f"Critical missing information: {d.get('text')}" for d in missing if d["criticality"] == "critical"]
+
+    minor += [f"VPP violation ({w}): {v}" for w in ("Important", "Moderate", "Minor") for v in violations.get(w, []) or []]
+    minor += [f"Missing ({d['criticality']}): {d.get('text')}" for d in missing if d["criticality"] != "critical"]
+
+    passed = not critical
+    rating = next(r for lo, r in RATING_BANDS if (score if score is not None else 0.0) >= lo)
+    if critical_vpp or any(d["criticality"] == "critical" for d in missing):
+        rating = 1
+    elif not passed:
+        rating = min(rating, 2)
+    elif any(likert_index(r) == floor for r in ratings.values()):
+        rating = min(rating, 3)  # passes, but with a Neutral final metric
+
+    return {
+        "OverallRating": rating,
+        "PassFail": "Pass" if passed else "Fail",
+        "UnifiedExplanation": (
+            f"Rule-based verdict: VPP score {vpp.get('WeightedScore', 'N/A')}, "
+            f"{len(critical_vpp)} critical VPP violation(s), final metrics "
+            + ", ".join(f"{k}={ratings[k] or 'N/A'}" for k in _FINAL_KEYS) + "."
+        ),
+        "CriticalIssues": critical,
+        "MinorIssues": minor,
+        "ScoringMode": "rules",
+    }
+
+
+def merge_narrative(verdict: Dict[str, Any], narrative: Dict[str, Any]) -> Dict[str, Any]:
+    """LLM narrative fields with the rule-based verdict fields taking precedence."""
+    out = dict(narrative or {})
+    out.update({k: verdict[k] for k in ("OverallRating", "PassFail", "CriticalIssues")})
+    out["RuleExplanation"] = verdict["UnifiedExplanation"]
+    out["ScoringMode"] = "rules+narrative"
+    return out
+
+
+def _vpp_level(buckets: Dict[str, List[str]], weighted_score: float) -> str:
+    """Compliance level from violation counts, following the levels described to the evaluator"""
+    critical, important, moderate = (len(buckets[k]) for k in ('Critical', 'Important', 'Moderate'))
+    if critical == 0 and important == 0 and moderate <= 2:
+        return "Highly Compliant"
+    if critical == 0 and important < 4:
+        return "Very Compliant"
+    if critical <= 2:
+        return "Moderately Compliant"
+    if weighted_score >= VPP_NOT_COMPLIANT_BELOW:
+        return "Hardly Compliant"
+    return "Not Compliant"
+
+
+def merge_vpp_shards(raws: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Combine sharded get_vpp_compliance_prompt responses into one response for score_vpp_compliance"""
+    def joined(key):
+        return " ".join(str(r.get(key)).strip() for r in raws if r.get(key))
+    return {
+        "ViolatedRules": [rid for r in raws for rid in (r.get('ViolatedRules') or [])],
+        "Explanation": joined('Explanation'),
+        "ClinicalAssessment": joined('ClinicalAssessment'),
+    }
+
+
+def score_vpp_compliance(raw: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Complete a get_vpp_compliance_prompt response: WeightedScore, VPPCompliance and
+    ViolationsByWeight are computed from the reported rule IDs and VPP_RULES weights.
+    """
+    reported = [str(r).strip().upper() for r in (raw.get('ViolatedRules') or [])]
+    violated = list(dict.fromkeys(r for r in reported if r in vpp_rules.RULES_BY_ID))
+    buckets = {b: [] for b in vpp_rules.BUCKET_NAMES}
+    for rid in violated:
+        rule = vpp_rules.RULES_BY_ID[rid]
+        buckets[vpp_rules.bucket_of(rule['weight'])].append(f"{rid}: {rule['rule']}")
+    violated_weight = sum(vpp_rules.RULES_BY_ID[rid]['weight'] for rid in violated)
+    weighted_score = round(100 - violated_weight / vpp_rules.TOTAL_WEIGHT * 100, 1)
+    return {
+        "VPPCompliance": _vpp_level(buckets, weighted_score),
+        "WeightedScore": weighted_score,
+        "Explanation": raw.get('Explanation', ''),
+        "ViolationsByWeight": buckets,
+        "ClinicalAssessment": raw.get('ClinicalAssessment', ''),
+        "ViolatedRules": violated,
+        "UnknownRuleIds": [r for r in reported if r not in vpp_rules.RULES_BY_ID],
+        "RulesHash": vpp_rules.RULES_HASH,
+    }
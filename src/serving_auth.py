@@ -0,0 +1,129 @@
+# src/serving_auth.py
+"""
+Process-wide OAuth (client-credentials) token cache for Databricks serving calls.
+
+The token from /oidc/v1/token is reused until TOKEN_REFRESH_SKEW_SEC before its
+expires_in, instead of being fetched before every request. When several threads
+find the token missing or expired at once, only one of them calls the identity
+endpoint; the others wait for and reuse its result.
+
+Usage:
+    host = serving_auth.databricks_host()    # bare host, no scheme
+    token = serving_auth.get_token()
+    token = serving_auth.peek_token()        # non-blocking, for async callers (None -> call get_token)
+    ...request gets a 401...
+    serving_auth.invalidate(token)           # next get_token() refreshes
+"""
+
+from __future__ import annotations
+from typing import Dict, Tuple
+import os
+import threading
+import time
+
+import http_session
+
+TOKEN_REFRESH_SKEW_SEC = 60.0     # refresh this long before the token actually expires
+DEFAULT_EXPIRES_IN_SEC = 3600.0   # used if the identity endpoint omits expires_in
+TOKEN_TIMEOUT_SEC = 30
+
+
+def databricks_host() -> str:
+    """DATABRICKS_HOST without its scheme; raises if any OAuth env var is missing."""
+    client_id = os.environ.get("DATABRICKS_CLIENT_ID")
+    client_secret = os.environ.get("DATABRICKS_CLIENT_SECRET")
+    host = os.environ.get("DATABRICKS_HOST")
+    if not all([client_id, client_secret, host]):
+        missing = []
+        if not host: missing.append("DATABRICKS_HOST")
+        if not client_id: missing.append("DATABRICKS_CLIENT_ID")
+        if not client_secret: missing.append("DATABRICKS_CLIENT_SECRET")
+        raise RuntimeError(f"Missing required environment variables: {', '.join(missing)}")
+    if host.startswith("https://"):
+        host = host[8:]
+    elif host.startswith("http://"):
+        host = host[7:]
+    return host
+
+
+class TokenProvider:
+    def __init__(self, host: str, client_id: str, client_secret: str, skew_sec: float = TOKEN_REFRESH_SKEW_SEC):
+        self.host = host
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.skew_sec = skew_sec
+        self._token: str | None = None
+        self._expires_at = 0.0
+        self.n_fetches = 0
+        self._lock = threading.Lock()
+
+    def _current(self) -> str | None:
+        token, expires_at = self._token, self._expires_at  # one read, so a concurrent invalidate can't race us
+        return token if token is not None and time.time() < expires_at - self.skew_sec else None
+
+    def _fetch(self) -> None:
+        try:
+            resp = http_session.post(
+                f"https://{self.host}/oidc/v1/token",
+                auth=(self.client_id, self.client_secret),
+                data={"grant_type": "client_credentials", "scope": "all-apis"},
+                timeout=TOKEN_TIMEOUT_SEC,
+            )
+            resp.raise_for_status()
+            body = resp.json()
+            token = body["access_token"]
+        except Exception as e:
+            print(f"ERROR: Failed to get OAuth token: {str(e)}")
+            if getattr(e, "response", None) is not None:
+                print(f"ERROR: Response: {e.response.text}")
+            raise RuntimeError(f"OAuth authentication failed: {str(e)}")
+        self._token = token
+        self._expires_at = time.time() + float(body.get("expires_in") or DEFAULT_EXPIRES_IN_SEC)
+        self.n_fetches += 1
+        print("DEBUG: Successfully obtained OAuth token")
+
+    def token(self) -> str:
+        token = self._current()
+        if token is not None:
+            return token
+        with self._lock:  # single flight: the first thread fetches, the rest re-check after it
+            if self._current() is None:
+                self._fetch()
+            return self._token
+
+    def peek(self) -> str | None:
+        """The cached token if still valid, else None; never blocks or fetches."""
+        return self._current()
+
+    def invalidate(self, token: str | None = None) -> None:
+        """Drop the cached token. Passing the rejected token makes this a no-op if another thread already refreshed it."""
+        with self._lock:
+            if token is None or token == self._token:
+                self._token = None
+                self._expires_at = 0.0
+
+
+_PROVIDERS: Dict[Tuple[str, str, str], TokenProvider] = {}
+_LOCK = threading.Lock()
+
+
+def provider() -> TokenProvider:
+    """Shared provider for the current DATABRICKS_* credentials (a new one if they change)."""
+    key = (databricks_host(), os.environ["DATABRICKS_CLIENT_ID"], os.environ["DATABRICKS_CLIENT_SECRET"])
+    with _LOCK:
+        p = _PROVIDERS.get(key)
+        if p is None:
+            p = _PROVIDERS[key] = TokenProvider(*key)
+        return p
+
+
+def get_token() -> str:
+    return provider().token()
+
+
+def peek_token() -> str | None:
+    return provider().peek()
+
+
+def invalidate(token: str | None = None) -> None:
+    provider().invalidate(token)
@@ -0,0 +1,131 @@
+# src/step_checkpoints.py
+"""
+Resumable per-step checkpoints for the subjective bundle.
+
+Each successful step output is stored under (md_note hash, candidate hash, step,
+prompt version). When a row is re-run after a failure, the finished steps are
+loaded from the store, and evaluation picks up at the first step that is missing.
+Only a step's own failures are retried: up to VPP_STEP_MAX_ATTEMPTS attempts with
+jittered exponential backoff (PERMANENT_ERRORS, e.g. an oversized prompt, fail at once).
+
+Checkpoints live in their own `step_checkpoints` table inside the LLM cache's
+SQLite file (VPP_LLM_CACHE_PATH). They have a separate TTL and are not counted
+in llm_cache.stats().
+
+Off by default: set VPP_STEP_CHECKPOINTS=1 to resume crashed runs. Keys include
+VPP_STEP_CHECKPOINT_RUN_ID, so set it to the crashed run's id to resume that run
+only; a new id starts fresh. VPP_LLM_CACHE_BYPASS=1 also turns off loading and
+storing, so forced-fresh judgments never read old steps. The retries apply either way.
+
+Usage:
+    key = step_checkpoints.make_key(md_note, candidate_note, "Relevance", "v1:separate")
+    out = step_checkpoints.run(key, lambda: call_sonnet(prompt))
+    out = await step_checkpoints.arun(key, lambda: acall_sonnet(prompt))
+"""
+
+from __future__ import annotations
+from typing import Any, Awaitable, Callable, Optional
+import asyncio
+import hashlib
+import json
+import os
+import random
+import time
+
+import llm_cache
+import token_budget
+
+CHECKPOINTS_ENABLED = os.environ.get("VPP_STEP_CHECKPOINTS", "0").strip().lower() in {"1", "true", "yes"}
+CHECKPOINT_RUN_ID = os.environ.get("VPP_STEP_CHECKPOINT_RUN_ID", "").strip()
+CHECKPOINT_TTL_SEC = float(os.environ.get("VPP_STEP_CHECKPOINT_TTL_SEC", 3 * 24 * 3600))
+STEP_MAX_ATTEMPTS = int(os.environ.get("VPP_STEP_MAX_ATTEMPTS", "3"))
+STEP_BACKOFF_BASE_SEC = float(os.environ.get("VPP_STEP_BACKOFF_BASE_SEC", "1.0"))
+STEP_BACKOFF_MAX_SEC = float(os.environ.get("VPP_STEP_BACKOFF_MAX_SEC", "20.0"))
+# Failures that another attempt can't fix
+PERMANENT_ERRORS = (token_budget.PromptTooLargeError,)
+
+_STORE = llm_cache.ResponseCache(
+    llm_cache.CACHE_PATH, CHECKPOINT_TTL_SEC, llm_cache.CACHE_MAX_MB, llm_cache.CACHE_L1_ENTRIES,
+    table="step_checkpoints",
+)
+
+
+def text_hash(text: Any) -> str:
+    return hashlib.sha256(str(text or "").encode("utf-8")).hexdigest()
+
+
+def make_key(md_note: Any, candidate_note: Any, step: str, version: str) -> str:
+    """Checkpoint key for one step of one row, within the current run id."""
+    parts = [CHECKPOINT_RUN_ID, text_hash(md_note), text_hash(candidate_note), step, version]
+    return hashlib.sha256("|".join(parts).encode("utf-8")).hexdigest()
+
+
+def _active() -> bool:
+    return CHECKPOINTS_ENABLED and not llm_cache.bypassed()
+
+
+def load(key: Optional[str]) -> Any:
+    """The stored output for key, or None (also when checkpoints are off, the cache is bypassed or the store is unreadable)."""
+    if key is None or not _active():
+        return None
+    try:
+        value = _STORE.get(key)
+    except Exception as e:
+        print(f"WARNING: step checkpoint read failed: {e}")
+        return None
+    return None if value is None else json.loads(value)
+
+
+def save(key: Optional[str], output: Any) -> None:
+    if key is None or not _active():
+        return
+    try:
+        _STORE.put(key, json.dumps(output, ensure_ascii=False, default=str))
+    except Exception as e:
+        print(f"WARNING: step checkpoint write failed: {e}")
+
+
+def clear() -> None:
+    _STORE.clear()
+
+
+def backoff_sec(attempt: int) -> float:
+    """Sleep before retry number `attempt` (1-based): base * 2^(attempt-1), capped, with 50-100% jitter."""
+    return min(STEP_BACKOFF_MAX_SEC, STEP_BACKOFF_BASE_SEC * 2 ** (attempt - 1)) * random.uniform(0.5, 1.0)
+
+
+def run(key: Optional[str], fn: Callable[[], Any]) -> Any:
+    """Checkpointed fn(): the stored output if any, else fn() retried with backoff and then stored."""
+    out = load(key)
+    if out is not None:
+        return out
+    for attempt in range(1, STEP_MAX_ATTEMPTS + 1):
+        try:
+            out = fn()
+            break
+        except Exception as e:
+            if attempt == STEP_MAX_ATTEMPTS or isinstance(e, PERMANENT_ERRORS):
+                raise
+            delay = backoff_sec(attempt)
+            print(f"WARNING: step failed (attempt {attempt}/{STEP_MAX_ATTEMPTS}), retrying in {delay:.1f}s: {e}")
+            time.sleep(delay)
+    save(key, out)
+    return out
+
+
+async def arun(key: Optional[str], fn: Callable[[], Awaitable[Any]]) -> Any:
+    out = load(key)
+    if out is not None:
+        return out
+    for attempt in range(1, STEP_MAX_ATTEMPTS + 1):
+        try:
+            out = await fn()
+            break
+        except Exception as e:
+            if attempt == STEP_MAX_ATTEMPTS or isinstance(e, PERMANENT_ERRORS):
+                raise
+            delay = backoff_sec(attempt)
+            print(f"WARNING: step failed (attempt {attempt}/{STEP_MAX_ATTEMPTS}), retrying in {delay:.1f}s: {e}")
+            await asyncio.sleep(delay)
+    save(key, out)
+    return out
@@ -8,24 +8,31 @@ LangChain is used to interact with Databricks endpoints for style transfer.
 """
 
 import os, re, base64
+from functools import lru_cache
 from typing import Optional, TypedDict
 from databricks_langchain import ChatDatabricks
 from langgraph.graph import END, StateGraph, START
 from langchain_core.prompts import PromptTemplate, SystemMessagePromptTemplate, ChatPromptTemplate
 
+import endpoint_limits
+import token_budget
+
 # Get the directory where this file is located
 SRC_DIR = os.path.dirname(os.path.abspath(__file__))
 
 
+@lru_cache(maxsize=None)
+def _read_src_file(name: str) -> str:
+    """Contents of an instructions file in SRC_DIR, read once per process."""
+    with open(os.path.join(SRC_DIR, name), "r") as f:
+        return f.read()
+
+
 def create_style_transfer_prompts():
     """Create the chat prompt for the VPP Note update."""
-    # Read files using absolute paths
-    with open(os.path.join(SRC_DIR, "vpp_guidelines.md"), "r") as f:
-        vpp_manual = f.read()
-    with open(os.path.join(SRC_DIR, "special_instructions.md"), "r") as f:
-        sp_instructions = f.read()
-    with open(os.path.join(SRC_DIR, "date_instructions.md"), "r") as f:
-        date_instructions = f.read()
+    vpp_manual = _read_src_file("vpp_guidelines.md")
+    sp_instructions = _read_src_file("special_instructions.md")
+    date_instructions = _read_src_file("date_instructions.md")
 
     system_prompt = SystemMessagePromptTemplate.from_template(
         """You are a VPP (Virtual Physician Partner) who is helpful, precise, accurate, good at analyzing medical notes. You will be given VPP guidelines, a Med Onc Visit Note, and the date. Your goal is to re-write the Med Onc Visit Note in the style defined in the VPP Guidelines.
@@ -115,12 +122,12 @@ def prepare_style_transfer_graph(
     formatting_chain = fmt_prompt | model
 
     def style_transfer_node(state: CustomState) -> CustomState:
-        result = style_transfer_chain.invoke({"HIL_pdfs": state["initial_note"]})
+        result = endpoint_limits.run(model_endpoint, style_transfer_chain.invoke, {"HIL_pdfs": state["initial_note"]})
         state["needs_correction"] = result.content
         return state
 
     def judge_corrections(state: CustomState) -> CustomState:
-        result = judge_chain.invoke({
+        result = endpoint_limits.run(model_endpoint, judge_chain.invoke, {
             "needs_correction": state["needs_correction"],
             "wild_note": state["initial_note"]
         })
@@ -128,7 +135,7 @@ def prepare_style_transfer_graph(
         return state
 
     def judge_formatting(state: CustomState) -> CustomState:
-        result = formatting_chain.invoke({"needs_formatting": state["needs_formatting"]})
+        result = endpoint_limits.run(model_endpoint, formatting_chain.invoke, {"needs_formatting": state["needs_formatting"]})
         state["correct_and_formatted"] = result.content
 
         try:
@@ -181,6 +188,21 @@ def prepare_text_note_for_prompt(note_text: str, note_date: str) -> list:
     ]
 
 
+def fit_style_transfer_max_tokens(initial_note: list, model_endpoint: str, max_tokens: int) -> int:
+    """
+    Right-size max_tokens for the three graph calls (raises token_budget.PromptTooLargeError).
+    Call 1 sends the guidelines, special instructions and note; call 2 the special instructions,
+    note and call 1's output; call 3 call 2's output with the date and special instructions.
+    """
+    guidelines, special, dates = (token_budget.estimate_tokens(_read_src_file(n))
+                                  for n in ("vpp_guidelines.md", "special_instructions.md", "date_instructions.md"))
+    note = token_budget.estimate_tokens(initial_note)
+    fitted = token_budget.fit_max_tokens(guidelines + special + note, max_tokens, model_endpoint)
+    fitted = token_budget.fit_max_tokens(special + note + fitted, fitted, model_endpoint)
+    fitted = token_budget.fit_max_tokens(dates + special + fitted, fitted, model_endpoint)
+    return fitted
+
+
 def execute_style_transfer(
     page_images: list, 
     date: str, 
@@ -197,7 +219,6 @@ def execute_style_transfer(
         temperature (float): Sampling temperature
         max_tokens (int): Max output tokens
     """
-    graph = prepare_style_transfer_graph(model_endpoint, temperature, max_tokens)
     initial_note = prepare_pdf_note_for_prompt(page_images, date)
 
     state = {
@@ -207,6 +228,8 @@ def execute_style_transfer(
     }
 
     try:
+        max_tokens = fit_style_transfer_max_tokens(initial_note, model_endpoint, max_tokens)
+        graph = prepare_style_transfer_graph(model_endpoint, temperature, max_tokens)
         result_state = graph.invoke(state)
         return result_state["vpp_note"]
     except Exception as e:
@@ -229,7 +252,6 @@ def execute_style_transfer_text(
         temperature (float): Sampling temperature
         max_tokens (int): Max output tokens
     """
-    graph = prepare_style_transfer_graph(model_endpoint, temperature, max_tokens)
     initial_note = prepare_text_note_for_prompt(note_text, date)
 
     state = {
@@ -239,6 +261,8 @@ def execute_style_transfer_text(
     }
 
     try:
+        max_tokens = fit_style_transfer_max_tokens(initial_note, model_endpoint, max_tokens)
+        graph = prepare_style_transfer_graph(model_endpoint, temperature, max_tokens)
         result_state = graph.invoke(state)
         return result_state["vpp_note"]
     except Exception as e:
@@ -0,0 +1,197 @@
+# src/token_budget.py
+"""
+Local token estimates and a preflight check for LLM calls.
+
+Nothing here calls a tokenizer: estimates are characters / CHARS_PER_TOKEN
+(slightly pessimistic for clinical text, which is dense in numbers and
+abbreviations) plus IMAGE_TOKENS per page image. That is accurate to about
+10-15%, which is enough to:
+
+- catch prompts that cannot fit an endpoint's context window before the round-trip
+  (PromptTooLargeError)
+- right-size max_tokens: never ask for more output than the window has left
+- split batched inputs (e.g. closeness batches) so each call's input and output fit
+- record per-call estimates, globally (stats()) and per scope (track()), the same
+  way llm_cache counts hits
+
+Usage:
+    budget = token_budget.preflight(prompt, endpoint, max_tokens=1500)
+    payload["max_tokens"] = budget["MaxTokens"]
+    with token_budget.track() as st:
+        ...
+    st.calls, st.input_tokens
+"""
+
+from __future__ import annotations
+from typing import Any, Dict, List, Optional, Sequence
+from contextlib import contextmanager
+import contextvars
+import os
+import threading
+
+CHARS_PER_TOKEN = float(os.environ.get("VPP_CHARS_PER_TOKEN", "3.5"))
+IMAGE_TOKENS = int(os.environ.get("VPP_IMAGE_TOKENS", "1600"))        # one rendered PDF page
+MESSAGE_OVERHEAD_TOKENS = 8                                             # role/framing per chat message
+SAFETY_MARGIN_TOKENS = int(os.environ.get("VPP_TOKEN_SAFETY_MARGIN", "1024"))
+MIN_OUTPUT_TOKENS = 256  # below this a JSON verdict can't be completed, so reject instead
+LOG_ESTIMATES = os.environ.get("VPP_TOKEN_LOG", "0").strip().lower() in {"1", "true", "yes"}
+
+DEFAULT_CONTEXT_WINDOW = 200_000
+# Context windows by endpoint-name substring, checked in order
+CONTEXT_WINDOWS = [
+    ("llama-3-3-70b", 128_000),
+    ("llama", 128_000),
+    ("claude", 200_000),
+]
+
+
+class PromptTooLargeError(ValueError):
+    """The prompt (plus the minimum output) does not fit the endpoint's context window."""
+
+
+def context_window(endpoint: Optional[str]) -> int:
+    name = (endpoint or "").lower()
+    for fragment, window in CONTEXT_WINDOWS:
+        if fragment in name:
+            return window
+    return DEFAULT_CONTEXT_WINDOW
+
+
+def _text_tokens(text: str) -> int:
+    return int(len(text) / CHARS_PER_TOKEN) + 1 if text else 0
+
+
+def estimate_tokens(prompt: Any) -> int:
+    """
+    Estimated input tokens of a prompt: a str, a content-part list ({"type": "text"|"image_url"}),
+    chat messages (dicts with "content", (role, content) tuples or LangChain messages), or a
+    list of any of these.
+    """
+    if prompt is None:
+        return 0
+    if isinstance(prompt, str):
+        return _text_tokens(prompt)
+    if isinstance(prompt, dict):
+        if prompt.get("type") == "image_url" or "image_url" in prompt:
+            return IMAGE_TOKENS
+        if prompt.get("type") == "text":
+            return _text_tokens(str(prompt.get("text", "")))
+        if "content" in prompt:
+            return MESSAGE_OVERHEAD_TOKENS + estimate_tokens(prompt["content"])
+        return _text_tokens(str(prompt))
+    if isinstance(prompt, tuple) and len(prompt) == 2 and isinstance(prompt[0], str):
+        return MESSAGE_OVERHEAD_TOKENS + estimate_tokens(prompt[1])  # ("human", content)
+    if isinstance(prompt, (list, tuple)):
+        return sum(estimate_tokens(p) for p in prompt)
+    if hasattr(prompt, "content"):
+        return MESSAGE_OVERHEAD_TOKENS + estimate_tokens(prompt.content)
+    return _text_tokens(str(prompt))
+
+
+def fit_max_tokens(
+    input_tokens: int, max_tokens: int, endpoint: Optional[str] = None, min_output: int = MIN_OUTPUT_TOKENS
+) -> int:
+    """max_tokens capped to what the context window leaves after the input; raises if under min_output."""
+    window = context_window(endpoint)
+    available = window - input_tokens - SAFETY_MARGIN_TOKENS
+    if available < min(min_output, int(max_tokens)):
+        raise PromptTooLargeError(
+            f"Prompt of ~{input_tokens} tokens leaves {max(available, 0)} output tokens "
+            f"in the {window}-token window of {endpoint or 'the default endpoint'}"
+        )
+    return min(int(max_tokens), available)
+
+
+class BudgetStats:
+    def __init__(self):
+        self.calls = 0
+        self.input_tokens = 0
+        self.max_tokens = 0
+        self.capped = 0  # calls whose max_tokens was reduced to fit
+        self._lock = threading.Lock()
+
+    def record(self, input_tokens: int, max_tokens: int, capped: bool) -> None:
+        with self._lock:
+            self.calls += 1
+            self.input_tokens += input_tokens
+            self.max_tokens += max_tokens
+            self.capped += int(capped)
+
+    def as_dict(self) -> Dict[str, int]:
+        return {"calls": self.calls, "input_tokens": self.input_tokens, "max_tokens": self.max_tokens, "capped": self.capped}
+
+
+_GLOBAL_STATS = BudgetStats()
+_SCOPE_STATS: contextvars.ContextVar[Optional[BudgetStats]] = contextvars.ContextVar("token_budget_scope", default=None)
+
+
+def preflight(
+    prompt: Any, endpoint: Optional[str], max_tokens: int, label: str = "", min_output: int = MIN_OUTPUT_TOKENS
+) -> Dict[str, Any]:
+    """
+    Estimate a call before sending it: returns {"InputTokens", "MaxTokens", "ContextWindow"}
+    with MaxTokens right-sized to the window, and records the estimate. Raises
+    PromptTooLargeError if the prompt cannot fit with at least min_output tokens of output
+    (pass min_output=max_tokens for clients whose max_tokens can't be changed per call).
+    """
+    input_tokens = estimate_tokens(prompt)
+    fitted = fit_max_tokens(input_tokens, max_tokens, endpoint, min_output)
+    capped = fitted < int(max_tokens)
+    _GLOBAL_STATS.record(input_tokens, fitted, capped)
+    scope = _SCOPE_STATS.get()
+    if scope is not None:
+        scope.record(input_tokens, fitted, capped)
+    if LOG_ESTIMATES or capped:
+        note = f" (capped from {max_tokens})" if capped else ""
+        print(f"DEBUG: token preflight {label or endpoint}: ~{input_tokens} in, max_tokens={fitted}{note}")
+    return {"InputTokens": input_tokens, "MaxTokens": fitted, "ContextWindow": context_window(endpoint)}
+
+
+def split_to_fit(
+    items: Sequence[Any],
+    fixed_tokens: int,
+    endpoint: Optional[str],
+    max_tokens: int,
+    output_per_item: int = 0,
+    max_items: Optional[int] = None,
+) -> List[List[Any]]:
+    """
+    Split items into consecutive chunks such that each chunk's prompt (fixed_tokens + its
+    items) fits the window with max_tokens of output, and its expected output
+    (output_per_item per item) fits max_tokens. A single item that cannot fit on its
+    own raises PromptTooLargeError.
+    """
+    input_budget = context_window(endpoint) - SAFETY_MARGIN_TOKENS - int(max_tokens) - fixed_tokens
+    per_call_items = max(1, int(max_tokens) // output_per_item) if output_per_item else None
+    if max_items:
+        per_call_items = min(per_call_items or max_items, max_items)
+    chunks: List[List[Any]] = []
+    current: List[Any] = []
+    used = 0
+    for item in items:
+        n = estimate_tokens(item)
+        if n > input_budget:
+            raise PromptTooLargeError(f"An input of ~{n} tokens exceeds the ~{max(input_budget, 0)}-token budget per call")
+        if current and (used + n > input_budget or (per_call_items and len(current) >= per_call_items)):
+            chunks.append(current)
+            current, used = [], 0
+        current.append(item)
+        used += n
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def stats() -> Dict[str, int]:
+    return _GLOBAL_STATS.as_dict()
+
+
+@contextmanager
+def track():
+    """Sum the preflight estimates of the calls made inside this block (see llm_cache.track)."""
+    st = BudgetStats()
+    token = _SCOPE_STATS.set(st)
+    try:
+        yield st
+    finally:
+        _SCOPE_STATS.reset(token)
@@ -8,17 +8,27 @@ This module provides functionality to update a VPP Note based on recent notes an
 
 import pypdfium2 as pdfium
 import io, base64, os
+from functools import lru_cache
 from databricks_langchain import ChatDatabricks
 from langchain_core.prompts import SystemMessagePromptTemplate, HumanMessagePromptTemplate, ChatPromptTemplate
 
+import endpoint_limits
+import token_budget
+
 # Get the directory where this file is located
 SRC_DIR = os.path.dirname(os.path.abspath(__file__))
 
 
+@lru_cache(maxsize=None)
+def _vpp_guidelines() -> str:
+    """vpp_guidelines.md, read once per process."""
+    with open(os.path.join(SRC_DIR, "vpp_guidelines.md"), "r") as f:
+        return f.read()
+
+
 def create_chat_prompt():
     """Create the chat prompt for VPP Note update."""
-    with open(os.path.join(SRC_DIR, "vpp_guidelines.md"), "r") as f:
-        vpp_manual = f.read()
+    vpp_manual = _vpp_guidelines()
     
     system_prompt = SystemMessagePromptTemplate.from_template(
         """You are a VPP (Virtual Physician Partner) who is helpful, precise, accurate, good at analyzing medical documents. You will be given VPP guidelines, reports with their creation dates, and the most recent VPP Note. Your goal is to append to the most recent VPP Note to update it with any new information from the reports.
@@ -115,8 +125,6 @@ def append_to_vpp_note(
     Returns:
         tuple: (updated_note, metadata)
     """
-    append_chain = prepare_chain(model_endpoint, temperature, max_tokens)
-    
     # Flatten nested lists
     flattened_page_images = [
         item if isinstance(sublist, list) else sublist
@@ -132,7 +140,11 @@ def append_to_vpp_note(
     }
     
     try:
-        message = append_chain.invoke(state)
+        # right-size max_tokens to what the guidelines, note and page images leave of the window
+        budget = token_budget.preflight([_vpp_guidelines(), state["most_recent_note"], state["HIL_pdfs"]],
+                                        model_endpoint, max_tokens, label="append_to_vpp_note")
+        append_chain = prepare_chain(model_endpoint, temperature, budget["MaxTokens"])
+        message = endpoint_limits.run(model_endpoint, append_chain.invoke, state)
         return message.content, message.response_metadata
     except Exception as e:
         out = f"Error processing VPP Note: {str(e)}"
@@ -0,0 +1,210 @@
+# src/vpp_rules.py
+"""
+Single VPP rule registry, compiled once at import.
+
+- VPP_RULES: the rule list (id, category, rule, page, weight)
+- RULES_BY_ID / RULES_BY_CATEGORY / RULES_BY_WEIGHT: lookup indexes
+- BUCKETS / BUCKET_TEXT: rules grouped into the Critical / Important / Moderate /
+  Minor weight buckets used by the compliance prompt, with their prompt text
+  pre-rendered
+- TOTAL_WEIGHT: denominator of the weighted compliance score
+- RULES_HASH: content hash of the rule set (ids, text and weights). Step checkpoint
+  keys include it, because stored compliance results are scored with the weights;
+  llm_cache keys don't need it, since the rule text is part of every compliance prompt
+"""
+
+from __future__ import annotations
+from typing import Dict, List, Tuple
+from functools import lru_cache
+import hashlib
+import json
+
+VPP_RULES = [
+  {"id":"R001","category":"Structure","rule":"Every VPP note starts with a Brief One‑Liner, followed by the Oncological History.","page":10,"weight":5},
+  {"id":"R002","category":"Structure","rule":"If a Detailed One‑Liner is used, place it in the Assessment & Plan section, not above the History.","page":14,"weight":5},
+  {"id":"R003","category":"Structure","rule":"Insert a Disease Header before each Oncological History block.","page":17,"weight":5},
+  {"id":"R004","category":"Structure","rule":"Disease Headers must precede each primary cancer timeline when multiple primaries exist.","page":17,"weight":5},
+  {"id":"R005","category":"Structure","rule":"Bulleted History entries are ordered strictly earliest → latest.","page":18,"weight":4},
+  {"id":"R006","category":"Structure","rule":"Create a distinct paragraph for each primary diagnosis in reverse‑chronological DOD order.","page":16,"weight":5},
+  {"id":"R007","category":"Structure","rule":"Sub‑bullets are used only for nested events tied to the parent date (e.g., drug holds).","page":22,"weight":3},
+  {"id":"R008","category":"Structure","rule":"Never merge two distinct clinical events into one bullet; duplicate the date line instead.","page":12,"weight":4},
+  {"id":"R009","category":"Structure","rule":"Hospitalisations are documented as a separate bullet spanning the admission date range.","page":24,"weight":3},
+  {"id":"R010","category":"Structure","rule":"Long histories (>5 yrs) may be summarised in one bullet except DOD, treatment, and recurrence bullets which stay explicit.","page":25,"weight":3},
+
+  {"id":"R011","category":"Formatting","rule":"Disease Headers are **bold + underlined**.","page":11,"weight":1},
+  {"id":"R012","category":"Formatting","rule":"All dates in top‑level bullets are **bold**; dates inside a sub‑bullet are not.","page":12,"weight":1},
+  {"id":"R013","category":"Formatting","rule":"Dates use the format MM/DD/YYYY (leading zeros required).","page":12,"weight":2},
+  {"id":"R014","category":"Formatting","rule":"Partial dates retain bolding but omit unknown pieces (e.g., 04/2023 or 2023).","page":12,"weight":2},
+  {"id":"R015","category":"Formatting","rule":"Approximate seasons map to Jan / Apr / Jul / Oct for Winter / Spring / Summer / Fall.","page":13,"weight":1},
+  {"id":"R016","category":"Formatting","rule":"The phrases \"Date of Diagnosis\", histopathology names, Stage/TNM, treatment names, and the words Recurrence / Progression / Metastasis are **bold**.","page":11,"weight":2},
+  {"id":"R017","category":"Formatting","rule":"Do **not** use symbols such as + or & between drugs—spell out \"and\".","page":13,"weight":1},
+  {"id":"R018","category":"Formatting","rule":"Use the phrase \"consistent with\" when recording pathology findings.","page":20,"weight":1},
+  {"id":"R019","category":"Formatting","rule":"Indent second‑level bullets by exactly one tab stop or two spaces.","page":18,"weight":1},
+  {"id":"R020","category":"Formatting","rule":"No blank lines between consecutive bullets within the same diagnosis block.","page":18,"weight":1},
+
+  {"id":"R021","category":"Dates","rule":"When multiple source docs share the same date, create separate bullets for each document.","page":12,"weight":3},
+  {"id":"R022","category":"Dates","rule":"For biomarker results on archival tissue, use the tissue‑collection date, not the report date.","page":19,"weight":4},
+  {"id":"R023","category":"Dates","rule":"Escalate missing dates via the 'missing‑information' process; do not invent dates.","page":13,"weight":4},
+  {"id":"R024","category":"Dates","rule":"Date ranges for completed treatments appear as MM/DD/YYYY‑MM/DD/YYYY and are bold.","page":21,"weight":3},
+  {"id":"R025","category":"Dates","rule":"Holds or dose reductions appear as sub‑bullets with their own date range.","page":22,"weight":3},
+  {"id":"R026","category":"Dates","rule":"For oral SACT with unknown stop date, record only the start date.","page":30,"weight":3},
+  {"id":"R027","category":"Dates","rule":"Use collection date ('Collected') from pathology, never the report sign‑out date.","page":25,"weight":4},
+  {"id":"R028","category":"Dates","rule":"If MD notes specify \"started X days ago\", back‑calculate actual start date.","page":30,"weight":4},
+  {"id":"R029","category":"Dates","rule":"Do not bold dates inside parentheses or within narrative prose.","page":11,"weight":2},
+  {"id":"R030","category":"Dates","rule":"Imaging follow‑up lists only the three most‑recent study dates unless abnormal.","page":23,"weight":2},
+
+  {"id":"R031","category":"One‑Liner (Brief)","rule":"Brief One‑Liner always includes Age, Gender, Histopathology, Site/Laterality, and current management.","page":13,"weight":4},
+  {"id":"R032","category":"One‑Liner (Brief)","rule":"If Stage IV, prepend the word \"Metastatic\" before histopathology.","page":13,"weight":4},
+  {"id":"R033","category":"One‑Liner (Brief)","rule":"If metastasis occurred later, append \"now with metastasis\" after Site/Laterality.","page":13,"weight":3},
+  {"id":"R034","category":"One‑Liner (Brief)","rule":"Exclude any mention of \"non‑metastatic\" status.","page":15,"weight":2},
+  {"id":"R035","category":"One‑Liner (Brief)","rule":"Current treatment text begins with \"Currently on …\" and lists active systemic or RT modality.","page":14,"weight":3},
+  {"id":"R036","category":"One‑Liner (Brief)","rule":"Use full generic or trade names for active drugs—no abbreviations.","page":14,"weight":2},
+  {"id":"R037","category":"One‑Liner (Brief)","rule":"Laterality is stated only for paired organs.","page":13,"weight":2},
+  {"id":"R038","category":"One‑Liner (Brief)","rule":"Remove trailing periods inside drug lists except the sentence‑final period.","page":13,"weight":1},
+  {"id":"R039","category":"One‑Liner (Brief)","rule":"When no active treatment, replace with \"on follow‑up\" or \"on surveillance\".","page":15,"weight":3},
+  {"id":"R040","category":"One‑Liner (Brief)","rule":"Do not include biomarker info in the Brief One‑Liner.","page":13,"weight":2},
+
+  {"id":"R041","category":"One‑Liner (Detailed)","rule":"Detailed One‑Liner begins with Age and Gender, then lists biomarkers, Stage/TNM, Grade, Histopathology.","page":14,"weight":3},
+  {"id":"R042","category":"One‑Liner (Detailed)","rule":"Include 's/p' phrase summarising key past cancer‑directed therapies.","page":14,"weight":3},
+  {"id":"R043","category":"One‑Liner (Detailed)","rule":"If metastatic, include term before biomarkers (e.g., \"Metastatic EGFR‑mutated …\").","page":14,"weight":3},
+  {"id":"R044","category":"One‑Liner (Detailed)","rule":"For progression‑related metastasis, insert clause \"now with metastasis\" after the therapy summary.","page":14,"weight":3},
+  {"id":"R045","category":"One‑Liner (Detailed)","rule":"Use comma‑separated list for biomarkers in canonical order (e.g., ER, PR, HER2).","page":15,"weight":2},
+  {"id":"R046","category":"One‑Liner (Detailed)","rule":"Do not state drug cycles or doses in the One‑Liner.","page":14,"weight":2},
+  {"id":"R047","category":"One‑Liner (Detailed)","rule":"Spell out staging as \"Stage IIIA (T2N2M0)\" when TNM known; omit TNM if unknown.","page":14,"weight":3},
+  {"id":"R048","category":"One‑Liner (Detailed)","rule":"Use \"Grade #\" (arabic numeral) for histologic grade.","page":14,"weight":2},
+  {"id":"R049","category":"One‑Liner (Detailed)","rule":"Never split a Detailed One‑Liner across lines—keep as one paragraph.","page":14,"weight":2},
+  {"id":"R050","category":"One‑Liner (Detailed)","rule":"When both one‑liners are present, the Brief precedes the Detailed.","page":14,"weight":3},
+
+  {"id":"R051","category":"History","rule":"Presenting Symptom bullet contains symptom description or incidental finding and its date.","page":18,"weight":3},
+  {"id":"R052","category":"History","rule":"Diagnostic/Staging Work‑up bullets list date, test name, and concise impression only.","page":18,"weight":3},
+  {"id":"R053","category":"History","rule":"Imaging bullets include measurement details only if clinically relevant.","page":18,"weight":2},
+  {"id":"R054","category":"History","rule":"Biopsy bullets list specimen source and major biomarkers in one sentence.","page":19,"weight":3},
+  {"id":"R055","category":"History","rule":"All positive and key negative biomarkers must be captured when reported.","page":19,"weight":3},
+  {"id":"R056","category":"History","rule":"Use a sub‑bullet under the tissue‑collection date for later genomic testing on that specimen.","page":19,"weight":3},
+  {"id":"R057","category":"History","rule":"Mark the first malignant pathology bullet with the phrase \"Date of Diagnosis\".","page":20,"weight":5},
+  {"id":"R058","category":"History","rule":"Surgical pathology bullets enumerate margins and nodal status if reported.","page":20,"weight":3},
+  {"id":"R059","category":"History","rule":"Radiation therapy bullets show modality, site, total Gy, and total fractions.","page":21,"weight":3},
+  {"id":"R060","category":"History","rule":"Systemic therapy bullets list start date and drugs; if cycles known, add \"x N cycles\".","page":21,"weight":3},
+  {"id":"R061","category":"History","rule":"Systemic therapy holds or doses reductions appear as sub‑bullets with reason.","page":22,"weight":3},
+  {"id":"R062","category":"History","rule":"When a drug is stopped, include discontinue reason in same line.","page":22,"weight":3},
+  {"id":"R063","category":"History","rule":"Clinical‑trial bullets begin with protocol/study name before listing drugs.","page":22,"weight":3},
+  {"id":"R064","category":"History","rule":"Concurrent chemo‑radiation is recorded as separate bullets, ordered by start date.","page":22,"weight":3},
+  {"id":"R065","category":"History","rule":"Follow‑up/Surveillance section lists only imaging or labs used to monitor for recurrence.","page":23,"weight":2},
+  {"id":"R066","category":"History","rule":"If on follow‑up < 1 yr, list every imaging study; if > 1 yr, summarise with date range.","page":23,"weight":2},
+  {"id":"R067","category":"History","rule":"Recurrence/Progression/Metastasis terms are bolded only when confirmed by physician.","page":24,"weight":3},
+  {"id":"R068","category":"History","rule":"If radiologist report and MD disagree, follow MD assessment for bolding.","page":24,"weight":3},
+  {"id":"R069","category":"History","rule":"Hospitalization bullets include admission date range, reason, and key findings.","page":24,"weight":3},
+  {"id":"R070","category":"History","rule":"If DOD occurs during hospital stay, list DOD bullet after the admission bullet.","page":24,"weight":3},
+
+  {"id":"R071","category":"Core Variables","rule":"Capture Date of Diagnosis from pathology 'Collected' date whenever available.","page":25,"weight":5},
+  {"id":"R072","category":"Core Variables","rule":"If no pathology, MD‑confirmed imaging date may serve as DOD.","page":25,"weight":5},
+  {"id":"R073","category":"Core Variables","rule":"Primary Site comes from pathology addendum if superseded.","page":26,"weight":5},
+  {"id":"R074","category":"Core Variables","rule":"Histologic Type is taken from pathology; if unavailable, use MD‑stated clinical type.","page":27,"weight":5},
+  {"id":"R075","category":"Core Variables","rule":"Laterality for unifocal tumours resolved via pathology + imaging hierarchy.","page":27,"weight":4},
+  {"id":"R076","category":"Core Variables","rule":"Laterality for systemic disease follows MD statement, else ICD‑10 digit.","page":27,"weight":4},
+  {"id":"R077","category":"Core Variables","rule":"Stage IV equals metastatic; patient never reverts to non‑metastatic even after response.","page":28,"weight":4},
+  {"id":"R078","category":"Core Variables","rule":"Metastatic status NOT captured for haematologic malignancies.","page":28,"weight":4},
+  {"id":"R079","category":"Core Variables","rule":"Biomarker list derives from genetic testing **plus** MD note; merge both sources.","page":29,"weight":4},
+  {"id":"R080","category":"Core Variables","rule":"Always document pertinent negatives for disease‑specific biomarkers (e.g., EGFR wild‑type).","page":15,"weight":3},
+  {"id":"R081","category":"Core Variables","rule":"Surgery events require operative + pathology source, or MD note if others unavailable.","page":29,"weight":4},
+  {"id":"R082","category":"Core Variables","rule":"Radiation events prefer Rad‑Onc summary; fallback to Med‑Onc note.","page":30,"weight":3},
+  {"id":"R083","category":"Core Variables","rule":"Oral SACT start date hierarchy: MD note > Nurse note > Prescription date.","page":30,"weight":4},
+  {"id":"R084","category":"Core Variables","rule":"Injectable SACT dates come from MAR/eMAR; watch for planned vs actual doses.","page":31,"weight":4},
+  {"id":"R085","category":"Core Variables","rule":"Clinical‑trial bullets must include protocol number when present.","page":31,"weight":4},
+  {"id":"R086","category":"Core Variables","rule":"Every patient entry must include all seven core variables before mark as complete.","page":25,"weight":5},
+  {"id":"R087","category":"Core Variables","rule":"Escalate to missing‑info workflow if any core variable cannot be sourced.","page":13,"weight":4},
+  {"id":"R088","category":"Core Variables","rule":"Use AJCC/NCCN guidance to decide metastatic status for nodal patterns.","page":28,"weight":4},
+  {"id":"R089","category":"Core Variables","rule":"Map ICD‑10 sub‑digit to laterality only when higher evidence absent.","page":27,"weight":3},
+  {"id":"R090","category":"Core Variables","rule":"Do not duplicate core‑variable bullets in multiple places; capture once per diagnosis.","page":25,"weight":4},
+
+  {"id":"R091","category":"Multiple Primaries","rule":"When primaries share the same active treatment, combine One‑Liners but keep dual history blocks.","page":16,"weight":4},
+  {"id":"R092","category":"Multiple Primaries","rule":"If primaries are in bilateral paired organs, specify Laterality in Disease Header.","page":17,"weight":3},
+  {"id":"R093","category":"Multiple Primaries","rule":"Order primary histories by most recent Date of Diagnosis first.","page":16,"weight":4},
+  {"id":"R094","category":"Multiple Primaries","rule":"Do not interleave events from different primaries within the same bullet list.","page":16,"weight":4},
+  {"id":"R095","category":"Multiple Primaries","rule":"When summarising Brief One‑Liners for multiple primaries, each begins with patient name only once.","page":16,"weight":3},
+
+  {"id":"R096","category":"Metastatic","rule":"Use the word \"Metastatic\" only for Stage IV disease, never for Stage I‑III.","page":15,"weight":3},
+  {"id":"R097","category":"Metastatic","rule":"For metastatic progression, phrase \"now with metastasis\" after site.","page":13,"weight":3},
+  {"id":"R098","category":"Metastatic","rule":"Do not bold the word 'metastatic' inside imaging summaries.","page":18,"weight":2},
+  {"id":"R099","category":"Metastatic","rule":"Recurrence, progression, and metastasis keywords are bolded exactly as spelled—no variations.","page":24,"weight":3},
+  {"id":"R100","category":"Metastatic","rule":"If radiologist calls metastasis but MD disagrees, follow MD and remove bolding.","page":24,"weight":3},
+
+  {"id":"R101","category":"Biomarkers","rule":"Breast one‑liners must list ER, PR, HER2, BRCA1/2 status if available.","page":15,"weight":3},
+  {"id":"R102","category":"Biomarkers","rule":"Colorectal one‑liners list CEA, MSI/MMR, TMB, APC, NRAS, KRAS when available.","page":15,"weight":3},
+  {"id":"R103","category":"Biomarkers","rule":"NSCLC one‑liners list PD‑L1, EGFR, ALK, ROS1.","page":15,"weight":3},
+  {"id":"R104","category":"Biomarkers","rule":"Prostate one‑liners list PSA and BRCA2 as applicable.","page":15,"weight":3},
+  {"id":"R105","category":"Biomarkers","rule":"When blood‑based biomarker, record vendor, assay, specimen, and findings in one line.","page":19,"weight":3},
+
+  {"id":"R106","category":"Treatment","rule":"Radiation bullets for completed RT include total dose in Gy and total fractions.","page":21,"weight":3},
+  {"id":"R107","category":"Treatment","rule":"Current systemic therapy bullets begin with \"Started\" and name regimen.","page":21,"weight":3},
+  {"id":"R108","category":"Treatment","rule":"Completed systemic therapy bullets show cycles given and planned.","page":22,"weight":3},
+  {"id":"R109","category":"Treatment","rule":"Dose holds indicated with phrase \"Held\" or \"Dose reduced due to X\".","page":22,"weight":3},
+  {"id":"R110","category":"Treatment","rule":"Switching drugs inside a regimen is shown with sub‑bullet \"Switched … to … due to X\".","page":22,"weight":3},
+  {"id":"R111","category":"Treatment","rule":"Clinical‑trial bullets include start date and, if discontinued, stop reason.","page":22,"weight":3},
+  {"id":"R112","category":"Treatment","rule":"Concurrent chemoradiation documented as separate bullets—do not fuse into one line.","page":22,"weight":3},
+  {"id":"R113","category":"Treatment","rule":"Surgery bullets embed key pathology findings inside same line where space allows.","page":20,"weight":3},
+  {"id":"R114","category":"Treatment","rule":"If surgical margin status is absent, omit field rather than writing 'unknown'.","page":20,"weight":2},
+  {"id":"R115","category":"Treatment","rule":"Each treatment bullet starts with the treatment start date (or date range if completed).","page":21,"weight":3},
+
+  {"id":"R116","category":"Follow‑up","rule":"For surveillance > 1 yr, compress imaging into date‑range bullets rather than listing every scan.","page":23,"weight":2},
+  {"id":"R117","category":"Recurrence","rule":"Only bold Recurrence/Progression/Metastasis if MD confirms; otherwise record as plain text.","page":24,"weight":3},
+  {"id":"R118","category":"Hospitalisation","rule":"Admission bullets summarise presenting complaint, key imaging/lab findings, and outcome.","page":24,"weight":3}
+]
+
+
+BUCKET_NAMES = ["Critical", "Important", "Moderate", "Minor"]
+
+
+def bucket_of(weight: int) -> str:
+    if weight >= 5:
+        return "Critical"
+    if weight == 4:
+        return "Important"
+    if weight == 3:
+        return "Moderate"
+    return "Minor"
+
+
+def format_rules(rules: List[Dict]) -> str:
+    return "\n".join(f"- {r['id']}: {r['rule']}" for r in rules) or "- (none in this set)"
+
+
+RULES_BY_ID: Dict[str, Dict] = {r["id"]: r for r in VPP_RULES}
+RULES_BY_CATEGORY: Dict[str, List[Dict]] = {}
+RULES_BY_WEIGHT: Dict[int, List[Dict]] = {}
+BUCKETS: Dict[str, List[Dict]] = {b: [] for b in BUCKET_NAMES}
+for _r in VPP_RULES:
+    RULES_BY_CATEGORY.setdefault(_r["category"], []).append(_r)
+    RULES_BY_WEIGHT.setdefault(_r["weight"], []).append(_r)
+    BUCKETS[bucket_of(_r["weight"])].append(_r)
+del _r
+
+BUCKET_TEXT: Dict[str, str] = {b: format_rules(rs) for b, rs in BUCKETS.items()}
+TOTAL_WEIGHT: int = sum(r["weight"] for r in VPP_RULES)
+RULES_HASH: str = hashlib.sha256(
+    json.dumps(VPP_RULES, sort_keys=True, ensure_ascii=False).encode("utf-8")
+).hexdigest()[:16]
+
+
+@lru_cache(maxsize=None)
+def shard_ids(max_rules: int) -> Tuple[Tuple[str, ...], ...]:
+    """
+    Rule ids split by category for sharded compliance: whole categories are packed,
+    in rule order, into shards of at most max_rules (a larger category is its own shard).
+    """
+    shards, current = [], []
+    for rules in RULES_BY_CATEGORY.values():
+        if current and len(current) + len(rules) > max_rules:
+            shards.append(tuple(current))
+            current = []
+        current += [r["id"] for r in rules]
+    if current:
+        shards.append(tuple(current))
+    return tuple(shards)
+
+
+@lru_cache(maxsize=None)
+def bucket_text_for(ids: Tuple[str, ...]) -> Dict[str, str]:
+    """BUCKET_TEXT for a subset of rules (e.g. one shard), rendered once per subset."""
+    rules = [RULES_BY_ID[i] for i in ids]
+    return {b: format_rules([r for r in rules if bucket_of(r["weight"]) == b]) for b in BUCKET_NAMES}
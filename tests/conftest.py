@@ -0,0 +1,6 @@
+# tests/conftest.py
+import os
+import sys
+
+# Modules under src/ import each other by bare name (import token_budget), as on the cluster
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
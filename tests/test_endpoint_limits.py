@@ -0,0 +1,69 @@
+# tests/test_endpoint_limits.py
+import endpoint_limits
+
+
+class _HTTPError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+def test_healthy_release_increases_limit_additively():
+    lim = endpoint_limits.AIMDLimiter(initial=4, max_limit=8)
+    lim.acquire()
+    lim.release(0.1)
+    assert lim.limit == 4.25
+    assert lim.in_flight == 0
+
+
+def test_overload_halves_limit_once_per_round_trip():
+    lim = endpoint_limits.AIMDLimiter(initial=8)
+    for _ in range(3):
+        lim.acquire()
+    for _ in range(3):
+        lim.release(0.1, overloaded=True)
+    assert lim.limit == 8 * endpoint_limits.DECREASE_FACTOR
+    assert lim.n_decreases == 1
+
+
+def test_failed_release_frees_slot_without_adapting():
+    lim = endpoint_limits.AIMDLimiter(initial=2)
+    lim.acquire()
+    lim.release(0.1, failed=True)
+    assert (lim.limit, lim.in_flight, lim.latency_ewma) == (2.0, 0, None)
+
+
+def test_try_acquire_stops_at_limit():
+    lim = endpoint_limits.AIMDLimiter(initial=1)
+    assert lim.try_acquire()
+    assert not lim.try_acquire()
+
+
+def test_is_transient_classifies_errors():
+    assert endpoint_limits.is_transient(_HTTPError(503))
+    assert endpoint_limits.is_transient(_HTTPError(429))
+    assert endpoint_limits.is_transient(TimeoutError())
+    assert not endpoint_limits.is_transient(_HTTPError(400))
+    assert not endpoint_limits.is_transient(ValueError("bad JSON"))
+
+
+def test_is_transient_follows_cause_chain():
+    try:
+        try:
+            raise ConnectionError("reset by peer")
+        except ConnectionError as e:
+            raise RuntimeError("request failed") from e
+    except RuntimeError as wrapped:
+        assert endpoint_limits.is_transient(wrapped)
+
+
+def test_non_blocking_slot_yields_false_at_limit():
+    ep = "test-limits-nonblocking"
+    endpoint_limits.configure(ep, initial=1, min=1, max=1)
+    with endpoint_limits.slot(ep) as held:
+        assert held
+        with endpoint_limits.slot(ep, block=False) as acquired:
+            assert not acquired
+    assert endpoint_limits.limiter(ep).in_flight == 0
+    with endpoint_limits.slot(ep, block=False) as acquired:
+        assert acquired
@@ -0,0 +1,67 @@
+# tests/test_endpoint_pool.py
+import asyncio
+
+import pytest
+
+from endpoint_pool import EndpointPool
+
+
+class _HTTPError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+def _failing_first(status_code):
+    tried = []
+
+    def fn(ep):
+        tried.append(ep)
+        if len(tried) == 1:
+            raise _HTTPError(status_code)
+        return ep
+    return fn, tried
+
+
+def test_overload_fails_over_and_cools_down_endpoint():
+    pool = EndpointPool(["test-pool-503-a", "test-pool-503-b"])
+    fn, tried = _failing_first(503)
+    assert pool.call(fn) == tried[1]
+    assert list(pool._failed_at) == [tried[0]]
+    assert pool.ranked()[-1] == tried[0]
+
+
+def test_client_error_is_raised_without_failover():
+    pool = EndpointPool(["test-pool-400-a", "test-pool-400-b"])
+    fn, tried = _failing_first(400)
+    with pytest.raises(_HTTPError):
+        pool.call(fn)
+    assert len(tried) == 1
+    assert pool._failed_at == {}
+
+
+def test_async_client_error_is_raised_without_failover():
+    pool = EndpointPool(["test-pool-async-a", "test-pool-async-b"])
+    sync_fn, tried = _failing_first(400)
+
+    async def fn(ep):
+        return sync_fn(ep)
+    with pytest.raises(_HTTPError):
+        asyncio.run(pool.acall(fn))
+    assert len(tried) == 1
+    assert pool._failed_at == {}
+
+
+def test_all_endpoints_failing_raises_last_error():
+    pool = EndpointPool(["test-pool-down-a", "test-pool-down-b"])
+
+    def fn(ep):
+        raise ConnectionError(ep)
+    with pytest.raises(ConnectionError):
+        pool.call(fn)
+    assert set(pool._failed_at) == set(pool.endpoints)
+
+
+def test_pool_needs_an_endpoint():
+    with pytest.raises(ValueError):
+        EndpointPool([])
@@ -0,0 +1,84 @@
+# tests/test_llm_cache.py
+import llm_cache
+
+
+def _cache(tmp_path, **kw):
+    args = {"ttl_sec": 3600, "max_mb": 1, "l1_entries": 0, "touch_sec": 3600}
+    args.update(kw)
+    return llm_cache.ResponseCache(str(tmp_path / "cache.sqlite"), **args)
+
+
+def _accessed(cache, key):
+    return cache._conn().execute(f"SELECT accessed FROM {cache.table} WHERE key = ?", (key,)).fetchone()[0]
+
+
+def test_make_key_depends_on_every_input():
+    base = llm_cache.make_key("ep", "prompt", 0.0, 100)
+    assert base == llm_cache.make_key("ep", "prompt", 0, 100)
+    assert base != llm_cache.make_key("ep", "prompt", 0.0, 101)
+    assert base != llm_cache.make_key("other", "prompt", 0.0, 100)
+
+
+def test_round_trip_through_l2(tmp_path):
+    cache = _cache(tmp_path)
+    cache.put("k", "value")
+    assert cache.get("k") == "value"
+    assert cache.get("missing") is None
+
+
+def test_size_total_tracks_writes(tmp_path):
+    cache = _cache(tmp_path)
+    cache.put("a", "x" * 10)
+    cache.put("b", "y" * 20)
+    cache.put("a", "z" * 5)
+    assert cache._l2_bytes == cache._l2_size(cache._conn()) == 25
+    cache.clear()
+    assert cache._l2_bytes == 0
+
+
+def test_evicts_least_recently_accessed_when_over_size(tmp_path):
+    cache = _cache(tmp_path, max_mb=100 / (1024 * 1024), touch_sec=0)
+    cache.put("a", "x" * 40)
+    cache.put("b", "x" * 40)
+    assert cache.get("a") is not None  # touch: "b" is now the oldest
+    cache.put("c", "x" * 40)
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+    assert cache._l2_bytes == 80
+
+
+def test_expired_entries_are_ignored_and_purged(tmp_path):
+    cache = _cache(tmp_path, ttl_sec=-1)
+    cache.put("k", "value")
+    assert cache.get("k") is None
+    assert cache._l2_bytes == cache._l2_size(cache._conn()) == 0
+
+
+def test_fresh_hit_does_not_touch(tmp_path):
+    cache = _cache(tmp_path)
+    cache.put("k", "value")
+    before = _accessed(cache, "k")
+    assert cache.get("k") == "value"
+    assert cache._touched == {}
+    assert _accessed(cache, "k") == before
+
+
+def test_stale_hit_is_buffered_until_next_put(tmp_path):
+    cache = _cache(tmp_path, touch_sec=0)
+    cache.put("k", "value")
+    before = _accessed(cache, "k")
+    assert cache.get("k") == "value"
+    assert "k" in cache._touched
+    assert _accessed(cache, "k") == before
+    cache.put("other", "value")
+    assert cache._touched == {}
+    assert _accessed(cache, "k") > before
+
+
+def test_track_counts_scope_hits(tmp_path, monkeypatch):
+    monkeypatch.setattr(llm_cache, "_CACHE", _cache(tmp_path))
+    llm_cache.put("k", "value")
+    with llm_cache.track() as st:
+        llm_cache.get("k")
+        llm_cache.get("missing")
+    assert st.as_dict() == {"hits": 1, "misses": 1}
@@ -0,0 +1,84 @@
+# tests/test_note_compaction.py
+import note_compaction
+
+
+def _lines(text):
+    return [l for l in text.splitlines() if l.strip()]
+
+
+def _assert_kept(compacted, lines):
+    out = compacted.splitlines()
+    missing = [l for l in lines if l not in out]
+    assert not missing, f"non-minor lines lost: {missing}"
+
+
+def test_off_by_default():
+    note = "Vitals:\nBP: 120/80\n"
+    assert note_compaction.maybe_compact(note) == (note, {
+        "Enabled": False, "OriginalTokens": note_compaction.approx_tokens(note),
+        "CompactedTokens": note_compaction.approx_tokens(note), "SavedTokens": 0, "SavedPct": 0.0, "Sections": [],
+    })
+
+
+def test_inline_headers_inside_minor_section_pass_through():
+    clinical = [
+        "Chief Complaint: fatigue",
+        "CT Chest: 1.2 cm RUL nodule, stable",
+        "PET/CT: no evidence of distant disease",
+        "Interval History: tolerating letrozole",
+    ]
+    note = "\n".join(["Vitals:", "BP: 128/82", "HR: 76"] + clinical[:2]
+                     + ["Review of Systems:", "GI: negative"] + clinical[2:])
+    compacted, report = note_compaction.compact(note)
+    _assert_kept(compacted, clinical)
+    assert [s["Category"] for s in report["Sections"]] == ["vitals", "ros"]
+    assert "BP: 128/82 HR: 76" in compacted
+
+
+def test_header_without_colon_or_caps_ends_drop_section():
+    clinical = [
+        "Oncology History",
+        "Biopsy 03/2021: invasive ductal carcinoma, ER+ 95%, PR+ 40%, HER2 1+",
+        "Lumpectomy 04/12/2021, pT1cN0",
+    ]
+    note = "\n".join(["Billing:", "CPT 99215", "ICD-10 C50.911"] + clinical)
+    compacted, report = note_compaction.compact(note)
+    _assert_kept(compacted, clinical)
+    assert "CPT 99215" not in compacted
+    assert report["Sections"] == [{"Section": "Billing", "Category": "admin", "Action": "drop"}]
+
+
+def test_blank_line_ends_minor_section():
+    note = "Electronically signed by: Dr. A\n\nPlan: start anastrozole 1 mg daily"
+    compacted, _ = note_compaction.compact(note)
+    _assert_kept(compacted, ["Plan: start anastrozole 1 mg daily"])
+
+
+def test_ros_negation_is_scoped_to_each_item():
+    note = "ROS:\nConstitutional: fatigue, no fever, weight loss 10 lb\nGI: denies nausea; abdominal pain"
+    compacted, _ = note_compaction.compact(note)
+    assert compacted == "ROS: Constitutional: fatigue, weight loss 10 lb; GI: abdominal pain"
+
+
+def test_all_negative_ros_is_summarised():
+    compacted, _ = note_compaction.compact("Review of Systems:\nGI: negative\nAll other systems negative")
+    assert compacted == "Review of Systems: [negative/non-contributory; 2 line(s) omitted]"
+
+
+def test_appointment_blocks_are_kept():
+    note = "\n".join([
+        "Appointments:",
+        "Return to clinic in 3 months with CBC, CMP",
+        "Scheduling: mammogram 06/2025",
+        "Follow-up: Dr. B, radiation oncology, 2 weeks",
+    ])
+    compacted, report = note_compaction.compact(note)
+    _assert_kept(compacted, _lines(note))
+    assert report["Sections"] == []
+
+
+def test_header_with_unmatched_body_is_unchanged():
+    note = "SOCIAL HISTORY\nBRCA2 carrier, sister with ovarian cancer at 45"
+    compacted, report = note_compaction.compact(note)
+    assert compacted == note
+    assert report["Sections"] == []
@@ -0,0 +1,61 @@
+# tests/test_output_profile.py
+import bundle_prompts
+import vpp_rules
+
+MD_NOTE = "Diagnosis: invasive ductal carcinoma, left breast, ER+/PR+/HER2-.\nPlan: letrozole 2.5 mg daily."
+CANDIDATE = "Left breast IDC, hormone receptor positive. Starting letrozole."
+
+
+def _assert_inside_instruction(prompt):
+    block = bundle_prompts._TERSE_PROFILE.strip()
+    start, at = prompt.find("[INST]"), prompt.find(block)
+    end = prompt.rfind("[/INST]")
+    if end < 0:
+        end = prompt.rfind("</s>")
+    assert 0 <= start < at and at + len(block) <= end, "terse block is outside the instruction span"
+
+
+def _bundle_prompts():
+    pr = {"SpuriousFields": [], "MissingFields": [], "Precision": "High", "Recall": "High"}
+    base = {"Explanation": "ok"}
+    metrics = {k: {} for k in ("Relevance", "Coherence", "Completeness", "Correctness",
+                               "FinalRelevance", "FinalCompleteness", "FinalCorrectness")}
+    metrics["VPPCompliance"] = {"ViolationsByWeight": {}, "WeightedScore": 100}
+    return [
+        bundle_prompts.get_precision_recall_prompt(MD_NOTE, MD_NOTE, CANDIDATE),
+        bundle_prompts.get_precision_recall_facts_prompt("DIAGNOSIS:\n- IDC left breast", CANDIDATE),
+        bundle_prompts.get_relevance_prompt(MD_NOTE, CANDIDATE),
+        bundle_prompts.get_coherence_prompt(MD_NOTE, CANDIDATE),
+        bundle_prompts.get_completeness_prompt(MD_NOTE, CANDIDATE),
+        bundle_prompts.get_correctness_prompt(MD_NOTE, CANDIDATE),
+        bundle_prompts.get_fused_rubric_prompt(MD_NOTE, CANDIDATE),
+        bundle_prompts.get_vpp_compliance_prompt(CANDIDATE),
+        *[bundle_prompts.get_vpp_compliance_prompt(CANDIDATE, ids) for ids in vpp_rules.shard_ids(20)],
+        bundle_prompts.get_final_relevance_prompt(base, pr),
+        bundle_prompts.get_completeness_final_prompt(base, pr),
+        bundle_prompts.get_final_correctness_prompt(base, pr),
+        bundle_prompts.get_unified_pass_fail_prompt(metrics, pr),
+    ]
+
+
+def test_terse_block_is_inside_every_bundle_prompt():
+    for prompt in _bundle_prompts():
+        _assert_inside_instruction(bundle_prompts.apply_output_profile(prompt, "terse"))
+
+
+def test_shard_prompt_lists_are_handled_item_by_item():
+    shards = [bundle_prompts.get_vpp_compliance_prompt(CANDIDATE, ids) for ids in vpp_rules.shard_ids(20)]
+    for prompt in bundle_prompts.apply_output_profile(shards, "terse"):
+        _assert_inside_instruction(prompt)
+
+
+def test_full_profile_leaves_prompts_unchanged():
+    for prompt in _bundle_prompts():
+        assert bundle_prompts.apply_output_profile(prompt, "full") == prompt
+
+
+def test_fused_rubric_carries_each_dimension_criteria():
+    fused = bundle_prompts.get_fused_rubric_prompt(MD_NOTE, CANDIDATE)
+    for criteria in (bundle_prompts._RELEVANCE_CRITERIA, bundle_prompts._COHERENCE_CRITERIA,
+                     bundle_prompts._COMPLETENESS_CRITERIA, bundle_prompts._CORRECTNESS_CRITERIA):
+        assert criteria in fused
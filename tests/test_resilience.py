@@ -0,0 +1,142 @@
+# tests/test_resilience.py
+import threading
+import time
+
+import pytest
+
+import endpoint_limits
+from judge import resilience
+
+
+class _HTTPError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+@pytest.fixture(autouse=True)
+def _fresh_budget(monkeypatch):
+    monkeypatch.setattr(resilience, "RETRY_BUDGET", resilience.RetryBudget(max_tokens=5))
+
+
+def _counting(fn):
+    calls = []
+
+    def wrapped():
+        calls.append(1)
+        return fn()
+    return wrapped, calls
+
+
+def test_breaker_opens_then_half_opens_for_one_probe():
+    br = resilience.CircuitBreaker(failures=2, cooldown_sec=0.0)
+    br.record_failure()
+    assert br.allow()
+    br.record_failure()
+    assert br.state == "open"
+    assert br.allow()  # cooldown elapsed: the probe
+    assert br.state == "half_open" and br.is_open()
+    assert not br.allow()
+    br.record_success()
+    assert br.state == "closed" and not br.is_open()
+
+
+def test_retry_budget_is_earned_by_primaries():
+    budget = resilience.RetryBudget(ratio=0.5, max_tokens=1)
+    assert budget.withdraw()
+    assert not budget.withdraw()
+    budget.deposit()
+    budget.deposit()
+    assert budget.withdraw()
+
+
+def test_client_error_is_not_retried_and_keeps_breaker_closed():
+    ep = "test-resilience-400"
+
+    def bad_request():
+        raise _HTTPError(400)
+    fn, calls = _counting(bad_request)
+    for _ in range(resilience.BREAKER_FAILURES + 1):
+        with pytest.raises(_HTTPError):
+            resilience.call(ep, fn)
+    assert len(calls) == resilience.BREAKER_FAILURES + 1
+    assert resilience.breaker(ep).state == "closed"
+
+
+def test_transient_error_is_retried_then_original_raised():
+    ep = "test-resilience-503"
+
+    def unavailable():
+        raise _HTTPError(503)
+    fn, calls = _counting(unavailable)
+    with pytest.raises(_HTTPError) as exc:
+        resilience.call(ep, fn)
+    assert exc.value.status_code == 503
+    assert len(calls) == 1 + resilience.MAX_RETRIES
+    assert resilience.breaker(ep).failures == 1 + resilience.MAX_RETRIES
+
+
+def test_open_breaker_short_circuits():
+    ep = "test-resilience-open"
+    br = resilience.breaker(ep)
+    for _ in range(br.failures_to_open):
+        br.record_failure()
+    fn, calls = _counting(lambda: "ok")
+    with pytest.raises(resilience.CircuitOpenError):
+        resilience.call(ep, fn)
+    assert calls == []
+
+
+def test_queued_request_is_not_hedged(monkeypatch):
+    ep = "test-resilience-queued"
+    endpoint_limits.configure(ep, initial=1, min=1, max=1)
+    monkeypatch.setattr(resilience, "HEDGE_MIN_DELAY_SEC", 0.05)
+    monkeypatch.setattr(resilience, "HEDGE_DEFAULT_DELAY_SEC", 0.05)
+    held, release = threading.Event(), threading.Event()
+
+    def occupy():
+        with endpoint_limits.slot(ep):
+            held.set()
+            release.wait()
+    t = threading.Thread(target=occupy)
+    t.start()
+    held.wait()
+    threading.Timer(0.3, release.set).start()
+    fn, calls = _counting(lambda: "ok")
+    assert resilience.call(ep, fn) == "ok"
+    t.join()
+    assert len(calls) == 1
+    assert resilience._latency(ep)._samples[-1] < 0.2  # measured from send, not from queueing
+
+
+def test_hedge_is_skipped_without_free_slot(monkeypatch):
+    ep = "test-resilience-saturated"
+    endpoint_limits.configure(ep, initial=1, min=1, max=1)
+    monkeypatch.setattr(resilience, "HEDGE_MIN_DELAY_SEC", 0.05)
+    monkeypatch.setattr(resilience, "HEDGE_DEFAULT_DELAY_SEC", 0.05)
+
+    def slow():
+        time.sleep(0.3)
+        return "ok"
+    fn, calls = _counting(slow)
+    assert resilience.call(ep, fn) == "ok"
+    assert len(calls) == 1
+    assert resilience.RETRY_BUDGET.tokens == 5  # the skipped hedge's token was refunded
+
+
+def test_slow_request_is_hedged_when_slot_is_free(monkeypatch):
+    ep = "test-resilience-hedge"
+    endpoint_limits.configure(ep, initial=2, min=2, max=2)
+    monkeypatch.setattr(resilience, "HEDGE_MIN_DELAY_SEC", 0.05)
+    monkeypatch.setattr(resilience, "HEDGE_DEFAULT_DELAY_SEC", 0.05)
+    first = threading.Event()
+
+    def slow_then_fast():
+        if not first.is_set():
+            first.set()
+            time.sleep(0.5)
+            return "primary"
+        return "hedge"
+    fn, calls = _counting(slow_then_fast)
+    assert resilience.call(ep, fn) == "hedge"
+    assert len(calls) == 2
@@ -0,0 +1,81 @@
+# tests/test_rule_scoring.py
+import rule_scoring
+import vpp_rules
+
+
+def _ids(weight, n=1):
+    return [r["id"] for r in vpp_rules.RULES_BY_WEIGHT[weight][:n]]
+
+
+def test_final_relevance_caps_on_critical_spurious_item():
+    pr = {"SpuriousFieldsDetailed": [{"text": "Stage IV", "criticality": "critical"}]}
+    out = rule_scoring.final_relevance({"Relevance": "highly"}, pr)
+    assert out["FinalRelevance"] == "Hardly"
+    assert out["SpuriousCriticality"]["WeightedPenalty"] == 3
+
+
+def test_final_relevance_keeps_rating_without_spurious_items():
+    assert rule_scoring.final_relevance({"Relevance": "very"}, {})["FinalRelevance"] == "Very"
+
+
+def test_unlabelled_items_count_as_important():
+    pr = {"MissingFields": ["PSA", "testosterone", "PET date"]}
+    out = rule_scoring.final_completeness({"Completeness": "highly"}, pr)
+    assert out["MissingCriticality"]["Counts"] == {"critical": 0, "important": 3, "minor": 0}
+    assert out["FinalCompleteness"] == "Neutral"
+
+
+def test_final_completeness_is_highly_when_nothing_missing():
+    assert rule_scoring.final_completeness({"Completeness": "hardly"}, {})["FinalCompleteness"] == "Highly"
+
+
+def test_final_correctness_caps_below_high_precision():
+    out = rule_scoring.final_correctness({"Correctness": "highly"}, {"Precision": "Moderate"})
+    assert out["FinalCorrectness"] == "Neutral"
+
+
+def _metrics(score, critical=(), rating="Very"):
+    m = {k: {k: rating} for k in ("FinalRelevance", "FinalCompleteness", "FinalCorrectness")}
+    m["VPPCompliance"] = {"WeightedScore": score, "ViolationsByWeight": {"Critical": list(critical)}}
+    return m
+
+
+def test_unified_pass_fail_passes_clean_note():
+    out = rule_scoring.unified_pass_fail(_metrics(92.0), {})
+    assert (out["PassFail"], out["OverallRating"], out["CriticalIssues"]) == ("Pass", 5, [])
+
+
+def test_unified_pass_fail_fails_on_critical_vpp_violation():
+    out = rule_scoring.unified_pass_fail(_metrics(95.0, critical=["R001: one-liner"]), {})
+    assert (out["PassFail"], out["OverallRating"]) == ("Fail", 1)
+
+
+def test_unified_pass_fail_neutral_metric_caps_rating():
+    out = rule_scoring.unified_pass_fail(_metrics(95.0, rating="Neutral"), {})
+    assert (out["PassFail"], out["OverallRating"]) == ("Pass", 3)
+
+
+def test_score_vpp_compliance_weights_reported_rules():
+    critical, minor = _ids(5), _ids(1)
+    out = rule_scoring.score_vpp_compliance({"ViolatedRules": [critical[0].lower(), minor[0], "R999"]})
+    weight = 5 + 1
+    assert out["WeightedScore"] == round(100 - weight / vpp_rules.TOTAL_WEIGHT * 100, 1)
+    assert out["ViolatedRules"] == [critical[0], minor[0]]
+    assert out["UnknownRuleIds"] == ["R999"]
+    assert len(out["ViolationsByWeight"]["Critical"]) == 1
+    assert out["VPPCompliance"] == "Moderately Compliant"
+    assert out["RulesHash"] == vpp_rules.RULES_HASH
+
+
+def test_score_vpp_compliance_clean_note():
+    out = rule_scoring.score_vpp_compliance({"ViolatedRules": []})
+    assert (out["WeightedScore"], out["VPPCompliance"]) == (100.0, "Highly Compliant")
+
+
+def test_merge_vpp_shards_then_score_matches_single_call():
+    ids = _ids(4, 2) + _ids(3, 1)
+    shards = [{"ViolatedRules": ids[:2], "Explanation": "a"}, {"ViolatedRules": ids[2:], "Explanation": "b"}]
+    merged = rule_scoring.merge_vpp_shards(shards)
+    assert merged["Explanation"] == "a b"
+    assert rule_scoring.score_vpp_compliance(merged) == rule_scoring.score_vpp_compliance(
+        {"ViolatedRules": ids, "Explanation": "a b", "ClinicalAssessment": ""})
@@ -0,0 +1,52 @@
+# tests/test_token_budget.py
+import pytest
+
+import token_budget
+
+
+def test_estimate_tokens_handles_messages_and_images():
+    text = "x" * 35
+    assert token_budget.estimate_tokens(text) == 11
+    assert token_budget.estimate_tokens([("human", text)]) == token_budget.MESSAGE_OVERHEAD_TOKENS + 11
+    parts = [{"type": "text", "text": text}, {"type": "image_url", "image_url": {"url": "data:"}}]
+    assert token_budget.estimate_tokens(parts) == 11 + token_budget.IMAGE_TOKENS
+    assert token_budget.estimate_tokens(None) == 0
+
+
+def test_context_window_matches_endpoint_fragment():
+    assert token_budget.context_window("databricks-meta-llama-3-3-70b-instruct") == 128_000
+    assert token_budget.context_window("databricks-claude-sonnet-4") == 200_000
+    assert token_budget.context_window(None) == token_budget.DEFAULT_CONTEXT_WINDOW
+
+
+def test_fit_max_tokens_caps_to_remaining_window():
+    window = token_budget.context_window("databricks-llama-4-maverick")
+    input_tokens = window - token_budget.SAFETY_MARGIN_TOKENS - 1000
+    assert token_budget.fit_max_tokens(input_tokens, 4000, "databricks-llama-4-maverick") == 1000
+    assert token_budget.fit_max_tokens(10, 4000, "databricks-llama-4-maverick") == 4000
+
+
+def test_fit_max_tokens_rejects_prompt_without_room_for_output():
+    window = token_budget.context_window("databricks-claude-sonnet-4")
+    with pytest.raises(token_budget.PromptTooLargeError):
+        token_budget.fit_max_tokens(window, 1500, "databricks-claude-sonnet-4")
+
+
+def test_preflight_records_estimates_in_scope():
+    with token_budget.track() as st:
+        budget = token_budget.preflight("x" * 350, "databricks-claude-sonnet-4", max_tokens=500)
+    assert budget == {"InputTokens": 101, "MaxTokens": 500, "ContextWindow": 200_000}
+    assert st.as_dict() == {"calls": 1, "input_tokens": 101, "max_tokens": 500, "capped": 0}
+
+
+def test_split_to_fit_respects_output_per_item():
+    items = ["a" * 35] * 5
+    chunks = token_budget.split_to_fit(items, 0, "databricks-claude-sonnet-4", max_tokens=200, output_per_item=100)
+    assert [len(c) for c in chunks] == [2, 2, 1]
+    assert [i for c in chunks for i in c] == items
+
+
+def test_split_to_fit_rejects_oversized_item():
+    window = token_budget.context_window("databricks-claude-sonnet-4")
+    with pytest.raises(token_budget.PromptTooLargeError):
+        token_budget.split_to_fit(["x" * int(window * token_budget.CHARS_PER_TOKEN)], 0, "databricks-claude-sonnet-4", 500)
@@ -0,0 +1,26 @@
+# tests/test_vpp_rules.py
+import vpp_rules
+
+
+def test_shards_cover_every_rule_once_in_order():
+    shards = vpp_rules.shard_ids(20)
+    flat = [i for shard in shards for i in shard]
+    assert flat == [r["id"] for rules in vpp_rules.RULES_BY_CATEGORY.values() for r in rules]
+    assert sorted(flat) == sorted(vpp_rules.RULES_BY_ID)
+
+
+def test_shards_keep_categories_whole():
+    for shard in vpp_rules.shard_ids(20):
+        categories = {vpp_rules.RULES_BY_ID[i]["category"] for i in shard}
+        for cat in categories:
+            assert {r["id"] for r in vpp_rules.RULES_BY_CATEGORY[cat]} <= set(shard)
+
+
+def test_shards_respect_max_rules_unless_one_category_is_larger():
+    for shard in vpp_rules.shard_ids(20):
+        categories = {vpp_rules.RULES_BY_ID[i]["category"] for i in shard}
+        assert len(shard) <= 20 or len(categories) == 1
+
+
+def test_bucket_text_for_all_rules_matches_bucket_text():
+    assert vpp_rules.bucket_text_for(tuple(vpp_rules.RULES_BY_ID)) == vpp_rules.BUCKET_TEXT